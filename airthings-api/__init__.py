@@ -1,10 +1,22 @@
 from __future__ import absolute_import
 
-from .api import web
+from typing import TYPE_CHECKING
 
-from .responses import locations_instance
-from .responses import me_instance
-from .responses import relay_devices_instance
-from .responses import thresholds_instance
+from .lazy import lazy_submodules
 
-__version__ = '0.1.5'
\ No newline at end of file
+if TYPE_CHECKING:
+    from . import api, responses
+    from .api import web
+    from .responses import locations_instance, me_instance, relay_devices_instance, thresholds_instance
+
+__getattr__, __dir__ = lazy_submodules(__name__, globals(), {
+    'api': '.api',
+    'responses': '.responses',
+    'web': '.api.web',
+    'locations_instance': '.responses.locations_instance',
+    'me_instance': '.responses.me_instance',
+    'relay_devices_instance': '.responses.relay_devices_instance',
+    'thresholds_instance': '.responses.thresholds_instance',
+})
+
+__version__ = '0.1.5'
@@ -1,3 +1,53 @@
 from __future__ import absolute_import
 
-from . import web
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from ..lazy import lazy_submodules
+
+if TYPE_CHECKING:
+    from . import exceptions
+    from . import retry
+    from . import circuit
+    from . import cache
+    from . import throttle
+    from . import metrics
+    from . import watch
+    from . import routing
+    from . import stats
+    from . import sync
+    from . import units
+    from . import fleet
+    from . import hubs
+    from . import exporter
+    from . import gateway
+    from . import transport
+    from . import web
+    from . import pool
+    from . import sharding
+    from . import dedup
+
+__getattr__, __dir__ = lazy_submodules(__name__, globals(), {
+    name: '.' + name
+    for name in [
+        'exceptions',
+        'retry',
+        'circuit',
+        'cache',
+        'throttle',
+        'metrics',
+        'watch',
+        'routing',
+        'stats',
+        'sync',
+        'units',
+        'fleet',
+        'hubs',
+        'exporter',
+        'gateway',
+        'transport',
+        'web',
+        'pool',
+        'sharding',
+        'dedup',
+    ]
+})
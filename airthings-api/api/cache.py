@@ -0,0 +1,173 @@
+import asyncio
+import concurrent.futures
+import datetime as dt
+import hashlib
+import logging
+import os
+import struct
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from ..responses import snapshot
+
+
+_LOGGER = logging.getLogger(__name__)
+
+_EPOCH = dt.datetime(1970, 1, 1)
+_TIMESTAMP = struct.Struct('<q')
+
+
+@dataclass
+class AirThingsCachedInstance:
+    entity: str
+    instance: Any
+    timestamp: dt.datetime
+
+    @property
+    def age(self) -> dt.timedelta:
+        return dt.datetime.utcnow() - self.timestamp
+
+
+class AirThingsInstanceCache:
+    """Last good decoded instance of each entity."""
+
+    def __init__(self) -> None:
+        self.entries: Dict[str, AirThingsCachedInstance] = {}
+
+    def get(self, entity: str) -> Optional[AirThingsCachedInstance]:
+        return self.entries.get(entity)
+
+    def put(self, entity: str, instance: Any, timestamp: Optional[dt.datetime] = None) -> AirThingsCachedInstance:
+        cached = AirThingsCachedInstance(
+            entity=entity,
+            instance=instance,
+            timestamp=timestamp if timestamp is not None else dt.datetime.utcnow())
+
+        self.entries[entity] = cached
+        return cached
+
+
+class AirThingsSnapshotStore:
+    """Last good instances persisted on disk, one snapshot file per entity.
+
+    Files hold the fetch timestamp followed by a binary snapshot
+    (`responses.snapshot`). Writes are scheduled in the background, coalesced
+    per entity (only the latest instance is written) and atomic: the file is
+    written aside then renamed over the previous one, so a crash never leaves a
+    partial snapshot behind. Files that cannot be decoded count as missing and
+    are removed. `namespace` keeps accounts sharing a directory apart.
+    """
+
+    SUFFIX = '.ats'
+
+    def __init__(self, directory: str, namespace: str = '', executor: Optional[concurrent.futures.Executor] = None) -> None:
+        self.directory = directory
+        self.prefix = hashlib.sha256(namespace.encode('utf-8')).hexdigest()[:16] + '.'
+        self.executor = executor
+        self.__pending: Dict[str, AirThingsCachedInstance] = {}
+        self.__tasks: Dict[str, asyncio.Future] = {}
+
+    def path(self, entity: str) -> str:
+        return os.path.join(self.directory, self.prefix + entity + AirThingsSnapshotStore.SUFFIX)
+
+    def load(self, entity: str) -> Optional[AirThingsCachedInstance]:
+        try:
+            with open(self.path(entity), 'rb') as f:
+                data = f.read()
+
+            (microseconds,) = _TIMESTAMP.unpack_from(data)
+
+            return AirThingsCachedInstance(
+                entity=entity,
+                instance=snapshot.decode_snapshot(data[_TIMESTAMP.size:]),
+                timestamp=_EPOCH + dt.timedelta(microseconds=microseconds))
+
+        except FileNotFoundError:
+            return None
+
+        except OSError as error:
+            _LOGGER.warning('entity: "{0}" | message: "ignoring unreadable snapshot" | error: "{1!r}" | '.format(entity, error))
+            return None
+
+        except Exception as error:
+            # Whatever is wrong with the file, it is only a cache miss, and it
+            # would fail the same way on every start: remove it.
+            _LOGGER.warning('entity: "{0}" | message: "removing corrupt snapshot" | error: "{1!r}" | '.format(entity, error))
+
+            try:
+                os.unlink(self.path(entity))
+            except OSError:
+                pass
+
+            return None
+
+    def load_all(self) -> Dict[str, AirThingsCachedInstance]:
+        try:
+            names = os.listdir(self.directory)
+
+        except FileNotFoundError:
+            return {}
+
+        entries: Dict[str, AirThingsCachedInstance] = {}
+
+        for name in names:
+            if name.startswith(self.prefix) and name.endswith(AirThingsSnapshotStore.SUFFIX):
+                entity = name[len(self.prefix):-len(AirThingsSnapshotStore.SUFFIX)]
+                cached = self.load(entity)
+
+                if cached is not None:
+                    entries[entity] = cached
+
+        return entries
+
+    def save(self, cached: AirThingsCachedInstance) -> None:
+        delta = cached.timestamp - _EPOCH
+        microseconds = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+        data = _TIMESTAMP.pack(microseconds) + snapshot.encode_snapshot(cached.instance)
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        (fd, temporary) = tempfile.mkstemp(dir=self.directory, prefix='.' + self.prefix, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(temporary, self.path(cached.entity))
+
+        except BaseException:
+            try:
+                os.unlink(temporary)
+            except OSError:
+                pass
+            raise
+
+    def schedule(self, cached: AirThingsCachedInstance) -> None:
+        self.__pending[cached.entity] = cached
+
+        if cached.entity not in self.__tasks:
+            self.__tasks[cached.entity] = asyncio.ensure_future(self.__flush_entity(cached.entity))
+
+    async def flush(self) -> None:
+        while len(self.__tasks) > 0:
+            await asyncio.gather(*list(self.__tasks.values()), return_exceptions=True)
+
+    async def __flush_entity(self, entity: str) -> None:
+        loop = asyncio.get_running_loop()
+
+        try:
+            while entity in self.__pending:
+                cached = self.__pending.pop(entity)
+
+                try:
+                    await loop.run_in_executor(self.executor, self.save, cached)
+
+                except Exception as error:
+                    _LOGGER.warning('entity: "{0}" | message: "could not save snapshot" | error: "{1!r}" | '.format(entity, error))
+
+        finally:
+            del self.__tasks[entity]
@@ -0,0 +1,147 @@
+import enum
+import logging
+import time
+from typing import Dict
+
+from .exceptions import (
+    AirThingsException,
+    AirThingsConnectionException,
+    AirThingsRateLimitedException,
+    AirThingsServerException,
+)
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@enum.unique
+class AirThingsCircuitState(enum.Enum):
+    Closed = 0
+    Open = 1
+    HalfOpen = 2
+
+
+class AirThingsCircuitBreaker:
+    """Closed/open/half-open circuit breaker for a single upstream host.
+
+    After `failure_threshold` consecutive failures the circuit opens and requests
+    fail fast for `recovery_timeout` seconds. Then up to `half_open_max_calls`
+    probes are let through: a success closes the circuit, a failure re-opens it.
+    """
+
+    def __init__(
+            self,
+            host: str,
+            failure_threshold: int = 5,
+            recovery_timeout: float = 30.0,
+            half_open_max_calls: int = 1) -> None:
+        self.host = host
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.consecutive_failures = 0
+        self.opened_count = 0
+        self.rejected_count = 0
+        self.__state = AirThingsCircuitState.Closed
+        self.__opened_at = 0.0
+        self.__half_open_calls = 0
+
+    @property
+    def state(self) -> AirThingsCircuitState:
+        if self.__state == AirThingsCircuitState.Open and self.retry_in <= 0:
+            self.__state = AirThingsCircuitState.HalfOpen
+            self.__half_open_calls = 0
+
+        return self.__state
+
+    @property
+    def retry_in(self) -> float:
+        if self.__state != AirThingsCircuitState.Open:
+            return 0.0
+
+        return max(0.0, self.__opened_at + self.recovery_timeout - time.monotonic())
+
+    @staticmethod
+    def is_failure(exception: BaseException) -> bool:
+        # Unauthorized and other client errors are answers from a healthy host: they do not count.
+        return isinstance(
+            exception,
+            (AirThingsServerException, AirThingsConnectionException, AirThingsRateLimitedException))
+
+    def allow_request(self) -> bool:
+        state = self.state
+
+        if state == AirThingsCircuitState.Closed:
+            return True
+
+        if state == AirThingsCircuitState.HalfOpen and self.__half_open_calls < self.half_open_max_calls:
+            self.__half_open_calls += 1
+            return True
+
+        self.rejected_count += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.__state != AirThingsCircuitState.Closed:
+            _LOGGER.info('host: "{0}" | message: "circuit closed" | '.format(self.host))
+
+        self.consecutive_failures = 0
+        self.__state = AirThingsCircuitState.Closed
+        self.__half_open_calls = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+
+        if self.__state == AirThingsCircuitState.HalfOpen or self.consecutive_failures >= self.failure_threshold:
+            self.__open()
+
+    def record_outcome(self, exception: AirThingsException) -> None:
+        if AirThingsCircuitBreaker.is_failure(exception):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def release(self) -> None:
+        # A half-open probe ended without a verdict (e.g. it was cancelled).
+        if self.__state == AirThingsCircuitState.HalfOpen and self.__half_open_calls > 0:
+            self.__half_open_calls -= 1
+
+    def __open(self) -> None:
+        if self.__state != AirThingsCircuitState.Open:
+            self.opened_count += 1
+
+            _LOGGER.warning(
+                'host: "{0}" | consecutive_failures: "{1}" | message: "circuit opened" | '.format(
+                    self.host, self.consecutive_failures))
+
+        self.__state = AirThingsCircuitState.Open
+        self.__opened_at = time.monotonic()
+        self.__half_open_calls = 0
+
+
+class AirThingsCircuitBreakers:
+    """Per-host registry of circuit breakers, meant to be shared by many managers."""
+
+    def __init__(
+            self,
+            failure_threshold: int = 5,
+            recovery_timeout: float = 30.0,
+            half_open_max_calls: int = 1) -> None:
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.breakers: Dict[str, AirThingsCircuitBreaker] = {}
+
+    def get(self, host: str) -> AirThingsCircuitBreaker:
+        breaker = self.breakers.get(host)
+
+        if breaker is None:
+            breaker = AirThingsCircuitBreaker(
+                host=host,
+                failure_threshold=self.failure_threshold,
+                recovery_timeout=self.recovery_timeout,
+                half_open_max_calls=self.half_open_max_calls)
+
+            self.breakers[host] = breaker
+
+        return breaker
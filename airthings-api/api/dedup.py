@@ -0,0 +1,241 @@
+import dataclasses
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+from uuid import UUID
+
+from .exceptions import AirThingsInvalidCredentialsException
+from .pool import AirThingsManagerPool
+
+from ..responses import locations_instance as li
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AirThingsSharedLocations:
+    """One view of the locations of many accounts, each shared location polled once.
+
+    Accounts of the same groups see the same locations. A discovery poll of
+    every account (first `refresh()`, then every `rediscover_interval`
+    seconds) maps which accounts see which location; later refreshes only
+    poll the smallest set of accounts found (greedily) to cover every
+    location, each location being taken from its assigned account, and the
+    results are merged with devices deduplicated by serial number.
+
+    When an assigned account fails, its locations are reassigned to other
+    accounts that see them and polled through those in the same refresh.
+    Accounts with invalid credentials are left out until the next discovery;
+    other accounts failing a discovery are forgotten, and retried by the next
+    refresh.
+    """
+
+    def __init__(self, pool: AirThingsManagerPool, rediscover_interval: float = 3600.0) -> None:
+        self.pool = pool
+        self.rediscover_interval = rediscover_interval
+        self.members: Dict[UUID, Set[str]] = {}
+        self.locations_of: Dict[str, Set[UUID]] = {}
+        self.owners: Dict[UUID, str] = {}
+        self.locations: Dict[UUID, li.Location] = {}
+        self.quarantined: Set[str] = set()
+        self.instance: Optional[li.LocationsInstance] = None
+        self.polls = 0
+        self.failovers = 0
+        self.__discovered_at: Optional[float] = None
+
+    def accounts_of(self, location_id: UUID) -> Set[str]:
+        return self.members.get(location_id, set())
+
+    def owner_of(self, location_id: UUID) -> Optional[str]:
+        return self.owners.get(location_id)
+
+    def assignments(self) -> Dict[str, Set[UUID]]:
+        """Locations polled through each account."""
+        result: Dict[str, Set[UUID]] = {}
+        for (location_id, account_id) in self.owners.items():
+            result.setdefault(account_id, set()).add(location_id)
+        return result
+
+    def plan(
+            self,
+            location_ids: Optional[Iterable[UUID]] = None,
+            exclude: Iterable[str] = (),
+            prefer: Optional[Iterable[str]] = None) -> Dict[str, Set[UUID]]:
+        """Accounts to poll to cover `location_ids` (default: all), and what each covers.
+
+        Greedy set cover: the account seeing the most uncovered locations goes
+        first, accounts of `prefer` (default: the current owners) winning ties
+        so that assignments stay stable.
+        Locations no eligible account sees are left out.
+        """
+        uncovered = set(location_ids) if location_ids is not None else set(self.members)
+        excluded = set(exclude) | self.quarantined
+        preferred = set(prefer) if prefer is not None else set(self.owners.values())
+
+        candidates = {
+            account_id: self.locations_of[account_id] & uncovered
+            for account_id in sorted(self.locations_of)
+            if account_id not in excluded and account_id in self.pool.accounts
+        }
+
+        result: Dict[str, Set[UUID]] = {}
+
+        while len(uncovered) > 0 and len(candidates) > 0:
+            best = max(candidates, key=lambda a: (len(candidates[a] & uncovered), a in preferred))
+            covered = candidates.pop(best) & uncovered
+
+            if len(covered) == 0:
+                break
+
+            result[best] = covered
+            uncovered -= covered
+
+        return result
+
+    async def discover(self) -> li.LocationsInstance:
+        """Polls every account to map shared locations, then assigns them."""
+        previous_owners = set(self.owners.values())
+
+        self.quarantined.clear()
+        self.owners.clear()
+
+        failed = await self.__poll(list(self.pool.accounts))
+
+        # What failed accounts saw at an earlier discovery may be stale: they
+        # are polled again by the next refresh, as accounts never discovered.
+        for account_id in list(self.locations_of):
+            if account_id not in self.pool.accounts or account_id in failed:
+                self.__forget(account_id)
+
+        self.owners.clear()
+        self.__assign(self.plan(prefer=previous_owners))
+        self.__discovered_at = time.monotonic()
+
+        return self.__merge()
+
+    async def refresh(self) -> li.LocationsInstance:
+        if self.__discovered_at is None or time.monotonic() - self.__discovered_at >= self.rediscover_interval:
+            return await self.discover()
+
+        pending = self.assignments()
+
+        # Accounts added since the discovery may see locations nobody polls yet.
+        for account_id in self.pool.accounts:
+            if account_id not in self.locations_of and account_id not in self.quarantined:
+                pending.setdefault(account_id, set())
+
+        attempted: Set[str] = set()
+
+        while len(pending) > 0:
+            attempted |= set(pending)
+            failed = await self.__poll(list(pending))
+
+            orphans: Set[UUID] = set()
+            for account_id in failed:
+                orphans |= pending[account_id]
+
+            if len(orphans) == 0:
+                break
+
+            pending = self.plan(location_ids=orphans, exclude=attempted)
+            self.__assign(pending)
+
+            self.failovers += len(pending)
+
+            for location_id in orphans - set().union(*pending.values()):
+                _LOGGER.warning(
+                    'location_id: "{0}" | accounts: "{1}" | message: "no account left to poll this location, keeping its last instance" | '.format(
+                        location_id,
+                        sorted(self.members.get(location_id, ()))))
+
+        return self.__merge()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'accounts': len(self.locations_of),
+            'locations': len(self.members),
+            'shared_locations': sum(1 for members in self.members.values() if len(members) > 1),
+            'polled_accounts': len(set(self.owners.values())),
+            'quarantined_accounts': len(self.quarantined),
+            'polls': self.polls,
+            'failovers': self.failovers,
+        }
+
+    async def __poll(self, account_ids: List[str]) -> List[str]:
+        succeeded: Set[str] = set()
+
+        async for (account_id, instance) in self.pool.iter_locations_instances(account_ids=account_ids):
+            succeeded.add(account_id)
+            self.__record(account_id, instance)
+
+        self.polls += len(account_ids)
+        failed = [account_id for account_id in account_ids if account_id not in succeeded]
+
+        for account_id in failed:
+            if isinstance(self.pool.failures.get(account_id), AirThingsInvalidCredentialsException):
+                self.quarantined.add(account_id)
+
+        return failed
+
+    def __record(self, account_id: str, instance: li.LocationsInstance) -> None:
+        location_ids = set()
+
+        for location in instance.locations:
+            location_ids.add(location.id_)
+            self.members.setdefault(location.id_, set()).add(account_id)
+
+            owner = self.owners.get(location.id_)
+
+            if owner is None:
+                # New location (or discovery in progress): the first account seeing it polls it.
+                self.owners[location.id_] = owner = account_id
+
+            if owner == account_id:
+                self.locations[location.id_] = location
+
+        # Locations this account no longer sees.
+        for location_id in self.locations_of.get(account_id, set()) - location_ids:
+            self.__leave(location_id, account_id)
+
+        self.locations_of[account_id] = location_ids
+
+    def __assign(self, assignments: Dict[str, Set[UUID]]) -> None:
+        for (account_id, location_ids) in assignments.items():
+            for location_id in location_ids:
+                self.owners[location_id] = account_id
+
+    def __forget(self, account_id: str) -> None:
+        for location_id in self.locations_of.pop(account_id, set()):
+            self.__leave(location_id, account_id)
+
+    def __leave(self, location_id: UUID, account_id: str) -> None:
+        members = self.members.get(location_id)
+
+        if members is not None:
+            members.discard(account_id)
+
+            if len(members) == 0:
+                del self.members[location_id]
+                self.locations.pop(location_id, None)
+
+        if self.owners.get(location_id) == account_id:
+            del self.owners[location_id]
+
+    def __merge(self) -> li.LocationsInstance:
+        serial_numbers: Set[str] = set()
+        locations = []
+
+        for (location_id, location) in self.locations.items():
+            if location_id not in self.members:
+                continue
+
+            devices = [device for device in location.devices if device.serial_number not in serial_numbers]
+            serial_numbers.update(device.serial_number for device in devices)
+
+            if len(devices) != len(location.devices):
+                location = dataclasses.replace(location, devices=devices, device_count=len(devices))
+
+            locations.append(location)
+
+        self.instance = li.LocationsInstance(locations)
+        return self.instance
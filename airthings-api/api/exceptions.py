@@ -0,0 +1,109 @@
+import email.utils
+import datetime as dt
+from typing import Optional
+
+
+class AirThingsException(Exception):
+    """Base exception for AirThings API errors."""
+
+    def __init__(self, error_code: int, error_details: str) -> None:
+        """Initialise AirThingsException."""
+        self.error_code = error_code
+        self.error_details = error_details
+
+
+class AirThingsInvalidCredentialsException(Exception):
+    """Highlevel Exception for AirThings invalid credentials errors."""
+    pass
+
+
+class AirThingsUnauthorizedException(AirThingsException):
+    """Exception for AirThings API unauthorized errors (401, 403, or 400 from the token endpoint)."""
+    pass
+
+
+class AirThingsClientException(AirThingsException):
+    """Exception for AirThings API client errors (4xx other than 401, 403 and 429)."""
+    pass
+
+
+class AirThingsRateLimitedException(AirThingsException):
+    """Exception for AirThings API rate limiting errors (429)."""
+
+    def __init__(self, error_code: int, error_details: str, retry_after: Optional[float] = None) -> None:
+        """Initialise AirThingsRateLimitedException."""
+        super().__init__(error_code=error_code, error_details=error_details)
+        self.retry_after = retry_after
+
+
+class AirThingsServerException(AirThingsException):
+    """Exception for AirThings API server errors (5xx)."""
+
+    def __init__(self, error_code: int, error_details: str, retry_after: Optional[float] = None) -> None:
+        """Initialise AirThingsServerException."""
+        super().__init__(error_code=error_code, error_details=error_details)
+        self.retry_after = retry_after
+
+
+class AirThingsConnectionException(AirThingsException):
+    """Exception for network errors and timeouts while talking to the AirThings API."""
+    pass
+
+
+class AirThingsPollFailedException(AirThingsException):
+    """Exception for polls that could not be sent (login or token refresh failed) or got no payload."""
+    pass
+
+
+class AirThingsCircuitOpenException(AirThingsException):
+    """Exception raised without calling upstream while a host's circuit breaker is open."""
+
+    def __init__(self, error_code: int, error_details: str, host: str, retry_in: float) -> None:
+        """Initialise AirThingsCircuitOpenException."""
+        super().__init__(error_code=error_code, error_details=error_details)
+        self.host = host
+        self.retry_in = retry_in
+
+
+class AirThingsThrottledException(AirThingsException):
+    """Exception raised locally when a rate limiter cannot grant a slot within its maximum wait."""
+
+    def __init__(self, error_code: int, error_details: str, retry_in: float) -> None:
+        """Initialise AirThingsThrottledException."""
+        super().__init__(error_code=error_code, error_details=error_details)
+        self.retry_in = retry_in
+
+
+class AirThingsWorkerException(AirThingsException):
+    """Exception reported by a worker process on behalf of one of its accounts."""
+
+    def __init__(self, error_code: int, error_details: str, error_type: str) -> None:
+        """Initialise AirThingsWorkerException."""
+        super().__init__(error_code=error_code, error_details=error_details)
+        self.error_type = error_type
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a `Retry-After` header (delta-seconds or HTTP-date) into seconds."""
+    if value is None:
+        return None
+
+    value = value.strip()
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+    if when is None:
+        return None
+
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=dt.timezone.utc)
+
+    return max(0.0, (when - dt.datetime.now(dt.timezone.utc)).total_seconds())
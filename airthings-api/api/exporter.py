@@ -0,0 +1,211 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web as aiohttp_web
+
+from .metrics import AirThingsHistogram, AirThingsMetrics
+from .stats import to_epoch
+from .watch import SKIP, AirThingsSubscription
+
+from ..responses import locations_instance as li
+
+
+_LOGGER = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Label name of the metrics' label, by the first component of their name.
+LABEL_NAMES = {
+    'poll': 'entity',
+    'decode': 'entity',
+    'cache': 'entity',
+    'auth': 'step',
+    'http': 'endpoint',
+}
+
+
+def escape_label(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def metric_name(name: str) -> str:
+    return 'airthings_client_' + ''.join(c if c.isalnum() else '_' for c in name)
+
+
+def render_locations(instance: li.LocationsInstance, lines: List[str]) -> None:
+    sensors: List[str] = []
+    batteries: List[str] = []
+    rssis: List[str] = []
+    samples: List[str] = []
+    hubs: List[str] = []
+
+    for location in instance.locations:
+        for device in location.devices:
+            labels = 'serial_number="{0}",room_name="{1}",location_name="{2}",location_id="{3}"'.format(
+                escape_label(device.serial_number),
+                escape_label(device.room_name),
+                escape_label(location.name),
+                location.id_)
+
+            for sensor in device.current_sensor_values:
+                if sensor.value is not None:
+                    sensors.append('airthings_sensor_value{{{0},sensor_type="{1}",unit="{2}"}} {3!r}'.format(
+                        labels,
+                        escape_label(sensor.type_),
+                        escape_label(sensor.provided_unit),
+                        float(sensor.value)))
+
+            if device.battery_percentage is not None:
+                batteries.append('airthings_device_battery_percentage{{{0}}} {1}'.format(labels, device.battery_percentage))
+            if device.rssi is not None:
+                rssis.append('airthings_device_rssi{{{0}}} {1}'.format(labels, device.rssi))
+            if device.latest_sample is not None:
+                samples.append('airthings_device_latest_sample_timestamp_seconds{{{0}}} {1!r}'.format(labels, to_epoch(device.latest_sample)))
+            if device.is_hub_connection_lost is not None:
+                hubs.append('airthings_device_hub_connection_lost{{{0}}} {1}'.format(labels, int(device.is_hub_connection_lost)))
+
+    for (name, help_text, samples_lines) in [
+            ('airthings_sensor_value', 'Latest sensor reading.', sensors),
+            ('airthings_device_battery_percentage', 'Device battery level.', batteries),
+            ('airthings_device_rssi', 'Device radio signal strength.', rssis),
+            ('airthings_device_latest_sample_timestamp_seconds', 'Time of the device latest sample.', samples),
+            ('airthings_device_hub_connection_lost', 'Whether the device lost its hub connection.', hubs)]:
+        lines.append('# HELP {0} {1}'.format(name, help_text))
+        lines.append('# TYPE {0} gauge'.format(name))
+        lines.extend(samples_lines)
+
+
+def render_metrics(metrics: AirThingsMetrics, lines: List[str]) -> None:
+    histograms: Dict[str, List[Any]] = {}
+    for ((name, label), histogram) in sorted(metrics.histograms.items()):
+        histograms.setdefault(name, []).append((label, histogram))
+
+    for (name, series) in histograms.items():
+        prometheus_name = metric_name(name) + '_seconds'
+        label_name = LABEL_NAMES.get(name.split('.')[0], 'label')
+
+        lines.append('# TYPE {0} histogram'.format(prometheus_name))
+
+        for (label, histogram) in series:
+            _render_histogram(prometheus_name, '{0}="{1}"'.format(label_name, escape_label(label)), histogram, lines)
+
+    counters: Dict[str, List[str]] = {}
+    for ((name, label), value) in sorted(metrics.counters.items()):
+        label_name = LABEL_NAMES.get(name.split('.')[0], 'label')
+        labels = '{0}="{1}"'.format(label_name, escape_label(label))
+
+        if name.startswith('http.status.'):
+            labels += ',code="{0}"'.format(name[len('http.status.'):])
+            name = 'http.responses'
+
+        counters.setdefault(metric_name(name) + '_total', []).append('{{{0}}} {1}'.format(labels, value))
+
+    for (name, series) in counters.items():
+        lines.append('# TYPE {0} counter'.format(name))
+        lines.extend(name + sample for sample in series)
+
+    for (source, values) in sorted(metrics.source_values().items()):
+        _render_source(metric_name(source), values, lines)
+
+
+def _render_histogram(name: str, labels: str, histogram: AirThingsHistogram, lines: List[str]) -> None:
+    cumulative = 0
+    for (bound, count) in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        lines.append('{0}_bucket{{{1},le="{2!r}"}} {3}'.format(name, labels, bound, cumulative))
+
+    lines.append('{0}_bucket{{{1},le="+Inf"}} {2}'.format(name, labels, histogram.count))
+    lines.append('{0}_sum{{{1}}} {2!r}'.format(name, labels, histogram.total))
+    lines.append('{0}_count{{{1}}} {2}'.format(name, labels, histogram.count))
+
+
+def _render_source(prefix: str, values: Dict[str, Any], lines: List[str]) -> None:
+    for (key, value) in sorted(values.items()):
+        if isinstance(value, dict):
+            _render_source(prefix + '_' + key, value, lines)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append('{0}_{1} {2!r}'.format(prefix, key, value))
+
+
+class AirThingsPrometheusExporter:
+    """Serves `/metrics` in the Prometheus text format from a small aiohttp server.
+
+    The page holds the readings of the manager's latest locations instance and,
+    when given, the client `metrics`. It is rendered once per poll (the
+    exporter subscribes to the shared locations watcher) and scrapes only send
+    the prepared bytes, so their cost does not grow with the fleet.
+    """
+
+    def __init__(
+            self,
+            manager: Any,
+            metrics: Optional[AirThingsMetrics] = None,
+            interval: float = 60.0,
+            host: str = '0.0.0.0',
+            port: int = 9090) -> None:
+        self.manager = manager
+        self.metrics = metrics if metrics is not None else getattr(manager, 'metrics', None)
+        self.interval = interval
+        self.host = host
+        self.port = port
+        self.body = b''
+        self.subscription: Optional[AirThingsSubscription] = None
+        self.__runner: Optional[aiohttp_web.AppRunner] = None
+        self.__instance: Optional[li.LocationsInstance] = None
+
+    def render(self) -> bytes:
+        lines: List[str] = []
+
+        if self.__instance is not None:
+            render_locations(self.__instance, lines)
+
+        if self.metrics is not None:
+            render_metrics(self.metrics, lines)
+
+        self.body = ('\n'.join(lines) + '\n').encode('utf-8')
+        return self.body
+
+    def application(self) -> aiohttp_web.Application:
+        application = aiohttp_web.Application()
+        application.router.add_get('/metrics', self.__handle_metrics)
+        return application
+
+    async def start(self) -> 'AirThingsPrometheusExporter':
+        if self.subscription is None or self.subscription.closed:
+            self.subscription = self.manager.watch(
+                entity='location',
+                interval=self.interval,
+                select=self.__on_instance)
+
+        self.render()
+
+        self.__runner = aiohttp_web.AppRunner(self.application())
+        await self.__runner.setup()
+        await aiohttp_web.TCPSite(self.__runner, self.host, self.port).start()
+        # The bound port, when `port=0` let the system pick one.
+        self.port = self.__runner.addresses[0][1]
+
+        return self
+
+    async def stop(self) -> None:
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription = None
+
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+
+    async def __aenter__(self) -> 'AirThingsPrometheusExporter':
+        return await self.start()
+
+    async def __aexit__(self, *args) -> None:
+        await self.stop()
+
+    def __on_instance(self, instance: li.LocationsInstance) -> Any:
+        self.__instance = instance
+        self.render()
+        return SKIP
+
+    async def __handle_metrics(self, request: aiohttp_web.Request) -> aiohttp_web.Response:
+        return aiohttp_web.Response(body=self.body, headers={'Content-Type': CONTENT_TYPE})
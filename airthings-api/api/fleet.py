@@ -0,0 +1,147 @@
+import bisect
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .stats import to_epoch
+
+from ..responses import locations_instance as li
+
+
+class AirThingsSortedIndex:
+    """Devices ordered by one key, as a bisect-maintained list of (key, serial number).
+
+    Updating a device is a binary search plus a list insertion, reading the k
+    smallest or largest entries is O(k).
+    """
+
+    def __init__(self, name: str, key: Callable[[li.Device], Any]) -> None:
+        self.name = name
+        self.key = key
+        self.entries: List[Tuple[Any, str]] = []
+        self.keys: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def set(self, serial_number: str, value: Any) -> None:
+        previous = self.keys.get(serial_number)
+
+        if previous is not None:
+            if previous == value:
+                return
+
+            del self.entries[bisect.bisect_left(self.entries, (previous, serial_number))]
+            del self.keys[serial_number]
+
+        if value is not None:
+            bisect.insort(self.entries, (value, serial_number))
+            self.keys[serial_number] = value
+
+    def set_many(self, values: List[Tuple[str, Any]]) -> None:
+        if len(values) * 4 < len(self.entries):
+            for (serial_number, value) in values:
+                self.set(serial_number=serial_number, value=value)
+            return
+
+        # Many changes (e.g. the first poll): one sort beats as many insertions.
+        for (serial_number, value) in values:
+            if value is None:
+                self.keys.pop(serial_number, None)
+            else:
+                self.keys[serial_number] = value
+
+        self.entries = sorted((value, serial_number) for (serial_number, value) in self.keys.items())
+
+    def discard(self, serial_number: str) -> None:
+        self.set(serial_number=serial_number, value=None)
+
+    def smallest(self, k: int) -> List[str]:
+        return [serial_number for (_, serial_number) in self.entries[:k]]
+
+    def largest(self, k: int) -> List[str]:
+        return [serial_number for (_, serial_number) in reversed(self.entries[-k:])] if k > 0 else []
+
+
+def _latest_sample_key(device: li.Device) -> Optional[float]:
+    return to_epoch(device.latest_sample) if device.latest_sample is not None else None
+
+
+class AirThingsFleetIndex:
+    """Fleet-wide health queries over the devices of a `LocationsInstance`.
+
+    `update` re-indexes only the devices whose battery, RSSI, sample time or hub
+    connection changed (and drops the ones that disappeared); queries read the
+    sorted indexes and never sort the fleet.
+    """
+
+    def __init__(self) -> None:
+        self.devices: Dict[str, li.Device] = {}
+        self.locations: Dict[str, li.Location] = {}
+        self.hub_connection_lost: Set[str] = set()
+        self.indexes: Dict[str, AirThingsSortedIndex] = {
+            'battery_percentage': AirThingsSortedIndex(name='battery_percentage', key=lambda device: device.battery_percentage),
+            'rssi': AirThingsSortedIndex(name='rssi', key=lambda device: device.rssi),
+            'latest_sample': AirThingsSortedIndex(name='latest_sample', key=_latest_sample_key),
+        }
+        self.__fields: Dict[str, Tuple[Any, ...]] = {}
+
+    def update(self, instance: li.LocationsInstance) -> int:
+        """Index the devices of `instance`; returns the number of devices re-indexed."""
+        seen: Set[str] = set()
+        changed: List[li.Device] = []
+
+        for location in instance.locations:
+            for device in location.devices:
+                serial_number = device.serial_number
+                seen.add(serial_number)
+
+                self.devices[serial_number] = device
+                self.locations[serial_number] = location
+
+                fields = (device.battery_percentage, device.rssi, device.latest_sample, device.is_hub_connection_lost)
+
+                if self.__fields.get(serial_number) == fields:
+                    continue
+
+                self.__fields[serial_number] = fields
+                changed.append(device)
+
+                if device.is_hub_connection_lost:
+                    self.hub_connection_lost.add(serial_number)
+                else:
+                    self.hub_connection_lost.discard(serial_number)
+
+        for index in self.indexes.values():
+            index.set_many([(device.serial_number, index.key(device)) for device in changed])
+
+        if len(seen) != len(self.devices):
+            for serial_number in [serial_number for serial_number in self.devices if serial_number not in seen]:
+                self.remove(serial_number)
+
+        return len(changed)
+
+    def remove(self, serial_number: str) -> None:
+        self.devices.pop(serial_number, None)
+        self.locations.pop(serial_number, None)
+        self.__fields.pop(serial_number, None)
+        self.hub_connection_lost.discard(serial_number)
+
+        for index in self.indexes.values():
+            index.discard(serial_number)
+
+    def smallest(self, field: str, k: int) -> List[li.Device]:
+        return [self.devices[serial_number] for serial_number in self.indexes[field].smallest(k)]
+
+    def largest(self, field: str, k: int) -> List[li.Device]:
+        return [self.devices[serial_number] for serial_number in self.indexes[field].largest(k)]
+
+    def lowest_battery(self, k: int) -> List[li.Device]:
+        return self.smallest(field='battery_percentage', k=k)
+
+    def weakest_rssi(self, k: int) -> List[li.Device]:
+        return self.smallest(field='rssi', k=k)
+
+    def most_stale(self, k: int) -> List[li.Device]:
+        return self.smallest(field='latest_sample', k=k)
+
+    def lost_hub_connection(self) -> List[li.Device]:
+        return [self.devices[serial_number] for serial_number in sorted(self.hub_connection_lost)]
@@ -0,0 +1,155 @@
+import functools
+import hashlib
+import logging
+from email.utils import formatdate
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web as aiohttp_web
+
+from .pool import AirThingsManagerPool
+from .stats import to_epoch
+from .watch import SKIP, AirThingsSubscription
+
+from ..responses import codec
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AirThingsCachedResponse:
+    """Pre-serialised JSON body of an instance, with its ETag."""
+
+    def __init__(self, body: bytes, timestamp: Optional[float] = None) -> None:
+        self.body = body
+        self.etag = '"{0}"'.format(hashlib.blake2b(body, digest_size=16).hexdigest())
+        self.last_modified = formatdate(timestamp, usegmt=True)
+
+
+class AirThingsGateway:
+    """Local read-through HTTP gateway for the accounts of an `AirThingsManagerPool`.
+
+    Every (account, entity) is polled by the account manager's shared watcher
+    every `interval` seconds, whatever the number of clients. Each new instance
+    is serialised once; `GET /{account_id}/{entity}` then returns those bytes,
+    with an ETag and `304 Not Modified` for a matching `If-None-Match`.
+    """
+
+    def __init__(
+            self,
+            pool: Optional[AirThingsManagerPool] = None,
+            entities: Iterable[str] = ('location', 'thresholds', 'relay-devices', 'me'),
+            interval: float = 60.0,
+            host: str = '127.0.0.1',
+            port: int = 8080) -> None:
+        self.pool = pool if pool is not None else AirThingsManagerPool()
+        self.entities = list(entities)
+        self.interval = interval
+        self.host = host
+        self.port = port
+        self.responses: Dict[Tuple[str, str], AirThingsCachedResponse] = {}
+        self.subscriptions: Dict[str, List[AirThingsSubscription]] = {}
+        self.__runner: Optional[aiohttp_web.AppRunner] = None
+
+        for entity in self.entities:
+            if entity not in AirThingsManagerPool.ENTITIES:
+                raise KeyError(entity)
+
+    def add_account(self, username: str, password: str, account_id: Optional[str] = None) -> str:
+        account_id = self.pool.add_account(username=username, password=password, account_id=account_id)
+
+        if self.__runner is not None:
+            self.__subscribe(account_id)
+
+        return account_id
+
+    def remove_account(self, account_id: str) -> None:
+        self.__unsubscribe(account_id)
+        self.pool.remove_account(account_id)
+
+        for entity in self.entities:
+            self.responses.pop((account_id, entity), None)
+
+    def application(self) -> aiohttp_web.Application:
+        application = aiohttp_web.Application()
+        application.router.add_get('/{account_id}/{entity}', self.__handle_entity)
+        return application
+
+    async def start(self) -> 'AirThingsGateway':
+        for account_id in self.pool.accounts:
+            self.__subscribe(account_id)
+
+        self.__runner = aiohttp_web.AppRunner(self.application())
+        await self.__runner.setup()
+        await aiohttp_web.TCPSite(self.__runner, self.host, self.port).start()
+        # The bound port, when `port=0` let the system pick one.
+        self.port = self.__runner.addresses[0][1]
+
+        return self
+
+    async def stop(self) -> None:
+        for account_id in list(self.subscriptions):
+            self.__unsubscribe(account_id)
+
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+
+        await self.pool.close()
+
+    async def __aenter__(self) -> 'AirThingsGateway':
+        return await self.start()
+
+    async def __aexit__(self, *args) -> None:
+        await self.stop()
+
+    def __subscribe(self, account_id: str) -> None:
+        if account_id in self.subscriptions:
+            self.__unsubscribe(account_id)
+
+        manager = self.pool.get_manager(account_id)
+
+        self.subscriptions[account_id] = [
+            manager.watch(
+                entity=entity,
+                interval=self.interval,
+                select=functools.partial(self.__on_instance, account_id, entity))
+            for entity in self.entities
+        ]
+
+    def __unsubscribe(self, account_id: str) -> None:
+        for subscription in self.subscriptions.pop(account_id, []):
+            subscription.close()
+
+    def __on_instance(self, account_id: str, entity: str, instance: Any) -> Any:
+        cached = self.pool.get_manager(account_id).instance_cache.get(entity)
+
+        self.responses[(account_id, entity)] = AirThingsCachedResponse(
+            body=codec.dumps_instance(instance),
+            timestamp=to_epoch(cached.timestamp) if cached is not None else None)
+
+        return SKIP
+
+    async def __handle_entity(self, request: aiohttp_web.Request) -> aiohttp_web.Response:
+        account_id = request.match_info['account_id']
+        entity = request.match_info['entity']
+
+        if account_id not in self.pool.accounts or entity not in self.entities:
+            raise aiohttp_web.HTTPNotFound()
+
+        response = self.responses.get((account_id, entity))
+
+        if response is None:
+            raise aiohttp_web.HTTPServiceUnavailable(headers={'Retry-After': '1'})
+
+        headers = {
+            'ETag': response.etag,
+            'Last-Modified': response.last_modified,
+            'Cache-Control': 'no-cache',
+        }
+
+        if request.headers.get('If-None-Match') == response.etag:
+            return aiohttp_web.Response(status=304, headers=headers)
+
+        headers['Content-Type'] = 'application/json'
+
+        return aiohttp_web.Response(body=response.body, headers=headers)
@@ -0,0 +1,202 @@
+import datetime as dt
+import enum
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .stats import to_epoch
+from .watch import SKIP, AirThingsSubscription
+
+from ..responses import locations_instance as li
+from ..responses import relay_devices_instance as rdi
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@enum.unique
+class AirThingsHubEventType(enum.Enum):
+    HubSilent = 0
+    HubRecovered = 1
+    DeviceDropped = 2
+    DeviceRecovered = 3
+    HubRemoved = 4
+
+
+@dataclass
+class AirThingsHubEvent:
+    type_: AirThingsHubEventType
+    hub_serial_number: str
+    device_serial_number: Optional[str]
+    last_seen: dt.datetime
+
+
+class AirThingsHubState:
+    """What the monitor knows about one hub."""
+
+    def __init__(self, hub: rdi.Hub) -> None:
+        self.hub = hub
+        self.silent = False
+        self.seen_devices: Set[str] = set(hub.meta_data.last_seen_devices)
+
+    @property
+    def serial_number(self) -> str:
+        return self.hub.serial_number
+
+    @property
+    def last_seen(self) -> dt.datetime:
+        return self.hub.meta_data.last_seen
+
+    def staleness(self, now: Optional[float] = None) -> float:
+        """Seconds since the hub was last seen."""
+        return (now if now is not None else time.time()) - to_epoch(self.last_seen)
+
+
+class AirThingsHubMonitor:
+    """Hub connectivity tracked from `relay-devices`, on its own cadence.
+
+    Every `interval` seconds the monitor polls `relay-devices` through the
+    manager's shared watcher and compares each hub's `last_seen` and
+    `last_seen_devices` with the previous poll. A hub not seen for
+    `silence_threshold` goes silent; a device that leaves `last_seen_devices`
+    is reported as dropped, and a hub that leaves `relay-devices` altogether
+    is reported as removed and forgotten. Membership also includes the devices whose
+    `relay_device` names the hub in the manager's last locations instance,
+    which is read from its cache and never polled for.
+    """
+
+    def __init__(
+            self,
+            manager: Any,
+            interval: float = 300.0,
+            silence_threshold: dt.timedelta = dt.timedelta(minutes=30),
+            on_event: Optional[Callable[[AirThingsHubEvent], Any]] = None) -> None:
+        self.manager = manager
+        self.interval = interval
+        self.silence_threshold = silence_threshold.total_seconds()
+        self.on_event = on_event
+        self.hubs: Dict[str, AirThingsHubState] = {}
+        self.relayed_devices: Dict[str, Set[str]] = {}
+        self.subscription: Optional[AirThingsSubscription] = None
+        self.__locations_timestamp: Optional[dt.datetime] = None
+
+    def start(self) -> 'AirThingsHubMonitor':
+        if self.subscription is None or self.subscription.closed:
+            self.subscription = self.manager.watch(
+                entity='relay-devices',
+                interval=self.interval,
+                select=self.__on_instance)
+
+        return self
+
+    def stop(self) -> None:
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription = None
+
+    def devices_of(self, hub_serial_number: str) -> Set[str]:
+        """Devices relayed by the hub, from its metadata and from the locations' `relay_device`."""
+        state = self.hubs.get(hub_serial_number)
+        devices = set(state.hub.meta_data.devices.keys()) if state is not None else set()
+
+        return devices | self.relayed_devices.get(hub_serial_number, set())
+
+    def unreachable_devices(self) -> Dict[str, Set[str]]:
+        """Devices per hub that the hub does not currently see (all of them for a silent hub)."""
+        result: Dict[str, Set[str]] = {}
+
+        for (serial_number, state) in self.hubs.items():
+            missing = self.devices_of(serial_number) if state.silent else self.devices_of(serial_number) - state.seen_devices
+            missing.discard(serial_number)
+
+            if len(missing) > 0:
+                result[serial_number] = missing
+
+        return result
+
+    def update_locations(self, instance: li.LocationsInstance) -> None:
+        relayed: Dict[str, Set[str]] = {}
+
+        for location in instance.locations:
+            for device in location.devices:
+                if device.relay_device is not None:
+                    relayed.setdefault(device.relay_device, set()).add(device.serial_number)
+
+        self.relayed_devices = relayed
+
+    def update(self, instance: rdi.RelayDevicesInstance, now: Optional[float] = None) -> List[AirThingsHubEvent]:
+        now = now if now is not None else time.time()
+        events: List[AirThingsHubEvent] = []
+
+        cached = self.manager.instance_cache.get('location') if self.manager is not None else None
+
+        if cached is not None and cached.timestamp != self.__locations_timestamp:
+            self.__locations_timestamp = cached.timestamp
+            self.update_locations(cached.instance)
+
+        for hub in instance.hubs:
+            state = self.hubs.get(hub.serial_number)
+
+            if state is None:
+                state = AirThingsHubState(hub=hub)
+                self.hubs[hub.serial_number] = state
+                previous_devices = state.seen_devices
+            else:
+                previous_devices = state.seen_devices
+                state.hub = hub
+                state.seen_devices = set(hub.meta_data.last_seen_devices)
+
+            silent = state.staleness(now=now) >= self.silence_threshold
+
+            if silent != state.silent:
+                state.silent = silent
+                events.append(
+                    AirThingsHubEvent(
+                        type_=AirThingsHubEventType.HubSilent if silent else AirThingsHubEventType.HubRecovered,
+                        hub_serial_number=hub.serial_number,
+                        device_serial_number=None,
+                        last_seen=state.last_seen))
+
+            for device_serial_number in sorted(previous_devices - state.seen_devices):
+                events.append(
+                    AirThingsHubEvent(
+                        type_=AirThingsHubEventType.DeviceDropped,
+                        hub_serial_number=hub.serial_number,
+                        device_serial_number=device_serial_number,
+                        last_seen=state.last_seen))
+
+            for device_serial_number in sorted(state.seen_devices - previous_devices):
+                events.append(
+                    AirThingsHubEvent(
+                        type_=AirThingsHubEventType.DeviceRecovered,
+                        hub_serial_number=hub.serial_number,
+                        device_serial_number=device_serial_number,
+                        last_seen=state.last_seen))
+
+        listed = {hub.serial_number for hub in instance.hubs}
+
+        for serial_number in sorted(set(self.hubs) - listed):
+            state = self.hubs.pop(serial_number)
+            events.append(
+                AirThingsHubEvent(
+                    type_=AirThingsHubEventType.HubRemoved,
+                    hub_serial_number=serial_number,
+                    device_serial_number=None,
+                    last_seen=state.last_seen))
+
+        if self.on_event is not None:
+            for event in events:
+                try:
+                    self.on_event(event)
+
+                except Exception as error:
+                    _LOGGER.error('hub_serial_number: "{0}" | message: "on_event failed" | error: "{1!r}" | '.format(
+                        event.hub_serial_number,
+                        error))
+
+        return events
+
+    def __on_instance(self, instance: rdi.RelayDevicesInstance) -> Any:
+        self.update(instance=instance)
+        return SKIP
@@ -0,0 +1,217 @@
+import aiohttp
+import bisect
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the histogram buckets: 0.5 ms doubling up to ~65 s.
+DEFAULT_BOUNDS: Tuple[float, ...] = tuple(0.0005 * 2 ** i for i in range(18))
+
+# Path segments naming a resource rather than an endpoint: numbers, UUIDs, long hex strings.
+_ID_SEGMENT = re.compile(r'[0-9]+|[0-9a-fA-F]{8}(-?[0-9a-fA-F]{4}){3}-?[0-9a-fA-F]{12}|[0-9a-fA-F]{16,}')
+
+
+def endpoint_template(url: Any) -> str:
+    """Host and path of a `yarl.URL`, without the query and with `{id}` for identifiers.
+
+    e.g. 'web-api.airthin.gs/v1/location' for 'https://web-api.airthin.gs/v1/location?x=1'.
+    """
+    path = '/'.join('{id}' if _ID_SEGMENT.fullmatch(segment) else segment for segment in url.path.split('/'))
+    return (url.host or '') + path
+
+
+def _merge(values: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Sums the numbers of sources registered under the same name; keeps the first of anything else.
+    result: Dict[str, Any] = {}
+
+    for value in values:
+        for (key, x) in value.items():
+            if key not in result:
+                result[key] = x
+            elif isinstance(x, dict) and isinstance(result[key], dict):
+                result[key] = _merge([result[key], x])
+            elif isinstance(x, (int, float)) and not isinstance(x, bool):
+                result[key] += x
+
+    return result
+
+
+class AirThingsHistogram:
+    """Fixed-bucket histogram: `observe` is one bisect and a few additions."""
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BOUNDS) -> None:
+        self.bounds = bounds
+        # One count per bound, plus the overflow bucket.
+        self.counts: List[int] = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the `q` quantile (the maximum for the overflow bucket)."""
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        seen = 0
+
+        for (index, count) in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count > 0:
+                return min(self.bounds[index], self.maximum) if index < len(self.bounds) else self.maximum
+
+        return self.maximum
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.minimum,
+            'max': self.maximum,
+            'mean': self.total / self.count if self.count > 0 else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+
+class AirThingsMetrics:
+    """Timings and counters of one or more managers.
+
+    Durations go to histograms keyed by (name, label), e.g.
+    ('poll', 'location') or ('http.connect', 'accounts-api.airthings.com/v1/token');
+    events go to counters. `snapshot()` returns everything as plain dicts,
+    together with the `sources` registered by the managers (retry counters,
+    rate limiters): the counters of the sources sharing a name are summed,
+    so managers sharing these metrics report their totals. Callbacks get
+    every observation as `(name, label, value)`. Managers without metrics
+    skip all of it.
+    """
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BOUNDS) -> None:
+        self.bounds = bounds
+        self.histograms: Dict[Tuple[str, str], AirThingsHistogram] = {}
+        self.counters: Dict[Tuple[str, str], int] = {}
+        self.sources: Dict[str, List[Callable[[], Dict[str, Any]]]] = {}
+        self.callbacks: List[Callable[[str, str, float], Any]] = []
+
+    def add_callback(self, callback: Callable[[str, str, float], Any]) -> None:
+        self.callbacks.append(callback)
+
+    def add_source(self, name: str, source: Callable[[], Dict[str, Any]]) -> None:
+        sources = self.sources.setdefault(name, [])
+
+        # Managers of a pool share their retry policy and rate limiter: count them once.
+        if source not in sources:
+            sources.append(source)
+
+    def source_values(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: _merge([source() for source in sources])
+            for (name, sources) in self.sources.items()
+        }
+
+    def observe(self, name: str, label: str, value: float) -> None:
+        histogram = self.histograms.get((name, label))
+
+        if histogram is None:
+            histogram = AirThingsHistogram(bounds=self.bounds)
+            self.histograms[(name, label)] = histogram
+
+        histogram.observe(value)
+
+        if len(self.callbacks) > 0:
+            self.__notify(name=name, label=label, value=value)
+
+    def increment(self, name: str, label: str, value: int = 1) -> None:
+        self.counters[(name, label)] = self.counters.get((name, label), 0) + value
+
+        if len(self.callbacks) > 0:
+            self.__notify(name=name, label=label, value=value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'histograms': {
+                name + ':' + label: histogram.as_dict()
+                for ((name, label), histogram) in self.histograms.items()
+            },
+            'counters': {
+                name + ':' + label: value
+                for ((name, label), value) in self.counters.items()
+            },
+            'sources': self.source_values(),
+        }
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """aiohttp hooks timing DNS, connection set-up (TCP and TLS) and time to first byte per endpoint.
+
+        Endpoints are labelled by `endpoint_template`, so latencies of the
+        token, authorize and entity requests are told apart.
+
+        Pass it to the session: `aiohttp.ClientSession(trace_configs=[metrics.trace_config()])`.
+        """
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params) -> None:
+            context.start = time.perf_counter()
+            context.endpoint = endpoint_template(params.url)
+
+        async def on_dns_resolvehost_start(session, context, params) -> None:
+            context.dns_start = time.perf_counter()
+
+        async def on_dns_resolvehost_end(session, context, params) -> None:
+            self.observe(name='http.dns', label=context.endpoint, value=time.perf_counter() - context.dns_start)
+
+        async def on_dns_cache_hit(session, context, params) -> None:
+            self.increment(name='http.dns_cache_hit', label=context.endpoint)
+
+        async def on_connection_create_start(session, context, params) -> None:
+            context.connect_start = time.perf_counter()
+
+        async def on_connection_create_end(session, context, params) -> None:
+            self.observe(name='http.connect', label=context.endpoint, value=time.perf_counter() - context.connect_start)
+
+        async def on_connection_reuseconn(session, context, params) -> None:
+            self.increment(name='http.connection_reused', label=context.endpoint)
+
+        async def on_request_end(session, context, params) -> None:
+            self.observe(name='http.first_byte', label=context.endpoint, value=time.perf_counter() - context.start)
+            self.increment(name='http.status.{0}'.format(params.response.status), label=context.endpoint)
+
+        async def on_request_exception(session, context, params) -> None:
+            self.increment(name='http.exception', label=context.endpoint)
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+
+        return trace_config
+
+    def __notify(self, name: str, label: str, value: float) -> None:
+        for callback in self.callbacks:
+            try:
+                callback(name, label, value)
+
+            except Exception as error:
+                _LOGGER.error('name: "{0}" | label: "{1}" | message: "metrics callback failed" | error: "{2!r}" | '.format(name, label, error))
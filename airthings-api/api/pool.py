@@ -0,0 +1,217 @@
+import aiohttp
+import asyncio
+import concurrent.futures
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .web import AirThingsManager
+from .retry import AirThingsRetryPolicy
+from .circuit import AirThingsCircuitBreakers
+from .throttle import AirThingsRateLimiter
+from .metrics import AirThingsMetrics
+
+from ..responses import locations_instance as li
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AirThingsManagerPool:
+    """Many AirThings accounts polled through one shared connection pool.
+
+    Accounts share the aiohttp session (hence its connection pool), the retry
+    policy, the circuit breakers and the rate limiter. At most `max_concurrency`
+    accounts are polled at once, their start times are spread over
+    `stagger_window` seconds, and results are streamed back as they complete.
+    Failing accounts are reported through `failures` and `on_failure` without
+    holding back the others.
+    """
+
+    ENTITIES = AirThingsManager.ENTITIES
+
+    def __init__(
+            self,
+            session: Optional[aiohttp.ClientSession] = None,
+            max_concurrency: int = 100,
+            max_connections: int = 100,
+            max_connections_per_host: int = 20,
+            stagger_window: float = 0.0,
+            retry_policy: Optional[AirThingsRetryPolicy] = None,
+            circuit_breakers: Optional[AirThingsCircuitBreakers] = None,
+            rate_limiter: Optional[AirThingsRateLimiter] = None,
+            serve_stale: bool = False,
+            decode_executor: Optional[concurrent.futures.Executor] = None,
+            decode_threshold: int = 64 * 1024,
+            snapshot_directory: Optional[str] = None,
+            metrics: Optional[AirThingsMetrics] = None,
+            on_failure: Optional[Callable[[str, BaseException], Any]] = None) -> None:
+        self.session = session
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.stagger_window = stagger_window
+        self.retry_policy = retry_policy if retry_policy is not None else AirThingsRetryPolicy()
+        self.circuit_breakers = circuit_breakers if circuit_breakers is not None else AirThingsCircuitBreakers()
+        self.rate_limiter = rate_limiter
+        self.serve_stale = serve_stale
+        self.decode_executor = decode_executor
+        self.decode_threshold = decode_threshold
+        self.snapshot_directory = snapshot_directory
+        self.metrics = metrics
+        self.on_failure = on_failure
+        self.accounts: Dict[str, Tuple[str, str]] = {}
+        self.managers: Dict[str, AirThingsManager] = {}
+        self.failures: Dict[str, BaseException] = {}
+        self.__owns_session = session is None
+        self.__semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> 'AirThingsManagerPool':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self.__owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def add_account(self, username: str, password: str, account_id: Optional[str] = None) -> str:
+        account_id = account_id if account_id is not None else username
+
+        self.accounts[account_id] = (username, password)
+        self.managers.pop(account_id, None)
+
+        return account_id
+
+    def remove_account(self, account_id: str) -> None:
+        self.accounts.pop(account_id, None)
+        self.managers.pop(account_id, None)
+        self.failures.pop(account_id, None)
+
+    def get_manager(self, account_id: str) -> AirThingsManager:
+        # Managers are created lazily, from within the event loop that owns the session.
+        manager = self.managers.get(account_id)
+
+        if manager is None:
+            (username, password) = self.accounts[account_id]
+
+            manager = AirThingsManager(
+                username=username,
+                password=password,
+                session=self.__get_session(),
+                retry_policy=self.retry_policy,
+                circuit_breakers=self.circuit_breakers,
+                serve_stale=self.serve_stale,
+                rate_limiter=self.rate_limiter,
+                decode_executor=self.decode_executor,
+                decode_threshold=self.decode_threshold,
+                snapshot_directory=self.snapshot_directory,
+                metrics=self.metrics)
+
+            self.managers[account_id] = manager
+
+        return manager
+
+    async def warm_up(self, account_ids: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+        results: Dict[str, bool] = {}
+
+        async for (account_id, ready) in self.__stream(
+                account_ids=account_ids,
+                operation=lambda manager: manager.warm_up()):
+            results[account_id] = bool(ready)
+
+        return results
+
+    def iter_locations_instances(self, account_ids: Optional[Iterable[str]] = None) -> AsyncIterator[Tuple[str, li.LocationsInstance]]:
+        return self.iter_instances(entity='location', account_ids=account_ids)
+
+    def iter_instances(self, entity: str, account_ids: Optional[Iterable[str]] = None) -> AsyncIterator[Tuple[str, Any]]:
+        method = AirThingsManagerPool.ENTITIES[entity]
+
+        return self.__stream(
+            account_ids=account_ids,
+            operation=lambda manager: getattr(manager, method)())
+
+    async def __stream(self, account_ids: Optional[Iterable[str]], operation: Callable[[AirThingsManager], Any]) -> AsyncIterator[Tuple[str, Any]]:
+        account_ids = list(account_ids) if account_ids is not None else list(self.accounts.keys())
+
+        if len(account_ids) == 0:
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        tasks: List[asyncio.Future] = [
+            asyncio.ensure_future(
+                self.__run(
+                    account_id=account_id,
+                    operation=operation,
+                    delay=self.stagger_window * index / len(account_ids),
+                    queue=queue))
+            for (index, account_id) in enumerate(account_ids)
+        ]
+
+        try:
+            for _ in range(len(tasks)):
+                (account_id, result, error) = await queue.get()
+
+                if error is not None:
+                    self.__report_failure(account_id=account_id, error=error)
+                    continue
+
+                self.failures.pop(account_id, None)
+                yield (account_id, result)
+
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def __run(self, account_id: str, operation: Callable[[AirThingsManager], Any], delay: float, queue: asyncio.Queue) -> None:
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self.__semaphore:
+            try:
+                result = await operation(self.get_manager(account_id))
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as error:
+                queue.put_nowait((account_id, None, error))
+
+            else:
+                queue.put_nowait((account_id, result, None))
+
+    def __report_failure(self, account_id: str, error: BaseException) -> None:
+        self.failures[account_id] = error
+
+        _LOGGER.warning(
+            AirThingsManager.log(
+                method='__report_failure',
+                account_id=account_id,
+                error=repr(error)))
+
+        if self.on_failure is not None:
+            try:
+                self.on_failure(account_id, error)
+
+            except Exception as callback_error:
+                _LOGGER.error(
+                    AirThingsManager.log(
+                        method='on_failure',
+                        account_id=account_id,
+                        error=repr(callback_error)))
+
+    def __get_session(self) -> aiohttp.ClientSession:
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    limit_per_host=self.max_connections_per_host),
+                trace_configs=[self.metrics.trace_config()] if self.metrics is not None else None)
+
+        return self.session
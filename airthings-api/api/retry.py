@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .exceptions import (
+    AirThingsException,
+    AirThingsConnectionException,
+    AirThingsRateLimitedException,
+    AirThingsServerException,
+)
+
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AirThingsRetryCounters:
+    """Counters shared by every call executed through an `AirThingsRetryPolicy`."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.network_errors = 0
+        self.deadline_exceeded = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self.__dict__)
+
+
+class AirThingsRetryPolicy:
+    """Retry idempotent requests with exponential backoff and full jitter.
+
+    Rate limiting (429), server errors (5xx) and network errors are retried;
+    unauthorized and other client errors (4xx) are not. A `Retry-After` header,
+    when present, is used as a lower bound for the next delay. No attempt is
+    started past `deadline` seconds after the first one.
+    """
+
+    def __init__(
+            self,
+            max_attempts: int = 4,
+            base_delay: float = 0.5,
+            max_delay: float = 30.0,
+            deadline: Optional[float] = 60.0,
+            respect_retry_after: bool = True) -> None:
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.respect_retry_after = respect_retry_after
+        self.counters = AirThingsRetryCounters()
+
+    @staticmethod
+    def is_retryable(exception: BaseException) -> bool:
+        return isinstance(
+            exception,
+            (AirThingsRateLimitedException, AirThingsServerException, AirThingsConnectionException))
+
+    def compute_delay(self, attempt: int, exception: BaseException) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+        retry_after = getattr(exception, 'retry_after', None)
+
+        if self.respect_retry_after and retry_after is not None:
+            delay = max(delay, retry_after)
+
+        return delay
+
+    async def execute(self, operation: Callable[[], Awaitable[T]], method: str = '') -> T:
+        started = time.monotonic()
+        attempt = 0
+
+        self.counters.calls += 1
+
+        while True:
+            self.counters.attempts += 1
+
+            try:
+                result = await self.__run_attempt(operation=operation, started=started)
+
+            except AirThingsException as ate:
+                self.__count_error(ate)
+
+                if not AirThingsRetryPolicy.is_retryable(ate) or attempt + 1 >= self.max_attempts:
+                    self.counters.failures += 1
+                    raise
+
+                delay = self.compute_delay(attempt=attempt, exception=ate)
+
+                if self.deadline is not None and time.monotonic() - started + delay >= self.deadline:
+                    self.counters.failures += 1
+                    self.counters.deadline_exceeded += 1
+                    raise
+
+                _LOGGER.debug(
+                    'method: "{0}" | attempt: "{1}" | error_code: "{2}" | delay: "{3:.3f}" | '.format(
+                        method, attempt + 1, ate.error_code, delay))
+
+                self.counters.retries += 1
+                attempt += 1
+
+                await asyncio.sleep(delay)
+
+            else:
+                self.counters.successes += 1
+                return result
+
+    async def __run_attempt(self, operation: Callable[[], Awaitable[T]], started: float) -> Any:
+        if self.deadline is None:
+            return await operation()
+
+        remaining = self.deadline - (time.monotonic() - started)
+
+        try:
+            return await asyncio.wait_for(operation(), timeout=max(0.0, remaining))
+
+        except asyncio.TimeoutError:
+            raise AirThingsConnectionException(
+                error_code=0,
+                error_details='deadline of {0}s exceeded'.format(self.deadline))
+
+    def __count_error(self, exception: AirThingsException) -> None:
+        if isinstance(exception, AirThingsRateLimitedException):
+            self.counters.rate_limited += 1
+
+        elif isinstance(exception, AirThingsServerException):
+            self.counters.server_errors += 1
+
+        elif isinstance(exception, AirThingsConnectionException):
+            self.counters.network_errors += 1
@@ -0,0 +1,156 @@
+import asyncio
+import itertools
+import logging
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from uuid import UUID
+
+from .watch import SKIP, AirThingsSubscription
+
+from ..responses import locations_instance as li
+
+
+_LOGGER = logging.getLogger(__name__)
+
+RouteKey = Tuple[Optional[str], Optional[str], Optional[UUID]]
+
+
+class AirThingsRoute:
+    """One callback registered with `AirThingsSensorRouter`; `None` filters match anything."""
+
+    def __init__(
+            self,
+            router: 'AirThingsSensorRouter',
+            callback: Callable[[li.Location, li.Device, li.CurrentSensorValue], Any],
+            serial_number: Optional[str] = None,
+            sensor_type: Optional[str] = None,
+            location_id: Optional[UUID] = None) -> None:
+        self.router = router
+        self.callback = callback
+        self.serial_number = serial_number
+        self.sensor_type = sensor_type
+        self.location_id = location_id
+        self.calls = 0
+
+    @property
+    def key(self) -> RouteKey:
+        return (self.serial_number, self.sensor_type, self.location_id)
+
+    def cancel(self) -> None:
+        self.router.unsubscribe(self)
+
+
+class AirThingsSensorRouter:
+    """Delivers changed sensor readings to the callbacks whose filters match.
+
+    Routes are bucketed by their (serial number, sensor type, location id)
+    filter. The subscribers of a concrete reading (the union of the eight
+    wildcard combinations of its key) are computed once and kept in a routing
+    table until the subscriptions change, so a reading nobody listens to costs
+    one dictionary lookup and a changed reading costs one call per match.
+    Readings equal to the previous poll's are not delivered again, except to
+    routes added since then.
+    """
+
+    def __init__(self) -> None:
+        self.buckets: Dict[RouteKey, Tuple[AirThingsRoute, ...]] = {}
+        self.table: Dict[Tuple[str, str, UUID], Tuple[AirThingsRoute, ...]] = {}
+        self.readings: Dict[Tuple[str, str], li.CurrentSensorValue] = {}
+        self.fresh: Set[AirThingsRoute] = set()
+        self.subscription: Optional[AirThingsSubscription] = None
+        self.on_empty: Optional[Callable[[], None]] = None
+
+    def subscribe(
+            self,
+            callback: Callable[[li.Location, li.Device, li.CurrentSensorValue], Any],
+            serial_number: Optional[str] = None,
+            sensor_type: Optional[str] = None,
+            location_id: Optional[UUID] = None) -> AirThingsRoute:
+        route = AirThingsRoute(
+            router=self,
+            callback=callback,
+            serial_number=serial_number,
+            sensor_type=sensor_type,
+            location_id=location_id)
+
+        self.buckets[route.key] = self.buckets.get(route.key, ()) + (route,)
+        self.table = {}
+        self.fresh.add(route)
+
+        return route
+
+    def unsubscribe(self, route: AirThingsRoute) -> None:
+        bucket = tuple(r for r in self.buckets.get(route.key, ()) if r is not route)
+
+        if len(bucket) > 0:
+            self.buckets[route.key] = bucket
+        else:
+            self.buckets.pop(route.key, None)
+
+        self.table = {}
+        self.fresh.discard(route)
+
+        if len(self.buckets) == 0 and self.on_empty is not None:
+            self.on_empty()
+
+    def routes_for(self, serial_number: str, sensor_type: str, location_id: UUID) -> Tuple[AirThingsRoute, ...]:
+        key = (serial_number, sensor_type, location_id)
+        routes = self.table.get(key)
+
+        if routes is None:
+            routes = tuple(itertools.chain.from_iterable(
+                self.buckets.get((s, t, l), ())
+                for s in (serial_number, None)
+                for t in (sensor_type, None)
+                for l in (location_id, None)))
+
+            self.table[key] = routes
+
+        return routes
+
+    def publish(self, instance: li.LocationsInstance) -> Any:
+        """Dispatch the changed readings of `instance`; returns `SKIP` so it can serve as a watch `select`."""
+        readings = self.readings
+        routes_for = self.routes_for
+        fresh = self.fresh
+
+        for location in instance.locations:
+            for device in location.devices:
+                for sensor in device.current_sensor_values:
+                    routes = routes_for(device.serial_number, sensor.type_, device.location_id)
+
+                    if len(routes) == 0:
+                        continue
+
+                    reading_key = (device.serial_number, sensor.type_)
+
+                    if readings.get(reading_key) == sensor:
+                        if len(fresh) > 0:
+                            for route in routes:
+                                if route in fresh:
+                                    self.__call(route, location, device, sensor)
+                        continue
+
+                    readings[reading_key] = sensor
+
+                    for route in routes:
+                        self.__call(route, location, device, sensor)
+
+        self.fresh = set()
+
+        return SKIP
+
+    @staticmethod
+    def __call(route: AirThingsRoute, location: li.Location, device: li.Device, sensor: li.CurrentSensorValue) -> None:
+        route.calls += 1
+
+        try:
+            result = route.callback(location, device, sensor)
+
+            if asyncio.iscoroutine(result):
+                asyncio.ensure_future(result)
+
+        except Exception as error:
+            _LOGGER.error('serial_number: "{0}" | sensor_type: "{1}" | message: "callback failed" | error: "{2!r}" | '.format(
+                device.serial_number,
+                sensor.type_,
+                error))
@@ -0,0 +1,344 @@
+import asyncio
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import pickle
+import queue
+import zlib
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .exceptions import AirThingsWorkerException
+from .pool import AirThingsManagerPool
+from .web import AirThingsManager
+
+from ..responses import locations_instance as li
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _run_shard(shard: int, pool_options: Dict[str, Any], commands: Any, results: Any) -> None:
+    asyncio.run(
+        _serve_shard(
+            shard=shard,
+            pool_options=pool_options,
+            commands=commands,
+            results=results))
+
+
+async def _serve_shard(shard: int, pool_options: Dict[str, Any], commands: Any, results: Any) -> None:
+    loop = asyncio.get_running_loop()
+
+    # Digest of the last instance sent back per (entity, account): unchanged
+    # instances are not serialised again, the parent reuses its own copy.
+    digests: Dict[Tuple[str, str], bytes] = {}
+    current = {'sequence': 0}
+
+    def on_failure(account_id: str, error: BaseException) -> None:
+        results.put((
+            'error',
+            current['sequence'],
+            account_id,
+            (type(error).__name__, getattr(error, 'error_code', 0), getattr(error, 'error_details', repr(error)))))
+
+    async with AirThingsManagerPool(on_failure=on_failure, **pool_options) as pool:
+        while True:
+            (kind, sequence, payload) = await loop.run_in_executor(None, commands.get)
+            current['sequence'] = sequence
+
+            if kind == 'stop':
+                break
+
+            elif kind == 'accounts':
+                changed = set(pool.accounts.keys()) - set(payload.keys())
+
+                for account_id in changed:
+                    pool.remove_account(account_id)
+
+                for (account_id, credentials) in payload.items():
+                    if pool.accounts.get(account_id) != credentials:
+                        changed.add(account_id)
+                        pool.add_account(
+                            username=credentials[0],
+                            password=credentials[1],
+                            account_id=account_id)
+
+                # The parent dropped its copies of these accounts' instances.
+                for key in [key for key in digests if key[1] in changed]:
+                    del digests[key]
+
+            elif kind == 'warm_up':
+                for (account_id, ready) in (await pool.warm_up(account_ids=payload)).items():
+                    results.put(('ready', sequence, account_id, ready))
+
+            elif kind == 'poll':
+                (entity, account_ids, resend) = payload
+
+                # Instances the parent has no copy of are sent even if unchanged.
+                for account_id in resend:
+                    digests.pop((entity, account_id), None)
+
+                async for (account_id, instance) in pool.iter_instances(entity=entity, account_ids=account_ids):
+                    blob = pickle.dumps(instance, protocol=pickle.HIGHEST_PROTOCOL)
+                    digest = hashlib.blake2b(blob, digest_size=16).digest()
+
+                    if digests.get((entity, account_id)) == digest:
+                        results.put(('result', sequence, account_id, (entity, None)))
+                    else:
+                        digests[(entity, account_id)] = digest
+                        results.put(('result', sequence, account_id, (entity, blob)))
+
+            results.put(('done', sequence, None, shard))
+
+
+class AirThingsShardedPool:
+    """`AirThingsManagerPool` spread over worker processes.
+
+    Accounts are assigned to one of `processes` shards by a stable hash of their
+    id. Every shard runs its own event loop, connection pool and
+    `AirThingsManagerPool` (built from `pool_options`, so rate limits apply per
+    shard) and sends decoded instances back pickled, skipping instances that did
+    not change since the previous poll. The interface matches
+    `AirThingsManagerPool`.
+    """
+
+    def __init__(
+            self,
+            processes: Optional[int] = None,
+            on_failure: Optional[Callable[[str, BaseException], Any]] = None,
+            **pool_options: Any) -> None:
+        self.processes = processes if processes is not None else multiprocessing.cpu_count()
+        self.on_failure = on_failure
+        self.pool_options = pool_options
+        self.accounts: Dict[str, Tuple[str, str]] = {}
+        self.failures: Dict[str, BaseException] = {}
+        self.instances: Dict[Tuple[str, str], Any] = {}
+        self.__context = multiprocessing.get_context('spawn')
+        self.__workers: List[Any] = []
+        self.__commands: List[Any] = []
+        self.__results: Any = None
+        self.__dirty: Set[int] = set()
+        self.__sequence = itertools.count(1)
+        self.__lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self) -> 'AirThingsShardedPool':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    def shard_of(self, account_id: str) -> int:
+        return zlib.crc32(account_id.encode('utf-8')) % self.processes
+
+    def add_account(self, username: str, password: str, account_id: Optional[str] = None) -> str:
+        account_id = account_id if account_id is not None else username
+
+        self.accounts[account_id] = (username, password)
+        self.__dirty.add(self.shard_of(account_id))
+
+        return account_id
+
+    def remove_account(self, account_id: str) -> None:
+        if self.accounts.pop(account_id, None) is not None:
+            self.__dirty.add(self.shard_of(account_id))
+
+        self.failures.pop(account_id, None)
+
+        for key in [key for key in self.instances if key[1] == account_id]:
+            del self.instances[key]
+
+    async def warm_up(self, account_ids: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+        results: Dict[str, bool] = {}
+
+        async for (account_id, ready) in self.__stream(kind='warm_up', entity=None, account_ids=account_ids):
+            results[account_id] = bool(ready)
+
+        return results
+
+    def iter_locations_instances(self, account_ids: Optional[Iterable[str]] = None) -> AsyncIterator[Tuple[str, li.LocationsInstance]]:
+        return self.iter_instances(entity='location', account_ids=account_ids)
+
+    def iter_instances(self, entity: str, account_ids: Optional[Iterable[str]] = None) -> AsyncIterator[Tuple[str, Any]]:
+        if entity not in AirThingsManagerPool.ENTITIES:
+            raise KeyError(entity)
+
+        return self.__stream(kind='poll', entity=entity, account_ids=account_ids)
+
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        for commands in self.__commands:
+            commands.put(('stop', 0, None))
+
+        for worker in self.__workers:
+            await loop.run_in_executor(None, worker.join)
+
+        self.__workers = []
+        self.__commands = []
+        self.__results = None
+
+    async def __stream(self, kind: str, entity: Optional[str], account_ids: Optional[Iterable[str]]) -> AsyncIterator[Tuple[str, Any]]:
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+
+        async with self.__lock:
+            self.__start()
+
+            loop = asyncio.get_running_loop()
+            sequence = next(self.__sequence)
+
+            shards: Dict[int, List[str]] = {}
+
+            for account_id in (list(account_ids) if account_ids is not None else list(self.accounts.keys())):
+                shards.setdefault(self.shard_of(account_id), []).append(account_id)
+
+            for (shard, shard_account_ids) in shards.items():
+                self.__send(kind=kind, sequence=sequence, shard=shard, entity=entity, account_ids=shard_account_ids)
+
+            # Commands sent to each shard that it has not reported done yet.
+            pending = {shard: 1 for shard in shards}
+
+            while len(pending) > 0:
+                try:
+                    (message, message_sequence, account_id, payload) = await loop.run_in_executor(
+                        None,
+                        self.__get_result)
+
+                except queue.Empty:
+                    # A worker that died will never report back: fail its accounts.
+                    for shard in [shard for shard in pending if not self.__workers[shard].is_alive()]:
+                        del pending[shard]
+
+                        for account_id in shards[shard]:
+                            self.__report_failure(
+                                account_id=account_id,
+                                error=AirThingsWorkerException(
+                                    error_code=self.__workers[shard].exitcode or 0,
+                                    error_details='worker process {0} exited'.format(shard),
+                                    error_type='WorkerExited'))
+
+                    continue
+
+                if message == 'result':
+                    # Keep every instance, even from an abandoned stream: the
+                    # worker will not send it again while it is unchanged.
+                    (message_entity, blob) = payload
+
+                    if blob is not None:
+                        self.instances[(message_entity, account_id)] = pickle.loads(blob)
+
+                if message_sequence != sequence:
+                    continue
+
+                if message == 'done':
+                    pending[payload] = pending.get(payload, 1) - 1
+
+                    if pending[payload] <= 0:
+                        del pending[payload]
+
+                elif message == 'ready':
+                    yield (account_id, payload)
+
+                elif message == 'error':
+                    (error_type, error_code, error_details) = payload
+
+                    self.__report_failure(
+                        account_id=account_id,
+                        error=AirThingsWorkerException(
+                            error_code=error_code,
+                            error_details=error_details,
+                            error_type=error_type))
+
+                elif message == 'result':
+                    instance = self.instances.get((entity, account_id))
+
+                    if instance is None:
+                        # Reported unchanged but our copy is gone (the account was
+                        # removed and added back during the stream): ask for it again.
+                        shard = self.shard_of(account_id)
+                        self.__send(kind=kind, sequence=sequence, shard=shard, entity=entity, account_ids=[account_id])
+                        pending[shard] = pending.get(shard, 0) + 1
+                        continue
+
+                    self.failures.pop(account_id, None)
+                    yield (account_id, instance)
+
+    def __send(self, kind: str, sequence: int, shard: int, entity: Optional[str], account_ids: List[str]) -> None:
+        if kind == 'warm_up':
+            payload: Any = account_ids
+        else:
+            payload = (entity, account_ids, [account_id for account_id in account_ids if (entity, account_id) not in self.instances])
+
+        self.__commands[shard].put((kind, sequence, payload))
+
+    def __get_result(self) -> Tuple[str, int, Optional[str], Any]:
+        return self.__results.get(timeout=1.0)
+
+    def __start(self) -> None:
+        if len(self.__workers) > 0 and not all(worker.is_alive() for worker in self.__workers):
+            _LOGGER.warning(
+                AirThingsManager.log(
+                    method='__start',
+                    message='restarting worker processes'))
+
+            for worker in self.__workers:
+                worker.terminate()
+
+            self.__workers = []
+            self.__commands = []
+
+        if len(self.__workers) == 0:
+            self.__results = self.__context.Queue()
+
+            for shard in range(self.processes):
+                commands = self.__context.Queue()
+
+                worker = self.__context.Process(
+                    target=_run_shard,
+                    kwargs={
+                        'shard': shard,
+                        'pool_options': self.pool_options,
+                        'commands': commands,
+                        'results': self.__results,
+                    },
+                    daemon=True)
+
+                worker.start()
+
+                self.__workers.append(worker)
+                self.__commands.append(commands)
+
+            self.__dirty = set(range(self.processes))
+
+        for shard in self.__dirty:
+            self.__commands[shard].put((
+                'accounts',
+                0,
+                {
+                    account_id: credentials
+                    for (account_id, credentials) in self.accounts.items()
+                    if self.shard_of(account_id) == shard
+                }))
+
+        self.__dirty = set()
+
+    def __report_failure(self, account_id: str, error: BaseException) -> None:
+        self.failures[account_id] = error
+
+        _LOGGER.warning(
+            AirThingsManager.log(
+                method='__report_failure',
+                account_id=account_id,
+                error=repr(error)))
+
+        if self.on_failure is not None:
+            try:
+                self.on_failure(account_id, error)
+
+            except Exception as callback_error:
+                _LOGGER.error(
+                    AirThingsManager.log(
+                        method='on_failure',
+                        account_id=account_id,
+                        error=repr(callback_error)))
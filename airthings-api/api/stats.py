@@ -0,0 +1,312 @@
+import collections
+import datetime as dt
+import math
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from ..responses import locations_instance as li
+
+
+def to_epoch(x: dt.datetime) -> float:
+    # Naive datetimes from the API are UTC.
+    if x.tzinfo is None:
+        x = x.replace(tzinfo=dt.timezone.utc)
+    return x.timestamp()
+
+
+class AirThingsRollingStatistics:
+    """Streaming statistics of one series of readings.
+
+    `count`, `mean`, `variance`/`stddev` (Welford's algorithm), `minimum` and
+    `maximum` cover every sample seen; `window_*` cover the samples of the
+    last `window` seconds, kept as running sums over `bucket_count` time
+    buckets. Samples leave the window when newer ones are added, or when
+    `expire(now)` is called (as `as_dict(now)` does) for series that went
+    quiet. Updates are amortised O(1), reads are O(1).
+    """
+
+    def __init__(self, window: float = 86400.0, bucket_count: int = 24) -> None:
+        self.window = window
+        self.bucket_seconds = window / bucket_count
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self.last: Optional[float] = None
+        self.last_timestamp: Optional[float] = None
+        self.window_count = 0
+        self.window_total = 0.0
+        self.window_total_sq = 0.0
+        # [bucket start, count, total, total of squares], oldest first.
+        self.buckets: Deque[List[Any]] = collections.deque()
+
+    @property
+    def variance(self) -> Optional[float]:
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def stddev(self) -> Optional[float]:
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    @property
+    def window_mean(self) -> Optional[float]:
+        return self.window_total / self.window_count if self.window_count > 0 else None
+
+    @property
+    def window_stddev(self) -> Optional[float]:
+        if self.window_count < 2:
+            return None
+        mean = self.window_total / self.window_count
+        variance = (self.window_total_sq - self.window_count * mean * mean) / (self.window_count - 1)
+        return math.sqrt(max(0.0, variance))
+
+    def add(self, value: float, timestamp: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+        if self.last_timestamp is None or timestamp >= self.last_timestamp:
+            self.last = value
+            self.last_timestamp = timestamp
+
+        self.__add_to_window(value=value, timestamp=timestamp)
+        self.expire(now=self.last_timestamp)
+
+    def expire(self, now: float) -> None:
+        """Drop the window buckets older than `window` seconds before `now`."""
+        buckets = self.buckets
+        horizon = now - self.window
+
+        while len(buckets) > 0 and buckets[0][0] + self.bucket_seconds <= horizon:
+            (_, count, total, total_sq) = buckets.popleft()
+            self.window_count -= count
+            self.window_total -= total
+            self.window_total_sq -= total_sq
+
+        if len(buckets) == 0:
+            # Let rounding errors go with the last bucket.
+            self.window_count = 0
+            self.window_total = 0.0
+            self.window_total_sq = 0.0
+
+    def as_dict(self, now: Optional[float] = None) -> Dict[str, Optional[float]]:
+        if now is not None:
+            self.expire(now=now)
+
+        return {
+            'count': self.count,
+            'mean': self.mean if self.count > 0 else None,
+            'stddev': self.stddev,
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+            'last': self.last,
+            'window_count': self.window_count,
+            'window_mean': self.window_mean,
+            'window_stddev': self.window_stddev,
+        }
+
+    def __add_to_window(self, value: float, timestamp: float) -> None:
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp - self.window:
+            return
+
+        start = math.floor(timestamp / self.bucket_seconds) * self.bucket_seconds
+        buckets = self.buckets
+
+        if len(buckets) == 0 or start > buckets[-1][0]:
+            buckets.append([start, 0, 0.0, 0.0])
+            bucket = buckets[-1]
+
+        else:
+            # Late sample: walk back to its bucket, at most `bucket_count` steps.
+            bucket = None
+            for (index, candidate) in enumerate(reversed(buckets)):
+                if candidate[0] == start:
+                    bucket = candidate
+                    break
+                if candidate[0] < start:
+                    bucket = [start, 0, 0.0, 0.0]
+                    buckets.insert(len(buckets) - index, bucket)
+                    break
+
+            if bucket is None:
+                bucket = [start, 0, 0.0, 0.0]
+                buckets.appendleft(bucket)
+
+        bucket[1] += 1
+        bucket[2] += value
+        bucket[3] += value * value
+
+        self.window_count += 1
+        self.window_total += value
+        self.window_total_sq += value * value
+
+
+class AirThingsLocationStatistics(AirThingsRollingStatistics):
+    """Rolling statistics of one sensor type over all devices of a location.
+
+    On top of the pooled statistics, `current_mean` is the mean of the
+    devices' latest readings, maintained incrementally. A device whose latest
+    reading is older than `window` seconds leaves it on `expire`.
+    """
+
+    def __init__(self, window: float = 86400.0, bucket_count: int = 24) -> None:
+        super().__init__(window=window, bucket_count=bucket_count)
+        self.current: Dict[str, float] = {}
+        self.current_timestamps: Dict[str, float] = {}
+        self.current_total = 0.0
+        # Lower bound of `current_timestamps`, so that most expiries skip the scan.
+        self.__oldest_current = math.inf
+
+    @property
+    def current_mean(self) -> Optional[float]:
+        return self.current_total / len(self.current) if len(self.current) > 0 else None
+
+    def set_current(self, serial_number: str, value: float, timestamp: float) -> None:
+        self.current_total += value - self.current.get(serial_number, 0.0)
+        self.current[serial_number] = value
+        self.current_timestamps[serial_number] = timestamp
+        self.__oldest_current = min(self.__oldest_current, timestamp)
+
+    def expire(self, now: float) -> None:
+        super().expire(now=now)
+
+        horizon = now - self.window
+
+        if self.__oldest_current > horizon:
+            return
+
+        for serial_number in [s for (s, timestamp) in self.current_timestamps.items() if timestamp <= horizon]:
+            self.current_total -= self.current.pop(serial_number)
+            del self.current_timestamps[serial_number]
+
+        if len(self.current) == 0:
+            self.current_total = 0.0
+
+        self.__oldest_current = min(self.current_timestamps.values(), default=math.inf)
+
+    def as_dict(self, now: Optional[float] = None) -> Dict[str, Optional[float]]:
+        result = super().as_dict(now=now)
+        result['current_mean'] = self.current_mean
+        return result
+
+
+class AirThingsStatisticsEngine:
+    """Rolling statistics per (serial number, sensor type) and per (location id, sensor type).
+
+    Feed it whole instances with `update` (devices whose `latest_sample` did not
+    move are skipped) or single readings with `on_reading`, which has the
+    signature of a `subscribe_readings` callback and so only sees changed values.
+
+    Windows are expired as of `now` (default: the current time) by `device`,
+    `location` and `expire`, which also drops the statistics of sensors that
+    sent nothing for a whole window: `device` and `location` then return `None`.
+    `update` and `add` only touch the statistics of the new readings;
+    `expire` visits them all, and is meant to be called periodically to free
+    the statistics of sensors nobody reads any more.
+    """
+
+    def __init__(self, window: dt.timedelta = dt.timedelta(hours=24), bucket_count: int = 24) -> None:
+        self.window = window.total_seconds()
+        self.bucket_count = bucket_count
+        self.devices: Dict[Tuple[str, str], AirThingsRollingStatistics] = {}
+        self.locations: Dict[Tuple[UUID, str], AirThingsLocationStatistics] = {}
+        self.samples: Dict[str, Optional[dt.datetime]] = {}
+
+    def device(self, serial_number: str, sensor_type: str, now: Optional[dt.datetime] = None) -> Optional[AirThingsRollingStatistics]:
+        return self.__get_live(self.devices, (serial_number, sensor_type), now=now)
+
+    def location(self, location_id: UUID, sensor_type: str, now: Optional[dt.datetime] = None) -> Optional[AirThingsLocationStatistics]:
+        return self.__get_live(self.locations, (location_id, sensor_type), now=now)
+
+    def expire(self, now: Optional[dt.datetime] = None) -> int:
+        """Expire every window as of `now` and drop silent sensors; returns the number of statistics dropped."""
+        timestamp = to_epoch(now if now is not None else dt.datetime.utcnow())
+        dropped = 0
+
+        for entries in (self.devices, self.locations):
+            for key in [key for (key, statistics) in entries.items() if self.__expire(statistics, timestamp)]:
+                del entries[key]
+                dropped += 1
+
+        live = {serial_number for (serial_number, _) in self.devices}
+
+        for serial_number in [s for s in self.samples if s not in live]:
+            del self.samples[serial_number]
+
+        return dropped
+
+    def update(self, instance: li.LocationsInstance, now: Optional[dt.datetime] = None) -> int:
+        """Fold the new samples of `instance` in; returns the number of readings added."""
+        now = now if now is not None else dt.datetime.utcnow()
+        added = 0
+
+        for location in instance.locations:
+            for device in location.devices:
+                if device.latest_sample is not None and self.samples.get(device.serial_number) == device.latest_sample:
+                    continue
+
+                self.samples[device.serial_number] = device.latest_sample
+                timestamp = to_epoch(device.latest_sample if device.latest_sample is not None else now)
+
+                for sensor in device.current_sensor_values:
+                    if sensor.value is not None:
+                        self.add(
+                            serial_number=device.serial_number,
+                            location_id=device.location_id,
+                            sensor_type=sensor.type_,
+                            value=sensor.value,
+                            timestamp=timestamp)
+                        added += 1
+
+        return added
+
+    def on_reading(self, location: li.Location, device: li.Device, sensor: li.CurrentSensorValue) -> None:
+        if sensor.value is not None:
+            self.add(
+                serial_number=device.serial_number,
+                location_id=device.location_id,
+                sensor_type=sensor.type_,
+                value=sensor.value,
+                timestamp=to_epoch(device.latest_sample if device.latest_sample is not None else dt.datetime.utcnow()))
+
+    def add(self, serial_number: str, location_id: UUID, sensor_type: str, value: float, timestamp: float) -> None:
+        device_statistics = self.devices.get((serial_number, sensor_type))
+
+        if device_statistics is None:
+            device_statistics = AirThingsRollingStatistics(window=self.window, bucket_count=self.bucket_count)
+            self.devices[(serial_number, sensor_type)] = device_statistics
+
+        location_statistics = self.locations.get((location_id, sensor_type))
+
+        if location_statistics is None:
+            location_statistics = AirThingsLocationStatistics(window=self.window, bucket_count=self.bucket_count)
+            self.locations[(location_id, sensor_type)] = location_statistics
+
+        device_statistics.add(value=value, timestamp=timestamp)
+        location_statistics.add(value=value, timestamp=timestamp)
+        location_statistics.set_current(
+            serial_number=serial_number,
+            value=device_statistics.last,
+            timestamp=device_statistics.last_timestamp)
+
+    def __get_live(self, entries: Dict[Any, Any], key: Any, now: Optional[dt.datetime]) -> Any:
+        statistics = entries.get(key)
+
+        if statistics is not None and self.__expire(statistics, to_epoch(now if now is not None else dt.datetime.utcnow())):
+            del entries[key]
+            return None
+
+        return statistics
+
+    def __expire(self, statistics: AirThingsRollingStatistics, timestamp: float) -> bool:
+        # True when the series had no sample for a whole window.
+        statistics.expire(now=timestamp)
+        return statistics.last_timestamp is None or statistics.last_timestamp <= timestamp - self.window
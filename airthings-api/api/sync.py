@@ -0,0 +1,198 @@
+import aiohttp
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .cache import AirThingsCachedInstance
+from .metrics import AirThingsMetrics
+from .web import AirThingsManager
+
+from ..responses import relay_devices_instance as rdi
+from ..responses import locations_instance as li
+from ..responses import thresholds_instance as ti
+from ..responses import me_instance as mi
+
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AirThingsSyncManager:
+    """Blocking facade over one `AirThingsManager`, for synchronous code.
+
+    The manager, its aiohttp session (hence its pooled connections) and its
+    tokens live on an event loop run by a background thread owned by this
+    object. Blocking calls can be made from any number of threads: they are
+    handed over to that loop, and concurrent calls for the same entity share
+    one poll. `timeout` (seconds) bounds how long a call blocks.
+    `session_factory`, when given, is called on the loop to create the session
+    (or a transport, see `AirThingsReplayTransport`).
+    """
+
+    def __init__(
+            self,
+            username: str,
+            password: str,
+            timeout: Optional[float] = None,
+            max_connections: int = 20,
+            metrics: Optional[AirThingsMetrics] = None,
+            session_factory: Optional[Callable[[], Any]] = None,
+            **kwargs) -> None:
+        self.timeout = timeout
+        self.loop = asyncio.new_event_loop()
+        self.manager: Optional[AirThingsManager] = None
+        self.__inflight: Dict[str, asyncio.Future] = {}
+        self.__closed = False
+        self.__thread = threading.Thread(
+            target=self.__run_loop,
+            name='airthings-{0}'.format(username),
+            daemon=True)
+
+        self.__thread.start()
+
+        try:
+            self.manager = self.run(
+                self.__create_manager(
+                    username=username,
+                    password=password,
+                    max_connections=max_connections,
+                    metrics=metrics,
+                    session_factory=session_factory,
+                    kwargs=kwargs))
+
+        except BaseException:
+            # Nothing to close yet: do not leave the thread and its loop behind.
+            self.__stop_loop()
+            raise
+
+    def __enter__(self) -> 'AirThingsSyncManager':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self.__closed
+
+    def run(self, awaitable: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Run `awaitable` on the background loop and block until it completes."""
+        error = None
+
+        if self.__closed:
+            error = RuntimeError('AirThingsSyncManager is closed')
+        elif threading.current_thread() is self.__thread:
+            error = RuntimeError('blocking call from the AirThingsSyncManager event loop thread')
+
+        if error is not None:
+            if asyncio.iscoroutine(awaitable):
+                # Never to be awaited: close it rather than leak a warning.
+                awaitable.close()
+            raise error
+
+        future = asyncio.run_coroutine_threadsafe(self.__await(awaitable), self.loop)
+
+        try:
+            return future.result(timeout if timeout is not None else self.timeout)
+
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def get_relay_devices_instance(self, timeout: Optional[float] = None) -> rdi.RelayDevicesInstance:
+        return self.run(self.__get_shared('relay-devices'), timeout=timeout)
+
+    def get_locations_instance(self, timeout: Optional[float] = None) -> li.LocationsInstance:
+        return self.run(self.__get_shared('location'), timeout=timeout)
+
+    def get_thresholds_instance(self, timeout: Optional[float] = None) -> ti.ThresholdsInstance:
+        return self.run(self.__get_shared('thresholds'), timeout=timeout)
+
+    def get_me_instance(self, timeout: Optional[float] = None) -> mi.MeInstance:
+        return self.run(self.__get_shared('me'), timeout=timeout)
+
+    def get_cached_instance(self, entity: str, refresh: bool = False) -> Optional[AirThingsCachedInstance]:
+        return self.run(self.__get_cached_instance(entity=entity, refresh=refresh))
+
+    def validate_credentials(self, timeout: Optional[float] = None) -> bool:
+        return self.run(self.manager.validate_credentials(), timeout=timeout)
+
+    def warm_up(self, timeout: Optional[float] = None) -> Optional[bool]:
+        return self.run(self.manager.warm_up(), timeout=timeout)
+
+    def close(self) -> None:
+        if self.__closed:
+            return
+
+        try:
+            self.run(self.__close_session())
+        finally:
+            self.__stop_loop()
+
+    def __stop_loop(self) -> None:
+        self.__closed = True
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.__thread.join()
+        self.loop.close()
+
+    def __run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def __await(self, awaitable: Awaitable[T]) -> T:
+        return await awaitable
+
+    async def __create_manager(
+            self,
+            username: str,
+            password: str,
+            max_connections: int,
+            metrics: Optional[AirThingsMetrics],
+            session_factory: Optional[Callable[[], Any]],
+            kwargs: Dict[str, Any]) -> AirThingsManager:
+        # The session must be created from within the loop that will use it.
+        if session_factory is not None:
+            session = session_factory()
+        else:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=max_connections),
+                trace_configs=[metrics.trace_config()] if metrics is not None else None)
+
+        try:
+            return AirThingsManager(
+                username=username,
+                password=password,
+                session=session,
+                metrics=metrics,
+                **kwargs)
+
+        except BaseException:
+            await session.close()
+            raise
+
+    async def __close_session(self) -> None:
+        # Background refreshes and pollers die with the loop.
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.manager.session.close()
+
+    async def __get_cached_instance(self, entity: str, refresh: bool) -> Optional[AirThingsCachedInstance]:
+        return self.manager.get_cached_instance(entity=entity, refresh=refresh)
+
+    async def __get_shared(self, entity: str) -> Any:
+        # Callers arriving while a poll of the entity is running get its result.
+        future = self.__inflight.get(entity)
+
+        if future is None:
+            future = asyncio.ensure_future(getattr(self.manager, AirThingsManager.ENTITIES[entity])())
+            self.__inflight[entity] = future
+            future.add_done_callback(lambda _: self.__inflight.pop(entity, None))
+
+        return await asyncio.shield(future)
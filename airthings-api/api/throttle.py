@@ -0,0 +1,101 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from .exceptions import AirThingsThrottledException
+
+
+class AirThingsTokenBucket:
+    """Token bucket with first-come first-served reservations.
+
+    Every caller reserves the next free slot (virtual scheduling), so waiters are
+    served in arrival order and a burst of `capacity` requests goes through
+    immediately. A caller whose slot is further than `max_wait` seconds away is
+    rejected with `AirThingsThrottledException` instead of queueing. A caller
+    cancelled while it waits gives its slot back.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float = 1.0, max_wait: Optional[float] = 30.0) -> None:
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+
+        self.name = name
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.max_wait = max_wait
+        self.acquired = 0
+        self.rejected = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.__next_slot = 0.0
+
+    async def acquire(self) -> float:
+        now = time.monotonic()
+        interval = 1.0 / self.rate
+
+        next_slot = max(self.__next_slot, now)
+        delay = max(0.0, next_slot - (self.capacity - 1.0) * interval - now)
+
+        if self.max_wait is not None and delay > self.max_wait:
+            self.rejected += 1
+            raise AirThingsThrottledException(
+                error_code=0,
+                error_details='rate limiter "{0}" would wait {1:.3f}s'.format(self.name, delay),
+                retry_in=delay - self.max_wait)
+
+        self.__next_slot = next_slot + interval
+        self.acquired += 1
+
+        if delay > 0:
+            self.waited += 1
+            self.total_wait += delay
+
+            try:
+                await asyncio.sleep(delay)
+
+            except asyncio.CancelledError:
+                # Give the slot back, so that later callers are not pushed back by it.
+                self.__next_slot -= interval
+                self.acquired -= 1
+                self.waited -= 1
+                self.total_wait -= delay
+                raise
+
+        return delay
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            'acquired': self.acquired,
+            'rejected': self.rejected,
+            'waited': self.waited,
+            'total_wait': self.total_wait,
+        }
+
+
+class AirThingsRateLimiter:
+    """Rate limits shared by any number of managers, one bucket per API."""
+
+    def __init__(
+            self,
+            accounts_rate: float = 2.0,
+            accounts_burst: float = 10.0,
+            web_rate: float = 10.0,
+            web_burst: float = 50.0,
+            max_wait: Optional[float] = 30.0) -> None:
+        self.accounts = AirThingsTokenBucket(
+            name='accounts',
+            rate=accounts_rate,
+            capacity=accounts_burst,
+            max_wait=max_wait)
+
+        self.web = AirThingsTokenBucket(
+            name='web',
+            rate=web_rate,
+            capacity=web_burst,
+            max_wait=max_wait)
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {
+            'accounts': self.accounts.as_dict(),
+            'web': self.web.as_dict(),
+        }
@@ -0,0 +1,367 @@
+import abc
+import aiohttp
+import asyncio
+import base64
+import collections
+import contextlib
+import gzip
+import hashlib
+import json
+import logging
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Tuple
+from urllib import parse as up
+
+from multidict import CIMultiDict
+
+
+_LOGGER = logging.getLogger(__name__)
+
+SCRUBBED = 'scrubbed'
+
+# Request/response JSON fields and URL parameters that carry credentials or tokens.
+SCRUBBED_FIELDS = frozenset([
+    'username',
+    'password',
+    'client_secret',
+    'code',
+    'access_token',
+    'refresh_token',
+])
+
+# Response headers kept in cassettes; the client ignores the others. Request
+# headers (hence bearer tokens) are not recorded.
+RECORDED_HEADERS = ('content-type', 'retry-after')
+
+
+def exchange_key(method: str, url: str) -> Tuple[str, str]:
+    # Hosts are left out so that cassettes replay whatever the API roots are.
+    parts = up.urlsplit(url)
+    return (method.upper(), parts.path + ('?' + parts.query if parts.query else ''))
+
+
+def scrub_json(value: Any, fields: Iterable[str] = SCRUBBED_FIELDS) -> Any:
+    if not isinstance(value, dict):
+        return value
+
+    result = {}
+    for (key, item) in value.items():
+        if key in fields:
+            result[key] = SCRUBBED
+        elif key == 'redirect_uri' and isinstance(item, str):
+            result[key] = scrub_url(item, fields)
+        else:
+            result[key] = item
+
+    return result
+
+
+def scrub_url(url: str, fields: Iterable[str] = SCRUBBED_FIELDS) -> str:
+    parts = up.urlsplit(url)
+
+    query = up.parse_qsl(parts.query, keep_blank_values=True)
+
+    if not any(key in fields for (key, _) in query):
+        return url
+
+    query = [(key, SCRUBBED if key in fields else value) for (key, value) in query]
+
+    return up.urlunsplit(parts._replace(query=up.urlencode(query, safe='/:')))
+
+
+def scrub_body(body: bytes, fields: Iterable[str] = SCRUBBED_FIELDS) -> bytes:
+    # Only the (small) accounts API answers hold tokens, at their top level.
+    stripped = body.lstrip()
+
+    if not stripped.startswith(b'{') or len(body) > 64 * 1024:
+        return body
+
+    try:
+        value = json.loads(body)
+    except ValueError:
+        return body
+
+    if not isinstance(value, dict) or not any(key in fields or key == 'redirect_uri' for key in value):
+        return body
+
+    return json.dumps(scrub_json(value, fields)).encode('utf-8')
+
+
+class AirThingsExchange:
+    """One recorded request and its response (or connection error).
+
+    `elapsed` is the time the response took, in seconds. Bodies are held by
+    their digest in the cassette.
+    """
+
+    __slots__ = ('method', 'url', 'request', 'status', 'headers', 'body', 'error', 'elapsed')
+
+    def __init__(
+            self,
+            method: str,
+            url: str,
+            request: Any = None,
+            status: int = 0,
+            headers: Optional[Dict[str, str]] = None,
+            body: Optional[str] = None,
+            error: Optional[str] = None,
+            elapsed: float = 0.0) -> None:
+        self.method = method
+        self.url = url
+        self.request = request
+        self.status = status
+        self.headers = headers if headers is not None else {}
+        self.body = body
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return exchange_key(self.method, self.url)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @staticmethod
+    def from_dict(obj: Dict[str, Any]) -> 'AirThingsExchange':
+        return AirThingsExchange(**{slot: obj.get(slot) for slot in AirThingsExchange.__slots__ if slot in obj})
+
+
+class AirThingsCassette:
+    """Recorded exchanges with the AirThings APIs, stored as gzipped JSON.
+
+    Identical response bodies (a location polled every minute rarely changes)
+    are stored once, so long recordings stay compact.
+    """
+
+    VERSION = 1
+
+    def __init__(self) -> None:
+        self.exchanges: List[AirThingsExchange] = []
+        self.bodies: Dict[str, bytes] = {}
+
+    def __len__(self) -> int:
+        return len(self.exchanges)
+
+    def add(self, exchange: AirThingsExchange, body: Optional[bytes] = None) -> None:
+        if body is not None:
+            digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+            self.bodies.setdefault(digest, body)
+            exchange.body = digest
+
+        self.exchanges.append(exchange)
+
+    def body_of(self, exchange: AirThingsExchange) -> bytes:
+        return self.bodies.get(exchange.body, b'') if exchange.body is not None else b''
+
+    def latest_bodies(self) -> Dict[Tuple[str, str], bytes]:
+        """Body of the last successful response of every (method, path)."""
+        return {
+            exchange.key: self.body_of(exchange)
+            for exchange in self.exchanges
+            if 200 <= exchange.status < 300
+        }
+
+    def save(self, path: str) -> None:
+        document = {
+            'version': AirThingsCassette.VERSION,
+            'bodies': {digest: AirThingsCassette.__encode_body(body) for (digest, body) in self.bodies.items()},
+            'exchanges': [exchange.to_dict() for exchange in self.exchanges],
+        }
+
+        with gzip.open(path, 'wt', encoding='utf-8') as fh:
+            json.dump(document, fh, separators=(',', ':'))
+
+    @staticmethod
+    def load(path: str) -> 'AirThingsCassette':
+        with gzip.open(path, 'rt', encoding='utf-8') as fh:
+            document = json.load(fh)
+
+        if document.get('version') != AirThingsCassette.VERSION:
+            raise ValueError('unsupported cassette version: {0!r}'.format(document.get('version')))
+
+        cassette = AirThingsCassette()
+        cassette.bodies = {digest: AirThingsCassette.__decode_body(body) for (digest, body) in document['bodies'].items()}
+        cassette.exchanges = [AirThingsExchange.from_dict(obj) for obj in document['exchanges']]
+
+        return cassette
+
+    @staticmethod
+    def __encode_body(body: bytes) -> Any:
+        try:
+            return body.decode('utf-8')
+        except UnicodeDecodeError:
+            return {'base64': base64.b64encode(body).decode('ascii')}
+
+    @staticmethod
+    def __decode_body(body: Any) -> bytes:
+        if isinstance(body, dict):
+            return base64.b64decode(body['base64'])
+        return body.encode('utf-8')
+
+
+class AirThingsTransportResponse:
+    """The parts of `aiohttp.ClientResponse` the manager uses, over bytes in memory."""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes) -> None:
+        self.status = status
+        self.headers = CIMultiDict(headers)
+        self.body = body
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self, encoding: str = 'utf-8') -> str:
+        return self.body.decode(encoding, errors='replace')
+
+    async def json(self) -> Any:
+        return json.loads(self.body)
+
+
+class AirThingsTransport(abc.ABC):
+    """Base of the transports the manager can use in place of its aiohttp session.
+
+    A transport answers `request()` (and `head()`) like `aiohttp.ClientSession`
+    does, which is all `AirThingsManager` and `AirThingsManagerPool` need: pass
+    it as their `session`.
+    """
+
+    closed = False
+
+    @abc.abstractmethod
+    def request(self, method: str, url: str, **kwargs) -> Any:
+        """Async context manager yielding the response, like `aiohttp.ClientSession.request`."""
+
+    def head(self, url: str, **kwargs) -> Any:
+        return self.request('HEAD', url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> Any:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> Any:
+        return self.request('POST', url, **kwargs)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class AirThingsRecordingTransport(AirThingsTransport):
+    """Sends requests through a real session and records them to a cassette.
+
+    Credentials and tokens (`SCRUBBED_FIELDS` in request and token response
+    bodies and in URLs, such as the authorization code of redirect URIs) are
+    replaced by `'scrubbed'` before anything is recorded, and request headers
+    are not recorded at all.
+    """
+
+    def __init__(
+            self,
+            session: aiohttp.ClientSession,
+            cassette: Optional[AirThingsCassette] = None,
+            scrubbed_fields: Iterable[str] = SCRUBBED_FIELDS) -> None:
+        self.session = session
+        self.cassette = cassette if cassette is not None else AirThingsCassette()
+        self.scrubbed_fields = frozenset(scrubbed_fields)
+
+    @property
+    def closed(self) -> bool:
+        return self.session.closed
+
+    async def close(self) -> None:
+        await self.session.close()
+
+    def save(self, path: str) -> None:
+        self.cassette.save(path)
+
+    @contextlib.asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs) -> AsyncIterator[AirThingsTransportResponse]:
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+
+        exchange = AirThingsExchange(
+            method=method.upper(),
+            url=scrub_url(url, self.scrubbed_fields),
+            request=scrub_json(kwargs.get('json'), self.scrubbed_fields))
+
+        try:
+            async with self.session.request(method, url, **kwargs) as response:
+                body = await response.read()
+                exchange.status = response.status
+                exchange.headers = {
+                    name: response.headers[name]
+                    for name in RECORDED_HEADERS
+                    if name in response.headers
+                }
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            exchange.error = repr(error)
+            exchange.elapsed = loop.time() - start
+            self.cassette.add(exchange)
+            raise
+
+        exchange.elapsed = loop.time() - start
+        self.cassette.add(exchange, scrub_body(body, self.scrubbed_fields))
+
+        yield AirThingsTransportResponse(status=exchange.status, headers=exchange.headers, body=body)
+
+
+class AirThingsReplayTransport(AirThingsTransport):
+    """Answers requests from a cassette, without network access.
+
+    Requests are matched on method and path (hosts are ignored) and each match
+    returns the next recorded exchange for it, in recording order, so a
+    client sending the same requests gets the same answers every run. A
+    response takes its recorded time divided by `speed` (`None` answers at
+    once). When the exchanges of a request run out they start over if
+    `repeat`, otherwise the request fails with a connection error.
+    """
+
+    def __init__(self, cassette: AirThingsCassette, speed: Optional[float] = 1.0, repeat: bool = True) -> None:
+        self.cassette = cassette
+        self.speed = speed
+        self.repeat = repeat
+        self.requests = 0
+        self.misses = 0
+        self.__queues: Dict[Tuple[str, str], Deque[AirThingsExchange]] = {}
+        self.__recorded: Dict[Tuple[str, str], List[AirThingsExchange]] = collections.defaultdict(list)
+
+        for exchange in cassette.exchanges:
+            self.__recorded[exchange.key].append(exchange)
+
+        self.rewind()
+
+    def rewind(self) -> None:
+        self.__queues = {key: collections.deque(exchanges) for (key, exchanges) in self.__recorded.items()}
+
+    @contextlib.asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs) -> AsyncIterator[AirThingsTransportResponse]:
+        self.requests += 1
+        exchange = self.__next(exchange_key(method, url))
+
+        if exchange is None:
+            self.misses += 1
+            raise aiohttp.ClientConnectionError('no recorded exchange for {0} {1}'.format(method.upper(), url))
+
+        if self.speed is not None and self.speed > 0 and exchange.elapsed > 0:
+            await asyncio.sleep(exchange.elapsed / self.speed)
+
+        if exchange.error is not None:
+            raise aiohttp.ClientConnectionError(exchange.error)
+
+        yield AirThingsTransportResponse(
+            status=exchange.status,
+            headers=exchange.headers,
+            body=self.cassette.body_of(exchange))
+
+    def __next(self, key: Tuple[str, str]) -> Optional[AirThingsExchange]:
+        queue = self.__queues.get(key)
+
+        if queue is None:
+            return None
+
+        if len(queue) == 0:
+            if not self.repeat:
+                return None
+
+            queue.extend(self.__recorded[key])
+
+        return queue.popleft()
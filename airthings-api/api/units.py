@@ -0,0 +1,181 @@
+import dataclasses
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from ..responses import locations_instance as li
+from ..responses import me_instance as mi
+
+
+# Unit code: (dimension, scale, offset) such that base = value * scale + offset,
+# the base units being c, bq (Bq/m3), mbar and ppb.
+UNITS: Dict[str, Tuple[str, float, float]] = {
+    'c': ('temperature', 1.0, 0.0),
+    'f': ('temperature', 5.0 / 9.0, -32.0 * 5.0 / 9.0),
+    'k': ('temperature', 1.0, -273.15),
+    'bq': ('radon', 1.0, 0.0),
+    'pci': ('radon', 37.0, 0.0),
+    'mbar': ('pressure', 1.0, 0.0),
+    'hpa': ('pressure', 1.0, 0.0),
+    'kpa': ('pressure', 10.0, 0.0),
+    'pa': ('pressure', 0.01, 0.0),
+    'inhg': ('pressure', 33.8638866667, 0.0),
+    'mmhg': ('pressure', 1.33322387415, 0.0),
+    'ppb': ('concentration', 1.0, 0.0),
+    'ppm': ('concentration', 1000.0, 0.0),
+}
+
+# Unit of each dimension for the `MeInstance.measurement_unit` systems.
+SYSTEMS: Dict[str, Dict[str, str]] = {
+    'METRIC': {'temperature': 'c', 'radon': 'bq', 'pressure': 'mbar'},
+    'IMPERIAL': {'temperature': 'f', 'radon': 'pci', 'pressure': 'inhg'},
+    'US': {'temperature': 'f', 'radon': 'pci', 'pressure': 'inhg'},
+}
+
+Affine = Tuple[float, float]
+
+
+def build_affine_table(units: Mapping[str, Tuple[str, float, float]] = UNITS) -> Dict[Tuple[str, str], Optional[Affine]]:
+    """(scale, offset) of every (from, to) pair of convertible units; `None` for no-ops."""
+    table: Dict[Tuple[str, str], Optional[Affine]] = {}
+
+    for (source, (source_dimension, source_scale, source_offset)) in units.items():
+        for (target, (target_dimension, target_scale, target_offset)) in units.items():
+            if source_dimension != target_dimension:
+                continue
+
+            scale = source_scale / target_scale
+            offset = (source_offset - target_offset) / target_scale
+
+            table[(source, target)] = (scale, offset) if (scale, offset) != (1.0, 0.0) else None
+
+    return table
+
+
+class AirThingsUnitConverter:
+    """Converts sensor values between units, in batches.
+
+    Conversions are affine (`value * scale + offset`), read from a table of
+    every (from, to) pair built once. Without a `system` sensor values go to
+    their `preferred_unit`; with one (`'METRIC'`, `'IMPERIAL'`, see
+    `from_me_instance`) they go to the unit of that system for their dimension.
+    Values already in the target unit, and units the converter does not know,
+    are left as they are (no-ops cost a table lookup, not a multiplication).
+    """
+
+    AFFINE_TABLE = build_affine_table()
+
+    def __init__(self, system: Optional[str] = None) -> None:
+        self.system = system
+        self.system_units = SYSTEMS[system.upper()] if system is not None else None
+        # (provided unit, preferred unit) -> (target unit, affine or None).
+        self.__targets: Dict[Tuple[str, str], Tuple[str, Optional[Affine]]] = {}
+
+    @staticmethod
+    def from_me_instance(me: mi.MeInstance) -> 'AirThingsUnitConverter':
+        system = me.measurement_unit.upper()
+        return AirThingsUnitConverter(system=system if system in SYSTEMS else None)
+
+    @staticmethod
+    def affine(from_unit: str, to_unit: str) -> Optional[Affine]:
+        return AirThingsUnitConverter.AFFINE_TABLE.get((from_unit.lower(), to_unit.lower()))
+
+    def target(self, provided_unit: str, preferred_unit: Optional[str] = None) -> Tuple[str, Optional[Affine]]:
+        """Target unit of a value in `provided_unit`, and the conversion to it."""
+        key = (provided_unit, preferred_unit)
+        target = self.__targets.get(key)
+
+        if target is None:
+            to_unit = preferred_unit if preferred_unit is not None else provided_unit
+
+            if self.system_units is not None:
+                unit = UNITS.get(provided_unit.lower())
+                if unit is not None:
+                    to_unit = self.system_units.get(unit[0], provided_unit)
+
+            affine = AirThingsUnitConverter.affine(provided_unit, to_unit)
+            target = (to_unit if affine is not None else provided_unit, affine)
+            self.__targets[key] = target
+
+        return target
+
+    def convert(self, value: Optional[float], from_unit: str, to_unit: str) -> Optional[float]:
+        affine = AirThingsUnitConverter.affine(from_unit, to_unit)
+
+        if affine is None or value is None:
+            return value
+
+        return value * affine[0] + affine[1]
+
+    def convert_column(self, values: Sequence[Optional[float]], from_unit: str, to_unit: str) -> Sequence[Optional[float]]:
+        """Converts a column of values sharing one unit; returns `values` itself for no-ops."""
+        affine = AirThingsUnitConverter.affine(from_unit, to_unit)
+
+        if affine is None:
+            return values
+
+        (scale, offset) = affine
+        return [v * scale + offset if v is not None else None for v in values]
+
+    def convert_columns(self, values: Sequence[Optional[float]], from_units: Sequence[str], to_units: Sequence[str]) -> List[Optional[float]]:
+        """Converts `values[i]` from `from_units[i]` to `to_units[i]`."""
+        table = AirThingsUnitConverter.AFFINE_TABLE
+        result = list(values)
+
+        for (i, (value, from_unit, to_unit)) in enumerate(zip(values, from_units, to_units)):
+            if value is None or from_unit == to_unit:
+                continue
+
+            affine = table.get((from_unit.lower(), to_unit.lower()))
+
+            if affine is not None:
+                result[i] = value * affine[0] + affine[1]
+
+        return result
+
+    def convert_sensor(self, sensor: li.CurrentSensorValue) -> li.CurrentSensorValue:
+        """`sensor` in its target unit (a copy), or `sensor` itself when nothing changes."""
+        (to_unit, affine) = self.target(sensor.provided_unit, sensor.preferred_unit)
+
+        if affine is None:
+            return sensor
+
+        (scale, offset) = affine
+
+        return dataclasses.replace(
+            sensor,
+            value=sensor.value * scale + offset if sensor.value is not None else None,
+            provided_unit=to_unit,
+            thresholds=[threshold * scale + offset for threshold in sensor.thresholds])
+
+    def convert_locations(self, instance: li.LocationsInstance) -> li.LocationsInstance:
+        """Copy of a locations snapshot with every sensor value in its target unit.
+
+        The instance is left untouched (it may be shared through the manager
+        cache); devices and locations without any conversion are reused as is,
+        and `instance` itself is returned when nothing needs converting.
+        """
+        locations = []
+        changed = False
+
+        for location in instance.locations:
+            devices = []
+            location_changed = False
+
+            for device in location.devices:
+                sensors = [self.convert_sensor(sensor) for sensor in device.current_sensor_values]
+
+                if any(new is not old for (new, old) in zip(sensors, device.current_sensor_values)):
+                    device = dataclasses.replace(device, current_sensor_values=sensors)
+                    location_changed = True
+
+                devices.append(device)
+
+            if location_changed:
+                location = dataclasses.replace(location, devices=devices)
+                changed = True
+
+            locations.append(location)
+
+        if not changed:
+            return instance
+
+        return dataclasses.replace(instance, locations=locations)
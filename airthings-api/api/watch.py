@@ -0,0 +1,223 @@
+import asyncio
+import collections
+import enum
+import logging
+from typing import Any, Callable, Deque, List, Optional
+
+from .exceptions import AirThingsInvalidCredentialsException
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Returned by a subscription's `select` when the instance holds nothing new for it.
+SKIP = object()
+
+
+@enum.unique
+class AirThingsOverflowPolicy(enum.Enum):
+    DropOldest = 0
+    CoalesceLatest = 1
+    Block = 2
+
+
+class AirThingsSubscription:
+    """Bounded queue of updates consumed with `async for`.
+
+    When the consumer falls behind, `policy` decides what happens to a new
+    update once `maxsize` updates are queued: `DropOldest` discards the oldest
+    one, `CoalesceLatest` replaces the whole backlog with the new update and
+    `Block` makes the poller wait for room (it then polls no faster than this
+    consumer reads, which is why `AirThingsManager.watch` gives every `Block`
+    subscription a poller of its own). `dropped` counts discarded updates.
+    """
+
+    def __init__(
+            self,
+            maxsize: int = 1,
+            policy: AirThingsOverflowPolicy = AirThingsOverflowPolicy.CoalesceLatest,
+            interval: float = 60.0,
+            select: Optional[Callable[[Any], Any]] = None,
+            on_close: Optional[Callable[['AirThingsSubscription'], None]] = None) -> None:
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.interval = interval
+        self.select = select
+        self.on_close = on_close
+        self.items: Deque[Any] = collections.deque()
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+        self.error: Optional[BaseException] = None
+        self.__readable = asyncio.Event()
+        self.__writable = asyncio.Event()
+        self.__writable.set()
+
+    async def __aenter__(self) -> 'AirThingsSubscription':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.close()
+
+    def __aiter__(self) -> 'AirThingsSubscription':
+        return self
+
+    async def __anext__(self) -> Any:
+        while len(self.items) == 0:
+            if self.closed:
+                if self.error is not None:
+                    raise self.error
+                raise StopAsyncIteration
+
+            self.__readable.clear()
+            await self.__readable.wait()
+
+        item = self.items.popleft()
+        self.__writable.set()
+
+        return item
+
+    def offer(self, item: Any) -> bool:
+        """Queue `item` without waiting; `False` when a `Block` subscription is full."""
+        if self.closed:
+            return True
+
+        if len(self.items) >= self.maxsize:
+            if self.policy == AirThingsOverflowPolicy.DropOldest:
+                self.items.popleft()
+                self.dropped += 1
+
+            elif self.policy == AirThingsOverflowPolicy.CoalesceLatest:
+                self.dropped += len(self.items)
+                self.items.clear()
+
+            else:
+                self.__writable.clear()
+                return False
+
+        self.items.append(item)
+        self.delivered += 1
+        self.__readable.set()
+
+        return True
+
+    async def put(self, item: Any) -> None:
+        while not self.offer(item):
+            await self.__writable.wait()
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        if self.closed:
+            return
+
+        self.closed = True
+        self.error = error
+        self.__readable.set()
+        self.__writable.set()
+
+        if self.on_close is not None:
+            self.on_close(self)
+
+
+class AirThingsWatcher:
+    """One poller for an entity of a manager, shared by all its subscriptions.
+
+    The poller starts with the first subscription, polls at the shortest
+    interval requested by the live subscriptions and stops with the last one.
+    Every subscription receives the polled instance, or what its `select`
+    extracts from it. Only `Block` subscriptions can hold the poller back, so
+    they are not meant to share a watcher with others.
+    """
+
+    def __init__(self, manager: Any, entity: str) -> None:
+        self.manager = manager
+        self.entity = entity
+        self.subscriptions: List[AirThingsSubscription] = []
+        self.task: Optional[asyncio.Future] = None
+
+    def subscribe(self, subscription: AirThingsSubscription) -> AirThingsSubscription:
+        subscription.on_close = self.__unsubscribe
+        self.subscriptions.append(subscription)
+
+        # Serve the last good instance (possibly a persisted snapshot) right away.
+        cached = self.manager.instance_cache.get(self.entity)
+
+        if cached is not None:
+            AirThingsWatcher.__deliver(subscription, cached.instance)
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.__run())
+
+        return subscription
+
+    async def publish(self, instance: Any) -> None:
+        blocked = [
+            subscription.put(item)
+            for (subscription, item) in [
+                (subscription, AirThingsWatcher.__deliver(subscription, instance))
+                for subscription in list(self.subscriptions)
+            ]
+            if item is not None
+        ]
+
+        if len(blocked) > 0:
+            await asyncio.gather(*blocked)
+
+    @staticmethod
+    def __deliver(subscription: AirThingsSubscription, instance: Any) -> Any:
+        # Returns the item when the subscription is full and must be waited on.
+        item = instance if subscription.select is None else subscription.select(instance)
+
+        if item is SKIP or subscription.offer(item):
+            return None
+
+        return item
+
+    async def __run(self) -> None:
+        method = getattr(self.manager, self.manager.ENTITIES[self.entity])
+
+        while len(self.subscriptions) > 0:
+            try:
+                instance = await method()
+
+            except AirThingsInvalidCredentialsException as error:
+                for subscription in list(self.subscriptions):
+                    subscription.close(error=error)
+                break
+
+            except Exception as error:
+                _LOGGER.warning('entity: "{0}" | message: "watch poll failed" | error: "{1!r}" | '.format(self.entity, error))
+
+            else:
+                await self.publish(instance)
+
+            if len(self.subscriptions) > 0:
+                await asyncio.sleep(min(subscription.interval for subscription in self.subscriptions))
+
+    def __unsubscribe(self, subscription: AirThingsSubscription) -> None:
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+        if len(self.subscriptions) == 0 and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+
+def select_device(serial_number: str) -> Callable[[Any], Any]:
+    """`select` yielding the `Device` with `serial_number` from a locations instance, when it changed."""
+    last: List[Any] = [None]
+
+    def select(instance: Any) -> Any:
+        for location in instance.locations:
+            for device in location.devices:
+                if device.serial_number == serial_number:
+                    if device == last[0]:
+                        return SKIP
+
+                    last[0] = device
+                    return device
+
+        return SKIP
+
+    return select
@@ -1,28 +1,56 @@
 import aiohttp
 import asyncio
-import json
+import concurrent.futures
 import logging
 import math
+import time
 from urllib import parse as up
 import datetime as dt
 import enum
-from typing import Any, Dict, List, Optional, Coroutine
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+from uuid import UUID
 from typing_extensions import Literal
 
+from .exceptions import (
+    AirThingsException,
+    AirThingsInvalidCredentialsException,
+    AirThingsUnauthorizedException,
+    AirThingsClientException,
+    AirThingsRateLimitedException,
+    AirThingsServerException,
+    AirThingsConnectionException,
+    AirThingsPollFailedException,
+    AirThingsCircuitOpenException,
+    AirThingsThrottledException,
+    parse_retry_after,
+)
+from .retry import AirThingsRetryPolicy
+from .circuit import AirThingsCircuitBreaker, AirThingsCircuitBreakers, AirThingsCircuitState
+from .cache import AirThingsCachedInstance, AirThingsInstanceCache, AirThingsSnapshotStore
+from .throttle import AirThingsRateLimiter, AirThingsTokenBucket
+from .watch import AirThingsOverflowPolicy, AirThingsSubscription, AirThingsWatcher, select_device
+from .routing import AirThingsRoute, AirThingsSensorRouter
+from .metrics import AirThingsMetrics
+
 from ..responses import relay_devices_instance as rdi
 from ..responses import locations_instance as li
 from ..responses import thresholds_instance as ti
 from ..responses import me_instance as mi
+from ..responses import codec
 
 
 _LOGGER = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class AirThingsConstant:
     CT_JSON = 'application/json'
     CT_USER_AGENT = 'Mozilla/5.0 Chrome/87.0'
     CT_BEARER_FORMAT = 'Bearer {0}'
+    CT_ACCOUNTS_API_ROOT = 'https://accounts-api.airthings.com/'
     CT_ACCOUNTS_API_BASE = 'https://accounts-api.airthings.com/v1/{0}'
+    CT_WEB_API_ROOT = 'https://web-api.airthin.gs/'
     CT_WEB_API_BASE = 'https://web-api.airthin.gs/v1/{0}'
     CT_ACCOUNTS_ORIGIN = 'https://accounts.airthings.com'
     CT_DASHBOARD_ORIGIN = 'https://dashboard.airthings.com'
@@ -38,86 +66,353 @@ class AirThingsAuthenticationAdvise(enum.Enum):
     ShouldCheckCredentials = 4
 
 
-class AirThingsException(Exception):
-    """Base exception for AirThings API errors."""
-
-    def __init__(self, error_code: int, error_details: str) -> None:
-        """Initialise AirThingsException."""
-        self.error_code = error_code
-        self.error_details = error_details
-
+def parse_json(payload: bytes) -> Any:
+    return codec.loads(payload)
 
-class AirThingsInvalidCredentialsException(Exception):
-    """Highlevel Exception for AirThings invalid credentials errors."""
-    pass
 
-
-class AirThingsUnauthorizedException(AirThingsException):
-    """Exception for AirThings API unauthorized errors."""
-    pass
+def decode_payload(from_dict: Callable[[Any], T], payload: bytes) -> T:
+    return from_dict(parse_json(payload))
 
 
 class AirThingsManager:
 
-    def __init__(self, username: str, password: str, session: aiohttp.ClientSession) -> None:
+    ENTITIES = {
+        'location': 'get_locations_instance',
+        'thresholds': 'get_thresholds_instance',
+        'relay-devices': 'get_relay_devices_instance',
+        'me': 'get_me_instance',
+    }
+
+    def __init__(
+            self,
+            username: str,
+            password: str,
+            session: aiohttp.ClientSession,
+            retry_policy: Optional[AirThingsRetryPolicy] = None,
+            circuit_breakers: Optional[AirThingsCircuitBreakers] = None,
+            serve_stale: bool = False,
+            rate_limiter: Optional[AirThingsRateLimiter] = None,
+            decode_executor: Optional[concurrent.futures.Executor] = None,
+            decode_threshold: int = 64 * 1024,
+            snapshot_directory: Optional[str] = None,
+            metrics: Optional[AirThingsMetrics] = None) -> None:
         self.username = username
         self.password = password
         self.session = session
+        self.retry_policy = retry_policy if retry_policy is not None else AirThingsRetryPolicy()
+        self.circuit_breakers = circuit_breakers if circuit_breakers is not None else AirThingsCircuitBreakers()
+        self.serve_stale = serve_stale
+        self.rate_limiter = rate_limiter
+        self.decode_executor = decode_executor
+        self.decode_threshold = decode_threshold
+        self.metrics = metrics
+        self.instance_cache = AirThingsInstanceCache()
+        self.snapshot_store: Optional[AirThingsSnapshotStore] = None
+        self.refresh_tasks: Dict[str, asyncio.Future] = {}
+        self.watchers: Dict[str, AirThingsWatcher] = {}
+        self.sensor_router = AirThingsSensorRouter()
+        self.sensor_router.on_empty = self.__stop_sensor_router
         self.tokens: Optional[Dict[str, Any]] = None
+        self.warm_up_task: Optional[asyncio.Task] = None
+        self.__authentication_lock: Optional[asyncio.Lock] = None
+
+        if snapshot_directory is not None:
+            # Last known good instances are available before the first poll.
+            self.snapshot_store = AirThingsSnapshotStore(
+                directory=snapshot_directory,
+                namespace=username)
+
+            self.instance_cache.entries.update(self.snapshot_store.load_all())
+
+        if metrics is not None:
+            metrics.add_source('retry', self.retry_policy.counters.as_dict)
+
+            if rate_limiter is not None:
+                metrics.add_source('rate_limiter', rate_limiter.as_dict)
 
     async def get_relay_devices_instance(self) -> rdi.RelayDevicesInstance:
-        return rdi.relay_devices_instance_from_dict(
-            await self.__execute_poll(
-                poll_coroutine=self.__poll_relay_devices()))
+        return await self.__get_instance(
+            entity='relay-devices',
+            poll_method=self.__poll_relay_devices,
+            from_dict=rdi.relay_devices_instance_from_dict)
 
     async def get_locations_instance(self) -> li.LocationsInstance:
-        return li.locations_instance_from_dict(
-            await self.__execute_poll(
-                poll_coroutine=self.__poll_locations()))
+        return await self.__get_instance(
+            entity='location',
+            poll_method=self.__poll_locations,
+            from_dict=li.locations_instance_from_dict)
 
     async def get_thresholds_instance(self) -> ti.ThresholdsInstance:
-        return ti.thresholds_instance_from_dict(
-            await self.__execute_poll(
-                poll_coroutine=self.__poll_thresholds()))
+        return await self.__get_instance(
+            entity='thresholds',
+            poll_method=self.__poll_thresholds,
+            from_dict=ti.thresholds_instance_from_dict)
 
     async def get_me_instance(self) -> mi.MeInstance:
-        return mi.me_instance_from_dict(
-            await self.__execute_poll(
-                poll_coroutine=self.__poll_me()))
+        return await self.__get_instance(
+            entity='me',
+            poll_method=self.__poll_me,
+            from_dict=mi.me_instance_from_dict)
+
+    def get_cached_instance(self, entity: str, refresh: bool = False) -> Optional[AirThingsCachedInstance]:
+        """Last good instance of `entity` (e.g. 'location'), with its `age`, without polling.
+
+        After a restart this is the snapshot persisted by the previous run, if any.
+        With `refresh=True` a poll of the entity is also scheduled in the background
+        (once at a time, see `refresh_tasks`) so the cache catches up.
+        """
+        if refresh:
+            task = self.refresh_tasks.get(entity)
+
+            if task is None or task.done():
+                self.refresh_tasks[entity] = asyncio.ensure_future(self.__refresh(entity))
+
+        cached = self.instance_cache.get(entity)
+
+        if self.metrics is not None:
+            self.metrics.increment(name='cache.hit' if cached is not None else 'cache.miss', label=entity)
+
+        return cached
+
+    def watch(
+            self,
+            entity: str,
+            interval: float = 60.0,
+            maxsize: int = 1,
+            policy: AirThingsOverflowPolicy = AirThingsOverflowPolicy.CoalesceLatest,
+            select: Optional[Callable[[Any], Any]] = None) -> AirThingsSubscription:
+        """Subscribe to the instances of `entity`, polled every `interval` seconds.
+
+        All subscriptions of an entity share one poller (see `AirThingsWatcher`),
+        except `Block` ones: each gets a poller of its own, paced by its consumer.
+        Iterate the result with `async for` and `close()` it, or use it as an
+        async context manager, to unsubscribe.
+        """
+        if entity not in AirThingsManager.ENTITIES:
+            raise KeyError(entity)
+
+        if policy == AirThingsOverflowPolicy.Block:
+            # A slow Block consumer would hold back every other subscriber.
+            watcher = AirThingsWatcher(manager=self, entity=entity)
+
+        else:
+            watcher = self.watchers.get(entity)
+
+            if watcher is None:
+                watcher = AirThingsWatcher(manager=self, entity=entity)
+                self.watchers[entity] = watcher
+
+        return watcher.subscribe(
+            AirThingsSubscription(
+                maxsize=maxsize,
+                policy=policy,
+                interval=interval,
+                select=select))
+
+    def watch_locations(
+            self,
+            interval: float = 60.0,
+            maxsize: int = 1,
+            policy: AirThingsOverflowPolicy = AirThingsOverflowPolicy.CoalesceLatest) -> AirThingsSubscription:
+        return self.watch(entity='location', interval=interval, maxsize=maxsize, policy=policy)
+
+    def watch_device(
+            self,
+            serial_number: str,
+            interval: float = 60.0,
+            maxsize: int = 1,
+            policy: AirThingsOverflowPolicy = AirThingsOverflowPolicy.CoalesceLatest) -> AirThingsSubscription:
+        """Subscribe to one `Device` (and its current sensor values), delivered when it changes."""
+        return self.watch(
+            entity='location',
+            interval=interval,
+            maxsize=maxsize,
+            policy=policy,
+            select=select_device(serial_number=serial_number))
+
+    def subscribe_readings(
+            self,
+            callback: Callable[[li.Location, li.Device, li.CurrentSensorValue], Any],
+            serial_number: Optional[str] = None,
+            sensor_type: Optional[str] = None,
+            location_id: Optional[UUID] = None,
+            interval: float = 60.0) -> AirThingsRoute:
+        """Call `callback(location, device, sensor)` for every changed reading matching the filters.
+
+        Filters left to `None` match anything, e.g. `sensor_type='radonShortTermAvg'`
+        alone follows radon on every device. Readings come from the shared
+        locations watcher; `cancel()` the returned route to unsubscribe.
+        """
+        router = self.sensor_router
+
+        if router.subscription is None or router.subscription.closed:
+            router.subscription = self.watch(
+                entity='location',
+                interval=interval,
+                policy=AirThingsOverflowPolicy.CoalesceLatest,
+                select=router.publish)
+
+        return router.subscribe(
+            callback=callback,
+            serial_number=serial_number,
+            sensor_type=sensor_type,
+            location_id=location_id)
+
+    def __stop_sensor_router(self) -> None:
+        if self.sensor_router.subscription is not None:
+            self.sensor_router.subscription.close()
+            self.sensor_router.subscription = None
 
     async def validate_credentials(self) -> bool:
         advise = await self.__assert_ready()
         return (advise == AirThingsAuthenticationAdvise.ShouldBeGood)
 
-    async def __execute_poll(self, poll_coroutine: Coroutine) -> Optional[Dict[str, Any]]:
+    async def warm_up(self, background: bool = False) -> Optional[bool]:
+        """Open pooled connections to both APIs and authenticate ahead of the first poll.
+
+        The web API connection is opened while the login runs against the accounts API,
+        so the first real poll runs at steady-state latency. With `background=True` the
+        warm-up is scheduled as `warm_up_task` and `None` is returned immediately.
+        """
+        if background:
+            if self.warm_up_task is None or self.warm_up_task.done():
+                self.warm_up_task = asyncio.ensure_future(self.warm_up())
+            return None
+
+        coroutines = [
+            self.__assert_ready(),
+            AirThingsManager.__open_connection(
+                session=self.session,
+                url=AirThingsConstant.CT_WEB_API_ROOT),
+        ]
+
+        if self.__get_authentication_advise() == AirThingsAuthenticationAdvise.ShouldBeGood:
+            # No login needed: still keep a connection ready for the next token refresh.
+            coroutines.append(
+                AirThingsManager.__open_connection(
+                    session=self.session,
+                    url=AirThingsConstant.CT_ACCOUNTS_API_ROOT))
+
+        results = await asyncio.gather(*coroutines, return_exceptions=True)
+
+        advise = results[0]
+
+        if isinstance(advise, BaseException):
+            _LOGGER.warning(
+                AirThingsManager.log(
+                    method='warm_up',
+                    message='authentication failed',
+                    error=repr(advise)))
+
+            return False
+
+        return (advise == AirThingsAuthenticationAdvise.ShouldBeGood)
+
+    async def __get_instance(self, entity: str, poll_method: Callable[[], Awaitable[Optional[bytes]]], from_dict: Callable[[Any], T]) -> T:
+        try:
+            payload = await self.__timed(
+                name='poll',
+                label=entity,
+                awaitable=self.__execute_poll(poll_method=poll_method))
+
+        except AirThingsCircuitOpenException:
+            cached = self.instance_cache.get(entity)
+
+            if self.serve_stale and cached is not None:
+                _LOGGER.warning(
+                    AirThingsManager.log(
+                        method='__get_instance',
+                        entity=entity,
+                        age=cached.age,
+                        message='circuit open, serving last good instance'))
+
+                if self.metrics is not None:
+                    self.metrics.increment(name='cache.stale_served', label=entity)
+
+                return cached.instance
+
+            raise
+
+        instance = await self.__timed(
+            name='decode',
+            label=entity,
+            awaitable=self.__decode(payload=payload, from_dict=from_dict))
+        cached = self.instance_cache.put(entity=entity, instance=instance)
+
+        if self.snapshot_store is not None:
+            self.snapshot_store.schedule(cached)
+
+        return instance
+
+    async def __timed(self, name: str, label: str, awaitable: Awaitable[T]) -> T:
+        if self.metrics is None:
+            return await awaitable
+
+        start = time.perf_counter()
+
+        try:
+            return await awaitable
+
+        finally:
+            self.metrics.observe(name=name, label=label, value=time.perf_counter() - start)
+
+    async def __refresh(self, entity: str) -> None:
+        try:
+            await getattr(self, AirThingsManager.ENTITIES[entity])()
+
+        except Exception as error:
+            _LOGGER.warning(
+                AirThingsManager.log(
+                    method='__refresh',
+                    entity=entity,
+                    error=repr(error)))
+
+    async def __decode(self, payload: Optional[bytes], from_dict: Callable[[Any], T]) -> T:
+        if payload is None:
+            raise AirThingsPollFailedException(error_code=0, error_details='no payload')
+
+        if self.decode_executor is not None and len(payload) >= self.decode_threshold:
+            # Big payloads are parsed and decoded off the event loop; `from_dict`
+            # is a module-level function so process pools can pickle it.
+            return await asyncio.get_running_loop().run_in_executor(
+                self.decode_executor,
+                decode_payload,
+                from_dict,
+                payload)
+
+        return decode_payload(from_dict, payload)
+
+    async def __execute_poll(self, poll_method: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
         advise = await self.__assert_ready()
 
         if advise == AirThingsAuthenticationAdvise.ShouldBeGood:
             try:
-                return await poll_coroutine
+                # Polls are idempotent GETs: transient errors are retried by the policy,
+                # each attempt going through the web API circuit breaker.
+                return await self.retry_policy.execute(
+                    operation=lambda: self.__call_through_circuit(
+                        url=AirThingsConstant.CT_WEB_API_ROOT,
+                        operation=poll_method),
+                    method=poll_method.__name__)
 
-            except AirThingsUnauthorizedException as atue:
-                _LOGGER.error(
-                    AirThingsManager.log(
-                        method=poll_coroutine.__name__,
-                        error_code=atue.error_code,
-                        error_details=atue.error_details))
-
-                return None
+            except AirThingsCircuitOpenException:
+                raise
 
             except AirThingsException as ate:
+                # Callers get the classified error (server, client, rate limited,
+                # throttled, ...) once retries are exhausted.
                 _LOGGER.error(
                     AirThingsManager.log(
-                        method=poll_coroutine.__name__,
+                        method=poll_method.__name__,
                         error_code=ate.error_code,
                         error_details=ate.error_details))
 
-                return None
+                raise
 
         elif advise == AirThingsAuthenticationAdvise.ShouldCheckCredentials:
             _LOGGER.warning(
                 AirThingsManager.log(
-                    method=poll_coroutine.__name__,
+                    method=poll_method.__name__,
                     advise=advise,
                     message='invalid credentials'))
 
@@ -126,11 +421,60 @@ class AirThingsManager:
         else:
             _LOGGER.warning(
                 AirThingsManager.log(
-                    method=poll_coroutine.__name__,
+                    method=poll_method.__name__,
                     advise=advise,
                     message='cannot execute poll'))
 
-            return None
+            breaker = self.__get_circuit_breaker(url=AirThingsConstant.CT_ACCOUNTS_API_ROOT)
+
+            if breaker.state == AirThingsCircuitState.Open:
+                raise AirThingsCircuitOpenException(
+                    error_code=0,
+                    error_details='circuit open',
+                    host=breaker.host,
+                    retry_in=breaker.retry_in)
+
+            raise AirThingsPollFailedException(
+                error_code=0,
+                error_details='cannot execute poll: {0}'.format(advise.name))
+
+    def __get_accounts_throttle(self) -> Optional[AirThingsTokenBucket]:
+        return self.rate_limiter.accounts if self.rate_limiter is not None else None
+
+    def __get_web_throttle(self) -> Optional[AirThingsTokenBucket]:
+        return self.rate_limiter.web if self.rate_limiter is not None else None
+
+    def __get_circuit_breaker(self, url: str) -> AirThingsCircuitBreaker:
+        return self.circuit_breakers.get(up.urlparse(url).netloc)
+
+    async def __call_through_circuit(self, url: str, operation: Callable[[], Awaitable[T]]) -> T:
+        breaker = self.__get_circuit_breaker(url=url)
+
+        if not breaker.allow_request():
+            raise AirThingsCircuitOpenException(
+                error_code=0,
+                error_details='circuit open',
+                host=breaker.host,
+                retry_in=breaker.retry_in)
+
+        try:
+            result = await operation()
+
+        except AirThingsThrottledException:
+            # Rejected locally by the rate limiter: upstream was never reached.
+            breaker.release()
+            raise
+
+        except AirThingsException as ate:
+            breaker.record_outcome(ate)
+            raise
+
+        except BaseException:
+            breaker.release()
+            raise
+
+        breaker.record_success()
+        return result
 
     def __get_authentication_advise(self) -> AirThingsAuthenticationAdvise:
         if self.tokens is None:
@@ -150,36 +494,75 @@ class AirThingsManager:
     async def __assert_ready(self) -> AirThingsAuthenticationAdvise:
         advise = self.__get_authentication_advise()
 
-        if advise == AirThingsAuthenticationAdvise.ShouldLogin:
-            return await self.__perform_login()
+        if advise == AirThingsAuthenticationAdvise.ShouldBeGood:
+            return advise
+
+        # Serialise login/refresh so that a background warm-up and
+        # concurrent polls share a single authentication round-trip.
+        if self.__authentication_lock is None:
+            self.__authentication_lock = asyncio.Lock()
 
-        elif advise == AirThingsAuthenticationAdvise.ShouldRefreshToken:
-            return await self.__perform_refresh()
+        async with self.__authentication_lock:
+            advise = self.__get_authentication_advise()
 
-        return advise
+            if advise == AirThingsAuthenticationAdvise.ShouldLogin:
+                return await self.__perform_login()
 
-    async def __perform_login(self) -> AirThingsAuthenticationAdvise:
-        try:
-            token = await AirThingsManager.__get_token(
-                session=self.session,
-                username=self.username,
-                password=self.password)
+            elif advise == AirThingsAuthenticationAdvise.ShouldRefreshToken:
+                return await self.__perform_refresh()
 
-            consent = await AirThingsManager.__get_consent(
-                session=self.session,
-                token=token)
+            return advise
 
-            authorization_code = await AirThingsManager.__get_authorization_code(
+    async def __login(self) -> Optional[Dict[str, Any]]:
+        token = await self.__timed(
+            name='auth',
+            label='token',
+            awaitable=AirThingsManager.__get_token(
+                session=self.session,
+                throttle=self.__get_accounts_throttle(),
+                username=self.username,
+                password=self.password))
+
+        consent = await self.__timed(
+            name='auth',
+            label='consent',
+            awaitable=self.retry_policy.execute(
+                operation=lambda: AirThingsManager.__get_consent(
+                    session=self.session,
+                    throttle=self.__get_accounts_throttle(),
+                    token=token),
+                method='__get_consent'))
+
+        authorization_code = await self.__timed(
+            name='auth',
+            label='authorization_code',
+            awaitable=AirThingsManager.__get_authorization_code(
                 session=self.session,
+                throttle=self.__get_accounts_throttle(),
                 token=token,
-                consent=consent)
+                consent=consent))
 
-            self.tokens = await AirThingsManager.__get_access_and_refresh_token(
+        return await self.__timed(
+            name='auth',
+            label='access_token',
+            awaitable=AirThingsManager.__get_access_and_refresh_token(
                 session=self.session,
-                authorization_code=authorization_code)
+                throttle=self.__get_accounts_throttle(),
+                authorization_code=authorization_code))
+
+    async def __perform_login(self) -> AirThingsAuthenticationAdvise:
+        try:
+            # The 4-step login counts as a single call for the accounts API circuit breaker.
+            self.tokens = await self.__call_through_circuit(
+                url=AirThingsConstant.CT_ACCOUNTS_API_ROOT,
+                operation=self.__login)
 
             return AirThingsAuthenticationAdvise.ShouldBeGood
 
+        except AirThingsCircuitOpenException:
+            self.tokens = None
+            return AirThingsAuthenticationAdvise.ShouldWait
+
         except AirThingsUnauthorizedException as atue:
             _LOGGER.error(
                 AirThingsManager.log(
@@ -202,12 +585,22 @@ class AirThingsManager:
 
     async def __perform_refresh(self) -> AirThingsAuthenticationAdvise:
         try:
-            self.tokens = await AirThingsManager.__refresh_access_and_refresh_token(
-                session=self.session,
-                previous_refresh_token=self.tokens['refresh_token'])
+            self.tokens = await self.__call_through_circuit(
+                url=AirThingsConstant.CT_ACCOUNTS_API_ROOT,
+                operation=lambda: self.__timed(
+                    name='auth',
+                    label='refresh',
+                    awaitable=AirThingsManager.__refresh_access_and_refresh_token(
+                        session=self.session,
+                        throttle=self.__get_accounts_throttle(),
+                        previous_refresh_token=self.tokens['refresh_token'])))
 
             return AirThingsAuthenticationAdvise.ShouldBeGood
 
+        except AirThingsCircuitOpenException:
+            # Keep the refresh token around for when the accounts API recovers.
+            return AirThingsAuthenticationAdvise.ShouldWait
+
         except AirThingsUnauthorizedException as atue:
             _LOGGER.error(
                 AirThingsManager.log(
@@ -229,189 +622,240 @@ class AirThingsManager:
             return AirThingsAuthenticationAdvise.ShouldWait
 
     @staticmethod
-    async def __get_token(session: aiohttp.ClientSession, username: str, password: str) -> str:
-        async with session.post(
-                url=AirThingsManager.format_string(
-                    AirThingsConstant.CT_ACCOUNTS_API_BASE,
-                    'token'),
-                headers={
-                    'origin': AirThingsConstant.CT_ACCOUNTS_ORIGIN,
-                    'accept': AirThingsConstant.CT_JSON,
-                    'content-type': AirThingsConstant.CT_JSON,
-                    'user-agent': AirThingsConstant.CT_USER_AGENT,
-                },
-                json={
-                    'username': username,
-                    'password': password,
-                    'grant_type': 'password',
-                    'client_id': 'accounts'
-                }) as response:
-
-            if math.floor(response.status / 100) == 2:
-                rjson = await response.json()
-                return rjson['access_token']
-
-            elif math.floor(response.status / 100) == 4:
-                raise AirThingsUnauthorizedException(
-                    error_code=response.status,
-                    error_details=await response.text())
+    async def __open_connection(session: aiohttp.ClientSession, url: str) -> bool:
+        # Any answer will do: the point is to resolve the host and complete the
+        # TLS handshake so that the connection is parked in the session's pool.
+        try:
+            async with session.head(
+                    url=url,
+                    headers={
+                        'user-agent': AirThingsConstant.CT_USER_AGENT,
+                    },
+                    allow_redirects=False) as response:
 
-            else:
-                raise AirThingsException(
-                    error_code=response.status,
-                    error_details=await response.text())
+                await response.read()
+                return True
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            _LOGGER.warning(
+                AirThingsManager.log(
+                    method='__open_connection',
+                    url=url,
+                    error=repr(error)))
+
+            return False
 
     @staticmethod
-    async def __get_consent(session: aiohttp.ClientSession, token: str) -> Optional[Dict[str, Any]]:
-        async with session.get(
-                url=AirThingsManager.format_string(
-                    AirThingsConstant.CT_ACCOUNTS_API_BASE,
-                    'consents/dashboard?client_id=dashboard&redirect_uri={0}'.format(
-                        AirThingsConstant.CT_DASHBOARD_ORIGIN)),
-                headers={
-                    'origin': AirThingsConstant.CT_ACCOUNTS_ORIGIN,
-                    'accept': AirThingsConstant.CT_JSON,
-                    'content-type': AirThingsConstant.CT_JSON,
-                    'user-agent': AirThingsConstant.CT_USER_AGENT,
-                    'authorization': AirThingsManager.format_string(
-                        AirThingsConstant.CT_BEARER_FORMAT,
-                        token),
-                }) as response:
-
-            if math.floor(response.status / 100) == 2:
-                return await response.json()
-
-            elif math.floor(response.status / 100) == 4:
-                raise AirThingsUnauthorizedException(
-                    error_code=response.status,
-                    error_details=await response.text())
+    async def __get_token(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], username: str, password: str) -> str:
+        rjson = await AirThingsManager.__request(
+            session=session,
+            throttle=throttle,
+            method='POST',
+            url=AirThingsManager.format_string(
+                AirThingsConstant.CT_ACCOUNTS_API_BASE,
+                'token'),
+            headers={
+                'origin': AirThingsConstant.CT_ACCOUNTS_ORIGIN,
+                'accept': AirThingsConstant.CT_JSON,
+                'content-type': AirThingsConstant.CT_JSON,
+                'user-agent': AirThingsConstant.CT_USER_AGENT,
+            },
+            json={
+                'username': username,
+                'password': password,
+                'grant_type': 'password',
+                'client_id': 'accounts'
+            })
+
+        return rjson['access_token']
 
-            else:
-                raise AirThingsException(
-                    error_code=response.status,
-                    error_details=await response.text())
+    @staticmethod
+    async def __get_consent(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], token: str) -> Optional[Dict[str, Any]]:
+        return await AirThingsManager.__request(
+            session=session,
+            throttle=throttle,
+            method='GET',
+            url=AirThingsManager.format_string(
+                AirThingsConstant.CT_ACCOUNTS_API_BASE,
+                'consents/dashboard?client_id=dashboard&redirect_uri={0}'.format(
+                    AirThingsConstant.CT_DASHBOARD_ORIGIN)),
+            headers={
+                'origin': AirThingsConstant.CT_ACCOUNTS_ORIGIN,
+                'accept': AirThingsConstant.CT_JSON,
+                'content-type': AirThingsConstant.CT_JSON,
+                'user-agent': AirThingsConstant.CT_USER_AGENT,
+                'authorization': AirThingsManager.format_string(
+                    AirThingsConstant.CT_BEARER_FORMAT,
+                    token),
+            })
 
     @staticmethod
-    async def __get_authorization_code(session: aiohttp.ClientSession, token: str, consent) -> str:
-        async with session.post(
-                url=AirThingsManager.format_string(
-                    AirThingsConstant.CT_ACCOUNTS_API_BASE,
-                    'authorize?client_id=dashboard&redirect_uri={0}'.format(
-                        AirThingsConstant.CT_DASHBOARD_ORIGIN)),
-                headers={
-                    'origin': AirThingsConstant.CT_ACCOUNTS_ORIGIN,
-                    'accept': AirThingsConstant.CT_JSON,
-                    'content-type': AirThingsConstant.CT_JSON,
-                    'user-agent': AirThingsConstant.CT_USER_AGENT,
-                    'authorization': AirThingsManager.format_string(
-                        AirThingsConstant.CT_BEARER_FORMAT,
-                        token),
-                },
-                json=consent) as response:
-
-            if math.floor(response.status / 100) == 2:
-
-                rjson = await response.json()
-                redirect_uri = rjson['redirect_uri']
-
-                fragments = up.urlparse(redirect_uri)
-                code = up.parse_qs(fragments.query)['code'][0]
-
-                return code
-
-            elif math.floor(response.status / 100) == 4:
-                raise AirThingsUnauthorizedException(
-                    error_code=response.status,
-                    error_details=await response.text())
-            else:
-                raise AirThingsException(
-                    error_code=response.status,
-                    error_details=await response.text())
+    async def __get_authorization_code(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], token: str, consent) -> str:
+        rjson = await AirThingsManager.__request(
+            session=session,
+            throttle=throttle,
+            method='POST',
+            url=AirThingsManager.format_string(
+                AirThingsConstant.CT_ACCOUNTS_API_BASE,
+                'authorize?client_id=dashboard&redirect_uri={0}'.format(
+                    AirThingsConstant.CT_DASHBOARD_ORIGIN)),
+            headers={
+                'origin': AirThingsConstant.CT_ACCOUNTS_ORIGIN,
+                'accept': AirThingsConstant.CT_JSON,
+                'content-type': AirThingsConstant.CT_JSON,
+                'user-agent': AirThingsConstant.CT_USER_AGENT,
+                'authorization': AirThingsManager.format_string(
+                    AirThingsConstant.CT_BEARER_FORMAT,
+                    token),
+            },
+            json=consent)
+
+        redirect_uri = rjson['redirect_uri']
+
+        fragments = up.urlparse(redirect_uri)
+        code = up.parse_qs(fragments.query)['code'][0]
+
+        return code
 
     @staticmethod
-    async def __get_access_and_refresh_token(session: aiohttp.ClientSession, authorization_code: str) -> Optional[Dict[str, Any]]:
-        async with session.post(
-                url=AirThingsManager.format_string(
-                    AirThingsConstant.CT_ACCOUNTS_API_BASE,
-                    'token'),
-                headers={
-                    'origin': AirThingsConstant.CT_DASHBOARD_ORIGIN,
-                    'accept': AirThingsConstant.CT_JSON,
-                    'content-type': AirThingsConstant.CT_JSON,
-                    'user-agent': AirThingsConstant.CT_USER_AGENT,
-                    'sec-fetch-dest': 'empty',
-                    'sec-fetch-mode': 'cors',
-                    'sec-fetch-site': 'cross-site',
-                },
-                json={
-                    'client_id': 'dashboard',
-                    'client_secret': AirThingsConstant.CT_DASHBOARD_SECRET,
-                    'code': authorization_code,
-                    'grant_type': 'authorization_code',
-                    'redirect_uri': AirThingsConstant.CT_DASHBOARD_ORIGIN,
-                }) as response:
-
-            if math.floor(response.status / 100) == 2:
-
-                response_dict = await response.json()
-
-                return {
-                    'access_token': response_dict['access_token'],
-                    'refresh_token': response_dict['refresh_token'],
-                    'expires_in': response_dict['expires_in'],
-                    'timestamp': dt.datetime.utcnow(),
-                }
-
-            elif math.floor(response.status / 100) == 4:
-                raise AirThingsUnauthorizedException(
-                    error_code=response.status,
-                    error_details=await response.text())
-            else:
-                raise AirThingsException(
-                    error_code=response.status,
-                    error_details=await response.text())
+    async def __get_access_and_refresh_token(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], authorization_code: str) -> Optional[Dict[str, Any]]:
+        response_dict = await AirThingsManager.__request(
+            session=session,
+            throttle=throttle,
+            method='POST',
+            url=AirThingsManager.format_string(
+                AirThingsConstant.CT_ACCOUNTS_API_BASE,
+                'token'),
+            headers={
+                'origin': AirThingsConstant.CT_DASHBOARD_ORIGIN,
+                'accept': AirThingsConstant.CT_JSON,
+                'content-type': AirThingsConstant.CT_JSON,
+                'user-agent': AirThingsConstant.CT_USER_AGENT,
+                'sec-fetch-dest': 'empty',
+                'sec-fetch-mode': 'cors',
+                'sec-fetch-site': 'cross-site',
+            },
+            json={
+                'client_id': 'dashboard',
+                'client_secret': AirThingsConstant.CT_DASHBOARD_SECRET,
+                'code': authorization_code,
+                'grant_type': 'authorization_code',
+                'redirect_uri': AirThingsConstant.CT_DASHBOARD_ORIGIN,
+            })
+
+        return {
+            'access_token': response_dict['access_token'],
+            'refresh_token': response_dict['refresh_token'],
+            'expires_in': response_dict['expires_in'],
+            'timestamp': dt.datetime.utcnow(),
+        }
 
     @staticmethod
-    async def __refresh_access_and_refresh_token(session: aiohttp.ClientSession, previous_refresh_token: str) -> Optional[Dict[str, Any]]:
-        async with session.post(
-                url=AirThingsManager.format_string(
-                    AirThingsConstant.CT_ACCOUNTS_API_BASE,
-                    'token'),
-                headers={
-                    'origin': AirThingsConstant.CT_DASHBOARD_ORIGIN,
-                    'accept': AirThingsConstant.CT_JSON,
-                    'content-type': AirThingsConstant.CT_JSON,
-                    'user-agent': AirThingsConstant.CT_USER_AGENT,
-                    'sec-fetch-dest': 'empty',
-                    'sec-fetch-mode': 'cors',
-                    'sec-fetch-site': 'cross-site',
-                },
-                json={
-                    'client_id': 'dashboard',
-                    'client_secret': AirThingsConstant.CT_DASHBOARD_SECRET,
-                    'refresh_token': previous_refresh_token,
-                    'grant_type': 'refresh_token',
-                }) as response:
-
-            if math.floor(response.status / 100) == 2:
-
-                response_dict = await response.json()
-
-                return {
-                    'access_token': response_dict['access_token'],
-                    'refresh_token': response_dict['refresh_token'],
-                    'expires_in': response_dict['expires_in'],
-                    'timestamp': dt.datetime.utcnow(),
-                }
-
-            elif math.floor(response.status / 100) == 4:
-                raise AirThingsUnauthorizedException(
-                    error_code=response.status,
-                    error_details=await response.text())
-            else:
-                raise AirThingsException(
-                    error_code=response.status,
-                    error_details=await response.text())
+    async def __refresh_access_and_refresh_token(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], previous_refresh_token: str) -> Optional[Dict[str, Any]]:
+        response_dict = await AirThingsManager.__request(
+            session=session,
+            throttle=throttle,
+            method='POST',
+            url=AirThingsManager.format_string(
+                AirThingsConstant.CT_ACCOUNTS_API_BASE,
+                'token'),
+            headers={
+                'origin': AirThingsConstant.CT_DASHBOARD_ORIGIN,
+                'accept': AirThingsConstant.CT_JSON,
+                'content-type': AirThingsConstant.CT_JSON,
+                'user-agent': AirThingsConstant.CT_USER_AGENT,
+                'sec-fetch-dest': 'empty',
+                'sec-fetch-mode': 'cors',
+                'sec-fetch-site': 'cross-site',
+            },
+            json={
+                'client_id': 'dashboard',
+                'client_secret': AirThingsConstant.CT_DASHBOARD_SECRET,
+                'refresh_token': previous_refresh_token,
+                'grant_type': 'refresh_token',
+            })
+
+        return {
+            'access_token': response_dict['access_token'],
+            'refresh_token': response_dict['refresh_token'],
+            'expires_in': response_dict['expires_in'],
+            'timestamp': dt.datetime.utcnow(),
+        }
+
+    @staticmethod
+    async def __request(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], method: str, url: str, headers: Dict[str, str], json: Optional[Any] = None) -> Any:
+        return parse_json(
+            await AirThingsManager.__request_bytes(
+                session=session,
+                throttle=throttle,
+                method=method,
+                url=url,
+                headers=headers,
+                json=json))
+
+    @staticmethod
+    async def __request_bytes(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], method: str, url: str, headers: Dict[str, str], json: Optional[Any] = None) -> bytes:
+        if throttle is not None:
+            await throttle.acquire()
+
+        try:
+            async with session.request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    json=json) as response:
+
+                if math.floor(response.status / 100) == 2:
+                    return await response.read()
+
+                raise AirThingsManager.classify_error(
+                    status=response.status,
+                    error_details=await response.text(),
+                    retry_after=response.headers.get('retry-after'),
+                    url=url)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            raise AirThingsConnectionException(
+                error_code=0,
+                error_details=repr(error))
+
+    @staticmethod
+    def classify_error(status: int, error_details: str, retry_after: Optional[str] = None, url: Optional[str] = None) -> AirThingsException:
+        if status == 429:
+            return AirThingsRateLimitedException(
+                error_code=status,
+                error_details=error_details,
+                retry_after=parse_retry_after(retry_after))
+
+        elif status in (401, 403) or (status == 400 and AirThingsManager.is_token_endpoint(url)):
+            # The token endpoint answers 400 to bad credentials and revoked refresh tokens.
+            return AirThingsUnauthorizedException(
+                error_code=status,
+                error_details=error_details)
+
+        elif math.floor(status / 100) == 4:
+            return AirThingsClientException(
+                error_code=status,
+                error_details=error_details)
+
+        elif math.floor(status / 100) == 5:
+            return AirThingsServerException(
+                error_code=status,
+                error_details=error_details,
+                retry_after=parse_retry_after(retry_after))
+
+        else:
+            return AirThingsException(
+                error_code=status,
+                error_details=error_details)
+
+    @staticmethod
+    def is_token_endpoint(url: Optional[str]) -> bool:
+        if url is None:
+            return False
+
+        token_url = AirThingsManager.format_string(AirThingsConstant.CT_ACCOUNTS_API_BASE, 'token')
+        return up.urlparse(url)[:3] == up.urlparse(token_url)[:3]
 
     @staticmethod
     def log(**kwargs):
@@ -425,79 +869,77 @@ class AirThingsManager:
         return str(template).format(*args)
 
     @staticmethod
-    async def __poll_generic_entity(session: aiohttp.ClientSession, access_token: str, entity: str) -> Optional[Dict[str, Any]]:
-        async with session.get(
-                url=AirThingsManager.format_string(
-                    AirThingsConstant.CT_WEB_API_BASE,
-                    entity),
-                headers={
-                    'origin': AirThingsConstant.CT_DASHBOARD_ORIGIN,
-                    'accept': AirThingsConstant.CT_JSON,
-                    'content-type': AirThingsConstant.CT_JSON,
-                    'user-agent': AirThingsConstant.CT_USER_AGENT,
-                    'authorization': access_token,
-                    'sec-fetch-dest': 'empty',
-                    'sec-fetch-mode': 'cors',
-                    'sec-fetch-site': 'cross-site',
-                }) as response:
-
-            if math.floor(response.status / 100) == 2:
-                return await response.json()
-
-            elif math.floor(response.status / 100) == 4:
-                raise AirThingsUnauthorizedException(
-                    error_code=response.status,
-                    error_details=await response.text())
-
-            else:
-                raise AirThingsException(
-                    error_code=response.status,
-                    error_details=await response.text())
+    async def __poll_generic_entity(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], access_token: str, entity: str) -> Optional[bytes]:
+        return await AirThingsManager.__request_bytes(
+            session=session,
+            throttle=throttle,
+            method='GET',
+            url=AirThingsManager.format_string(
+                AirThingsConstant.CT_WEB_API_BASE,
+                entity),
+            headers={
+                'origin': AirThingsConstant.CT_DASHBOARD_ORIGIN,
+                'accept': AirThingsConstant.CT_JSON,
+                'content-type': AirThingsConstant.CT_JSON,
+                'user-agent': AirThingsConstant.CT_USER_AGENT,
+                'authorization': access_token,
+                'sec-fetch-dest': 'empty',
+                'sec-fetch-mode': 'cors',
+                'sec-fetch-site': 'cross-site',
+            })
 
     @staticmethod
-    async def __poll_relay_devices_base(session: aiohttp.ClientSession, access_token: str) -> Optional[Dict[str, Any]]:
+    async def __poll_relay_devices_base(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], access_token: str) -> Optional[bytes]:
         return await AirThingsManager.__poll_generic_entity(
             session=session,
+            throttle=throttle,
             access_token=access_token,
             entity='relay-devices')
 
-    async def __poll_relay_devices(self) -> Optional[Dict[str, Any]]:
+    async def __poll_relay_devices(self) -> Optional[bytes]:
         return await AirThingsManager.__poll_relay_devices_base(
             session=self.session,
+            throttle=self.__get_web_throttle(),
             access_token=self.tokens['access_token'])
 
     @staticmethod
-    async def __poll_locations_base(session: aiohttp.ClientSession, access_token: str) -> Optional[Dict[str, Any]]:
+    async def __poll_locations_base(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], access_token: str) -> Optional[bytes]:
         return await AirThingsManager.__poll_generic_entity(
             session=session,
+            throttle=throttle,
             access_token=access_token,
             entity='location')
 
-    async def __poll_locations(self) -> Optional[Dict[str, Any]]:
+    async def __poll_locations(self) -> Optional[bytes]:
         return await AirThingsManager.__poll_locations_base(
             session=self.session,
+            throttle=self.__get_web_throttle(),
             access_token=self.tokens['access_token'])
 
     @staticmethod
-    async def __poll_thresholds_base(session: aiohttp.ClientSession, access_token: str) -> Optional[Dict[str, Any]]:
+    async def __poll_thresholds_base(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], access_token: str) -> Optional[bytes]:
         return await AirThingsManager.__poll_generic_entity(
             session=session,
+            throttle=throttle,
             access_token=access_token,
             entity='thresholds')
 
-    async def __poll_thresholds(self) -> Optional[Dict[str, Any]]:
+    async def __poll_thresholds(self) -> Optional[bytes]:
         return await AirThingsManager.__poll_thresholds_base(
             session=self.session,
+            throttle=self.__get_web_throttle(),
             access_token=self.tokens['access_token'])
 
     @staticmethod
-    async def __poll_me_base(session: aiohttp.ClientSession, access_token: str) -> Optional[Dict[str, Any]]:
+    async def __poll_me_base(session: aiohttp.ClientSession, throttle: Optional[AirThingsTokenBucket], access_token: str) -> Optional[bytes]:
         return await AirThingsManager.__poll_generic_entity(
             session=session,
+            throttle=throttle,
             access_token=access_token,
             entity='me/')
 
-    async def __poll_me(self) -> Optional[Dict[str, Any]]:
+    async def __poll_me(self) -> Optional[bytes]:
         return await AirThingsManager.__poll_me_base(
             session=self.session,
+            throttle=self.__get_web_throttle(),
             access_token=self.tokens['access_token'])
@@ -0,0 +1,28 @@
+# Lazy submodule loading for the package `__init__` modules (PEP 562).
+#
+#     __getattr__, __dir__ = lazy_submodules(__name__, globals(), {'web': '.api.web', ...})
+#
+# Each submodule is imported on first attribute access and then bound in the
+# package namespace, so that later accesses are plain attribute lookups.
+# Importing the package (or only `responses`, to decode cached JSON) thus does
+# not pay for aiohttp and the rest of the client until it is actually used.
+
+import importlib
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def lazy_submodules(package: str, namespace: Dict[str, Any], submodules: Dict[str, str]) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    def __getattr__(name: str) -> Any:
+        module_name = submodules.get(name)
+
+        if module_name is None:
+            raise AttributeError('module {0!r} has no attribute {1!r}'.format(package, name))
+
+        module = importlib.import_module(module_name, package)
+        namespace[name] = module
+        return module
+
+    def __dir__() -> List[str]:
+        return sorted(set(namespace) | set(submodules))
+
+    return (__getattr__, __dir__)
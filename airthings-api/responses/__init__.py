@@ -1,6 +1,22 @@
 from __future__ import absolute_import
 
-from . import locations_instance
-from . import me_instance
-from . import relay_devices_instance
-from . import thresholds_instance
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from ..lazy import lazy_submodules
+
+if TYPE_CHECKING:
+    from . import locations_instance, me_instance, relay_devices_instance, thresholds_instance
+    from . import codec, dates, snapshot
+
+__getattr__, __dir__ = lazy_submodules(__name__, globals(), {
+    name: '.' + name
+    for name in [
+        'locations_instance',
+        'me_instance',
+        'relay_devices_instance',
+        'thresholds_instance',
+        'codec',
+        'dates',
+        'snapshot',
+    ]
+})
@@ -0,0 +1,154 @@
+# Pluggable JSON codec for AirThings payloads.
+#
+# `loads` parses raw response bytes and `dumps` serialises plain JSON values,
+# both through the fastest available backend (orjson when installed, the
+# stdlib `json` module otherwise). `dumps_instance` writes any response
+# dataclass (LocationsInstance, MeInstance, ...) straight to JSON bytes, with
+# the same keys and values as `*_to_dict` but without building the
+# intermediate dict tree.
+
+import dataclasses
+import json
+from datetime import datetime
+from enum import Enum
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Dict, List, Optional, Union, get_type_hints
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JsonBackend:
+    def __init__(self, name: str, loads: Callable[[Any], Any], dumps: Callable[[Any], bytes]) -> None:
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+
+def _stdlib_dumps(x: Any) -> bytes:
+    return json.dumps(x, separators=(',', ':')).encode('utf-8')
+
+
+BACKENDS: Dict[str, JsonBackend] = {
+    'json': JsonBackend('json', json.loads, _stdlib_dumps),
+}
+
+if orjson is not None:
+    BACKENDS['orjson'] = JsonBackend('orjson', orjson.loads, orjson.dumps)
+
+_default_backend = BACKENDS['orjson'] if 'orjson' in BACKENDS else BACKENDS['json']
+
+
+def get_backend(name: Optional[str] = None) -> JsonBackend:
+    if name is None:
+        return _default_backend
+    return BACKENDS[name]
+
+
+def set_backend(name: str) -> JsonBackend:
+    global _default_backend
+    _default_backend = BACKENDS[name]
+    return _default_backend
+
+
+def loads(x: Any) -> Any:
+    return _default_backend.loads(x)
+
+
+def dumps(x: Any) -> bytes:
+    return _default_backend.dumps(x)
+
+
+# Attribute names that do not map to their JSON key by snake_case -> camelCase.
+KEY_OVERRIDES = {
+    'range_from': 'from',
+}
+
+
+def to_json_key(attribute: str) -> str:
+    if attribute in KEY_OVERRIDES:
+        return KEY_OVERRIDES[attribute]
+    head, *tail = attribute.rstrip('_').split('_')
+    return head + ''.join(part[:1].upper() + part[1:] for part in tail)
+
+
+# Encoders are generated once per dataclass from its type hints, so that
+# serialising an instance is a single pass of string concatenations with no
+# per-value type dispatch.
+_encoders: Dict[type, Callable[[Any], str]] = {}
+
+_globals: Dict[str, Any] = {
+    '_esc': encode_basestring_ascii,
+    '_json': lambda x: json.dumps(x, separators=(',', ':')),
+    '_encoders': _encoders,
+}
+
+
+def _expression(t: Any, v: str, depth: int) -> str:
+    origin = getattr(t, '__origin__', None)
+    args = getattr(t, '__args__', ())
+
+    if t is str:
+        return '_esc({0})'.format(v)
+    if t is float or t is int:
+        return 'repr({0})'.format(v)
+    if t is bool:
+        return "('true' if {0} else 'false')".format(v)
+    if t is UUID:
+        return "('\"' + str({0}) + '\"')".format(v)
+    if t is datetime:
+        return "('\"' + {0}.isoformat() + '\"')".format(v)
+    if isinstance(t, type) and issubclass(t, Enum):
+        return '_json({0}.value)'.format(v)
+    if isinstance(t, type) and dataclasses.is_dataclass(t):
+        _encoder_for(t)
+        return "_encoders[{0}]({1})".format(_class_name(t), v)
+    if origin is Union and len(args) == 2 and type(None) in args:
+        inner = args[0] if args[1] is type(None) else args[1]
+        return "('null' if {0} is None else {1})".format(v, _expression(inner, v, depth))
+    if origin in (list, List):
+        y = '_y{0}'.format(depth)
+        return "('[' + ','.join([{0} for {1} in {2}]) + ']')".format(_expression(args[0], y, depth + 1), y, v)
+    if origin in (dict, Dict):
+        k = '_k{0}'.format(depth)
+        w = '_w{0}'.format(depth)
+        return "('{{' + ','.join([_esc({0}) + ':' + {1} for ({0}, {2}) in {3}.items()]) + '}}')".format(k, _expression(args[1], w, depth + 1), w, v)
+    return '_json({0})'.format(v)
+
+
+def _class_name(c: type) -> str:
+    name = '_{0}_{1}'.format(c.__name__, id(c))
+    _globals[name] = c
+    return name
+
+
+def _encoder_for(c: type) -> Callable[[Any], str]:
+    encoder = _encoders.get(c)
+    if encoder is not None:
+        return encoder
+
+    # Placeholder for self-referencing dataclasses while the source is generated.
+    _encoders[c] = lambda x: _encoders[c](x)
+
+    hints = get_type_hints(c)
+    parts = []
+    for (i, f) in enumerate(dataclasses.fields(c)):
+        key = encode_basestring_ascii(to_json_key(f.name))
+        parts.append(repr(('{' if i == 0 else ',') + key + ':'))
+        parts.append(_expression(hints[f.name], 'o.' + f.name, 0))
+
+    parts.append("'}'" if len(parts) > 0 else "'{}'")
+    source = "def _encode(o):\n    return ''.join(({0},))\n".format(', '.join(parts))
+
+    namespace: Dict[str, Any] = {}
+    exec(compile(source, '<encoder {0}>'.format(c.__name__), 'exec'), _globals, namespace)
+
+    _encoders[c] = namespace['_encode']
+    return _encoders[c]
+
+
+def dumps_instance(x: Any) -> bytes:
+    return _encoder_for(type(x))(x).encode('ascii')
@@ -0,0 +1,35 @@
+# Date/time parsing for the response classes.
+#
+# The AirThings APIs send ISO 8601 date/times ("2021-01-18T09:46:22", maybe
+# with fractional seconds and an offset or "Z"), which `datetime.fromisoformat`
+# parses in a fraction of the time `dateutil.parser.parse` takes. dateutil is
+# kept as the fallback for anything else, and only imported on first use.
+
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+_fallback: Optional[Callable[[str], datetime]] = None
+
+
+def parse_datetime(x: Any) -> datetime:
+    if not isinstance(x, str):
+        # As dateutil would, without importing it for optional (None) fields.
+        raise TypeError('Parser must be a string or character stream, not {0}'.format(type(x).__name__))
+
+    if len(x) >= 19 and x[4] == '-' and x[10] in 'T ':
+        try:
+            return datetime.fromisoformat(x[:-1] + '+00:00' if x[-1] == 'Z' else x)
+        except ValueError:
+            pass
+
+    return fallback_parse_datetime(x)
+
+
+def fallback_parse_datetime(x: Any) -> datetime:
+    global _fallback
+
+    if _fallback is None:
+        import dateutil.parser
+        _fallback = dateutil.parser.parse
+
+    return _fallback(x)
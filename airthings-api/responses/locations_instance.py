@@ -14,7 +14,8 @@ from dataclasses import dataclass
 from typing import List, Any, Optional, TypeVar, Callable, Type, cast
 from uuid import UUID
 from datetime import datetime
-import dateutil.parser
+
+from .dates import parse_datetime
 
 
 T = TypeVar("T")
@@ -51,7 +52,7 @@ def to_float(x: Any) -> float:
 
 
 def from_datetime(x: Any) -> datetime:
-    return dateutil.parser.parse(x)
+    return parse_datetime(x)
 
 
 def from_none(x: Any) -> Any:
@@ -14,7 +14,8 @@ from dataclasses import dataclass
 from uuid import UUID
 from datetime import datetime
 from typing import Any, Dict, List, TypeVar, Callable, Type, cast
-import dateutil.parser
+
+from .dates import parse_datetime
 
 
 T = TypeVar("T")
@@ -31,7 +32,7 @@ def from_bool(x: Any) -> bool:
 
 
 def from_datetime(x: Any) -> datetime:
-    return dateutil.parser.parse(x)
+    return parse_datetime(x)
 
 
 def from_int(x: Any) -> int:
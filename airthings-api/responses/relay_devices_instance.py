@@ -14,14 +14,15 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import List, Dict, Any, TypeVar, Callable, Type, cast
 from uuid import UUID
-import dateutil.parser
+
+from .dates import parse_datetime
 
 
 T = TypeVar("T")
 
 
 def from_datetime(x: Any) -> datetime:
-    return dateutil.parser.parse(x)
+    return parse_datetime(x)
 
 
 def from_str(x: Any) -> str:
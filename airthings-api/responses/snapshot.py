@@ -0,0 +1,545 @@
+# Compact, versioned binary snapshots of the response instances.
+#
+# To use this code, do
+#
+#     data = encode_snapshot(locations_instance)
+#     locations_instance = decode_snapshot(data)
+#
+# Layout (all integers are LEB128 varints, signed ones zigzag-encoded):
+#
+#     b'ATS' | version (1 byte) | root class name (string) | schema fingerprint (8 bytes)
+#     string table: count, then (utf-8 length, utf-8 bytes) per string
+#     body: fields of the root instance, in declaration order
+#
+# The body carries no type tags: both sides derive the schema from the
+# dataclasses' type hints. Strings are indices into the interned string table,
+# floats are packed IEEE 754 doubles (so values round-trip exactly), UUIDs are
+# their 16 raw bytes and datetimes are microseconds since the epoch plus a UTC
+# offset in seconds (or a naive marker). Optional values get a presence byte.
+# The fingerprint hashes the field names and types of the root class (and of
+# the classes it holds), so snapshots written before a schema change are
+# rejected instead of being misread.
+
+import dataclasses
+import datetime as dt
+import hashlib
+import json
+import struct
+from enum import Enum
+from typing import Any, Callable, Dict, List, Tuple, Union, get_type_hints
+from uuid import UUID
+
+from .locations_instance import LocationsInstance
+from .me_instance import MeInstance
+from .relay_devices_instance import RelayDevicesInstance
+from .thresholds_instance import ThresholdsInstance
+
+
+SNAPSHOT_MAGIC = b'ATS'
+SNAPSHOT_VERSION = 2
+
+ROOT_CLASSES: Dict[str, type] = {
+    c.__name__: c
+    for c in [LocationsInstance, MeInstance, RelayDevicesInstance, ThresholdsInstance]
+}
+
+_EPOCH = dt.datetime(1970, 1, 1)
+_DOUBLE = struct.Struct('<d')
+_NAIVE = 0
+_AWARE = 1
+
+
+class SnapshotFormatError(ValueError):
+    pass
+
+
+class _Writer:
+    __slots__ = ('out', 'strings')
+
+    def __init__(self) -> None:
+        self.out = bytearray()
+        self.strings: Dict[str, int] = {}
+
+
+class _Reader:
+    __slots__ = ('data', 'pos', 'strings')
+
+    def __init__(self, data: bytes) -> None:
+        # Bytes, not a memoryview: indexing them is faster, and slices are bytes already.
+        self.data = bytes(data)
+        self.pos = 0
+        self.strings: List[str] = []
+
+
+def _write_varint(w: _Writer, x: int) -> None:
+    out = w.out
+    while x >= 0x80:
+        out.append((x & 0x7f) | 0x80)
+        x >>= 7
+    out.append(x)
+
+
+def _read_varint(r: _Reader) -> int:
+    data = r.data
+    pos = r.pos
+    result = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if b < 0x80:
+            r.pos = pos
+            return result
+        shift += 7
+
+
+def _write_signed(w: _Writer, x: int) -> None:
+    _write_varint(w, (x << 1) if x >= 0 else ((-x << 1) - 1))
+
+
+def _read_signed(r: _Reader) -> int:
+    x = _read_varint(r)
+    return (x >> 1) if not x & 1 else -((x + 1) >> 1)
+
+
+def _write_str(w: _Writer, x: str) -> None:
+    index = w.strings.get(x)
+    if index is None:
+        index = len(w.strings)
+        w.strings[x] = index
+    _write_varint(w, index)
+
+
+def _read_str(r: _Reader) -> str:
+    return r.strings[_read_varint(r)]
+
+
+def _write_float(w: _Writer, x: float) -> None:
+    w.out += _DOUBLE.pack(x)
+
+
+def _read_float(r: _Reader) -> float:
+    pos = r.pos
+    r.pos = pos + 8
+    return _DOUBLE.unpack_from(r.data, pos)[0]
+
+
+def _write_bool(w: _Writer, x: bool) -> None:
+    w.out.append(1 if x else 0)
+
+
+def _read_bool(r: _Reader) -> bool:
+    pos = r.pos
+    r.pos = pos + 1
+    return r.data[pos] != 0
+
+
+def _write_uuid(w: _Writer, x: UUID) -> None:
+    w.out += x.bytes
+
+
+def _read_uuid(r: _Reader) -> UUID:
+    pos = r.pos
+    r.pos = pos + 16
+    return UUID(bytes=r.data[pos:pos + 16])
+
+
+def _write_datetime(w: _Writer, x: dt.datetime) -> None:
+    offset = x.utcoffset()
+    if offset is None:
+        w.out.append(_NAIVE)
+        delta = x - _EPOCH
+    else:
+        w.out.append(_AWARE)
+        _write_signed(w, offset.days * 86400 + offset.seconds)
+        delta = x.replace(tzinfo=None) - offset - _EPOCH
+    _write_signed(w, (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds)
+
+
+def _read_datetime(r: _Reader) -> dt.datetime:
+    pos = r.pos
+    r.pos = pos + 1
+    if r.data[pos] == _NAIVE:
+        return _EPOCH + dt.timedelta(microseconds=_read_signed(r))
+    offset = dt.timedelta(seconds=_read_signed(r))
+    utc = _EPOCH + dt.timedelta(microseconds=_read_signed(r))
+    return (utc + offset).replace(tzinfo=dt.timezone(offset))
+
+
+def _write_any(w: _Writer, x: Any) -> None:
+    _write_str(w, json.dumps(x, separators=(',', ':')))
+
+
+def _read_any(r: _Reader) -> Any:
+    return json.loads(_read_str(r))
+
+
+def _write_float_list(w: _Writer, x: List[float]) -> None:
+    _write_varint(w, len(x))
+    w.out += struct.pack('<{0}d'.format(len(x)), *x)
+
+
+def _read_float_list(r: _Reader) -> List[float]:
+    count = _read_varint(r)
+    pos = r.pos
+    r.pos = pos + 8 * count
+    return list(struct.unpack_from('<{0}d'.format(count), r.data, pos))
+
+
+_codecs: Dict[Any, Tuple[Callable[[_Writer, Any], None], Callable[[_Reader], Any]]] = {
+    str: (_write_str, _read_str),
+    float: (_write_float, _read_float),
+    int: (_write_signed, _read_signed),
+    bool: (_write_bool, _read_bool),
+    UUID: (_write_uuid, _read_uuid),
+    dt.datetime: (_write_datetime, _read_datetime),
+    Any: (_write_any, _read_any),
+    List[float]: (_write_float_list, _read_float_list),
+}
+
+
+def _codec_for(t: Any) -> Tuple[Callable[[_Writer, Any], None], Callable[[_Reader], Any]]:
+    codec = _codecs.get(t)
+    if codec is not None:
+        return codec
+
+    origin = getattr(t, '__origin__', None)
+    args = getattr(t, '__args__', ())
+
+    if isinstance(t, type) and dataclasses.is_dataclass(t):
+        codec = _dataclass_codec(t)
+
+    elif isinstance(t, type) and issubclass(t, Enum):
+        codec = _enum_codec(t)
+
+    elif origin is Union and len(args) == 2 and type(None) in args:
+        codec = _optional_codec(args[0] if args[1] is type(None) else args[1])
+
+    elif origin in (list, List):
+        codec = _list_codec(args[0])
+
+    elif origin in (dict, Dict) and args[0] is str:
+        codec = _dict_codec(args[1])
+
+    else:
+        raise TypeError('unsupported snapshot type: {0!r}'.format(t))
+
+    _codecs[t] = codec
+    return codec
+
+
+def _dataclass_codec(c: type) -> Tuple[Callable[[_Writer, Any], None], Callable[[_Reader], Any]]:
+    fields: List[Tuple[str, Callable[[_Writer, Any], None]]] = []
+    namespace: Dict[str, Any] = {}
+
+    def write(w: _Writer, x: Any) -> None:
+        for (name, write_field) in fields:
+            write_field(w, getattr(x, name))
+
+    def read(r: _Reader) -> Any:
+        # Only reached through recursive types, while the reader is compiled.
+        return namespace['read'](r)
+
+    # Register before resolving the fields so that recursive types terminate.
+    _codecs[c] = (write, read)
+
+    hints = get_type_hints(c)
+    types = []
+    for f in dataclasses.fields(c):
+        (write_field, _) = _codec_for(hints[f.name])
+        fields.append((f.name, write_field))
+        types.append(hints[f.name])
+
+    read = _compile_reader(c, types, namespace)
+    _codecs[c] = (write, read)
+
+    return (write, read)
+
+
+# Source lines of the compiled readers. Each reads `data` at `pos` into `v`,
+# and moves `pos` past what it read.
+_READ_VARINT = [
+    'b = data[pos]',
+    'pos += 1',
+    'if b >= 0x80:',
+    '    b &= 0x7f',
+    '    shift = 7',
+    '    while True:',
+    '        x = data[pos]',
+    '        pos += 1',
+    '        b |= (x & 0x7f) << shift',
+    '        if x < 0x80:',
+    '            break',
+    '        shift += 7',
+]
+
+_READ_SIGNED = _READ_VARINT + ['v = (b >> 1) if not b & 1 else -((b + 1) >> 1)']
+
+_INLINE_READERS: Dict[Any, List[str]] = {
+    str: _READ_VARINT + ['v = strings[b]'],
+    int: _READ_SIGNED,
+    float: [
+        'v = _unpack_double(data, pos)[0]',
+        'pos += 8',
+    ],
+    bool: [
+        'v = data[pos] != 0',
+        'pos += 1',
+    ],
+    UUID: [
+        'v = _UUID(int=_int_from_bytes(data[pos:pos + 16], "big"))',
+        'pos += 16',
+    ],
+    dt.datetime: ['pos += 1', 'if data[pos - 1] == _NAIVE:'] + [
+        '    ' + line for line in _READ_SIGNED + ['v = _EPOCH + _timedelta(microseconds=v)']
+    ] + ['else:'] + [
+        '    ' + line for line in _READ_SIGNED + ['offset = _timedelta(seconds=v)'] + _READ_SIGNED + [
+            'v = (_EPOCH + _timedelta(microseconds=v) + offset).replace(tzinfo=_timezone(offset))']
+    ],
+    List[float]: _READ_VARINT + [
+        'v = list(_unpack_from("<{0}d".format(b), data, pos))',
+        'pos += 8 * b',
+    ],
+}
+
+
+def _inline_reader(t: Any, index: int, namespace: Dict[str, Any]) -> List[str]:
+    lines = _INLINE_READERS.get(t)
+    if lines is not None:
+        return lines
+
+    origin = getattr(t, '__origin__', None)
+    args = getattr(t, '__args__', ())
+
+    if origin is Union and len(args) == 2 and type(None) in args:
+        value = _inline_reader(args[0] if args[1] is type(None) else args[1], index, namespace)
+        return ['pos += 1', 'if data[pos - 1]:'] + ['    ' + line for line in value] + ['else:', '    v = None']
+
+    name = 'read_{0}'.format(index)
+
+    if origin in (list, List):
+        namespace[name] = _codec_for(args[0])[1]
+        return _READ_VARINT + ['r.pos = pos', 'v = [{0}(r) for _ in range(b)]'.format(name), 'pos = r.pos']
+
+    namespace[name] = _codec_for(t)[1]
+    return ['r.pos = pos', 'v = {0}(r)'.format(name), 'pos = r.pos']
+
+
+def _compile_reader(c: type, types: List[Any], namespace: Dict[str, Any]) -> Callable[[_Reader], Any]:
+    # Like the dataclasses module, build the reader of each class as source:
+    # reading all its fields in one function, without a call per field, is
+    # what makes decoding snapshots faster than parsing the JSON payloads.
+    namespace.update({
+        'cls': c,
+        '_unpack_double': _DOUBLE.unpack_from,
+        '_unpack_from': struct.unpack_from,
+        '_UUID': UUID,
+        '_int_from_bytes': int.from_bytes,
+        '_NAIVE': _NAIVE,
+        '_EPOCH': _EPOCH,
+        '_timedelta': dt.timedelta,
+        '_timezone': dt.timezone,
+    })
+
+    lines = ['def read(r):', '    data = r.data', '    strings = r.strings', '    pos = r.pos']
+    for (i, t) in enumerate(types):
+        lines.extend('    ' + line for line in _inline_reader(t, i, namespace))
+        lines.append('    v{0} = v'.format(i))
+    lines.append('    r.pos = pos')
+    lines.append('    return cls({0})'.format(', '.join('v{0}'.format(i) for i in range(len(types)))))
+
+    exec(compile('\n'.join(lines), '<snapshot reader of {0}>'.format(c.__qualname__), 'exec'), namespace)
+    return namespace['read']
+
+
+def _enum_codec(c: type) -> Tuple[Callable[[_Writer, Any], None], Callable[[_Reader], Any]]:
+    if all(isinstance(member.value, str) for member in c):
+        (write_value, read_value) = (_write_str, _read_str)
+    else:
+        (write_value, read_value) = (_write_any, _read_any)
+
+    def write(w: _Writer, x: Any) -> None:
+        write_value(w, x.value)
+
+    def read(r: _Reader) -> Any:
+        return c(read_value(r))
+
+    return (write, read)
+
+
+def _optional_codec(t: Any) -> Tuple[Callable[[_Writer, Any], None], Callable[[_Reader], Any]]:
+    (write_value, read_value) = _codec_for(t)
+
+    def write(w: _Writer, x: Any) -> None:
+        if x is None:
+            w.out.append(0)
+        else:
+            w.out.append(1)
+            write_value(w, x)
+
+    def read(r: _Reader) -> Any:
+        pos = r.pos
+        r.pos = pos + 1
+        return read_value(r) if r.data[pos] else None
+
+    return (write, read)
+
+
+def _list_codec(t: Any) -> Tuple[Callable[[_Writer, Any], None], Callable[[_Reader], Any]]:
+    (write_item, read_item) = _codec_for(t)
+
+    def write(w: _Writer, x: List[Any]) -> None:
+        _write_varint(w, len(x))
+        for y in x:
+            write_item(w, y)
+
+    def read(r: _Reader) -> List[Any]:
+        return [read_item(r) for _ in range(_read_varint(r))]
+
+    return (write, read)
+
+
+def _dict_codec(t: Any) -> Tuple[Callable[[_Writer, Any], None], Callable[[_Reader], Any]]:
+    (write_value, read_value) = _codec_for(t)
+
+    def write(w: _Writer, x: Dict[str, Any]) -> None:
+        _write_varint(w, len(x))
+        for (k, v) in x.items():
+            _write_str(w, k)
+            write_value(w, v)
+
+    def read(r: _Reader) -> Dict[str, Any]:
+        result = {}
+        for _ in range(_read_varint(r)):
+            k = _read_str(r)
+            result[k] = read_value(r)
+        return result
+
+    return (write, read)
+
+
+# Spelled out: the names of typing constructs vary across Python versions.
+_GENERIC_NAMES = {Union: 'Union', list: 'List', List: 'List', dict: 'Dict', Dict: 'Dict'}
+
+
+def _describe(t: Any, seen: List[type]) -> str:
+    origin = getattr(t, '__origin__', None)
+    args = getattr(t, '__args__', ())
+
+    if isinstance(t, type) and dataclasses.is_dataclass(t):
+        if t in seen:
+            return t.__name__
+
+        hints = get_type_hints(t)
+        fields = ','.join(
+            '{0}:{1}'.format(f.name, _describe(hints[f.name], seen + [t]))
+            for f in dataclasses.fields(t))
+
+        return '{0}{{{1}}}'.format(t.__name__, fields)
+
+    if isinstance(t, type) and issubclass(t, Enum):
+        return '{0}({1})'.format(t.__name__, ','.join(repr(member.value) for member in t))
+
+    if origin is not None:
+        return '{0}[{1}]'.format(
+            _GENERIC_NAMES.get(origin, repr(origin)),
+            ','.join(_describe(arg, seen) for arg in args))
+
+    if t is Any:
+        return 'Any'
+
+    return getattr(t, '__name__', repr(t))
+
+
+_fingerprints: Dict[type, bytes] = {}
+
+
+def schema_fingerprint(c: type) -> bytes:
+    fingerprint = _fingerprints.get(c)
+
+    if fingerprint is None:
+        fingerprint = hashlib.blake2b(_describe(c, []).encode('utf-8'), digest_size=8).digest()
+        _fingerprints[c] = fingerprint
+
+    return fingerprint
+
+
+def encode_snapshot(x: Any) -> bytes:
+    name = type(x).__name__
+    if ROOT_CLASSES.get(name) is not type(x):
+        raise TypeError('cannot snapshot {0!r}'.format(type(x)))
+
+    (write, _) = _codec_for(type(x))
+
+    body = _Writer()
+    write(body, x)
+
+    head = _Writer()
+    head.out += SNAPSHOT_MAGIC
+    head.out.append(SNAPSHOT_VERSION)
+
+    encoded_name = name.encode('utf-8')
+    _write_varint(head, len(encoded_name))
+    head.out += encoded_name
+    head.out += schema_fingerprint(type(x))
+
+    _write_varint(head, len(body.strings))
+    for s in body.strings:
+        encoded = s.encode('utf-8')
+        _write_varint(head, len(encoded))
+        head.out += encoded
+
+    return bytes(head.out + body.out)
+
+
+def decode_snapshot(data: bytes) -> Any:
+    try:
+        if data[:3] != SNAPSHOT_MAGIC:
+            raise SnapshotFormatError('not an AirThings snapshot')
+        if data[3] != SNAPSHOT_VERSION:
+            raise SnapshotFormatError('unsupported snapshot version {0}'.format(data[3]))
+
+        r = _Reader(data)
+        r.pos = 4
+
+        length = _read_varint(r)
+        name = r.data[r.pos:r.pos + length].decode('utf-8')
+        r.pos += length
+
+        c = ROOT_CLASSES.get(name)
+        if c is None:
+            raise SnapshotFormatError('unknown snapshot class {0!r}'.format(name))
+
+        fingerprint = schema_fingerprint(c)
+        if r.data[r.pos:r.pos + len(fingerprint)] != fingerprint:
+            raise SnapshotFormatError('snapshot of {0} written with another schema'.format(name))
+        r.pos += len(fingerprint)
+
+        strings = r.strings
+        data = r.data
+        for _ in range(_read_varint(r)):
+            pos = r.pos
+            length = data[pos]
+            if length < 0x80:
+                pos += 1
+            else:
+                length = _read_varint(r)
+                pos = r.pos
+            r.pos = pos + length
+            strings.append(data[pos:pos + length].decode('utf-8'))
+
+        (_, read) = _codec_for(c)
+        x = read(r)
+
+        if r.pos != len(data):
+            raise SnapshotFormatError('trailing bytes after snapshot')
+
+    except SnapshotFormatError:
+        raise
+
+    except (IndexError, KeyError, OverflowError, TypeError, ValueError, struct.error) as error:
+        # Bit flips surface anywhere: as bad enum values, bad dates, short reads...
+        raise SnapshotFormatError('truncated or corrupt snapshot: {0!r}'.format(error))
+
+    return x
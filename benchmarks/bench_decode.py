@@ -0,0 +1,210 @@
+"""Decode/encode throughput and allocations of the response classes.
+
+    python benchmarks/bench_decode.py [--locations 10] [--devices 50] [--sensors 6] [--number 5]
+                                      [--save results.json] [--compare results.json]
+                                      [--against ../other-checkout] [--threshold 0.1]
+
+For every entity, a synthetic payload of `locations` x `devices` x `sensors`
+(see payloads.py) is decoded with `*_from_dict` and encoded back with
+`*_to_dict`. Reports ops/s, peak traced memory of one decode and the memory
+blocks and bytes the decoded instance retains per item (device for
+`location`/`relay-devices`, location for `me`, payload for `thresholds`).
+
+`--repo` benchmarks another checkout with the payloads of this one;
+`--against` runs the benchmark on both checkouts and compares them;
+`--compare` compares with results saved earlier by `--save`. Both exit with
+status 1 when an operation got slower, or a decode allocates more, by more
+than `threshold`.
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from payloads import generate
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODULES = [
+    ('location', 'locations_instance'),
+    ('thresholds', 'thresholds_instance'),
+    ('relay-devices', 'relay_devices_instance'),
+    ('me', 'me_instance'),
+]
+
+# Lower is better for these measures, higher for the others.
+COSTS = ('peak_bytes', 'blocks_per_item', 'bytes_per_item')
+
+
+def import_package(repo: str) -> Any:
+    sys.path.insert(0, os.path.abspath(repo))
+    try:
+        return __import__('airthings-api')
+    finally:
+        sys.path.pop(0)
+
+
+def items(entity: str, args: argparse.Namespace) -> int:
+    if entity in ('location', 'relay-devices'):
+        return args.locations * args.devices
+    if entity == 'me':
+        return args.locations
+    return 1
+
+
+def measure(statement, number: int) -> float:
+    # At least `number` operations and 0.2 s per repeat, to keep noise down.
+    timer = timeit.Timer(statement)
+    number = max(number, timer.autorange()[0])
+    return number / min(timer.repeat(number=number, repeat=5))
+
+
+def trace(from_dict, payload: Any) -> Tuple[int, int, int]:
+    gc.collect()
+    tracemalloc.start()
+
+    try:
+        instance = from_dict(payload)
+        (_, peak) = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().statistics('filename')
+    finally:
+        tracemalloc.stop()
+
+    del instance
+
+    return (peak, sum(s.count for s in statistics), sum(s.size for s in statistics))
+
+
+def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    ata = import_package(args.repo)
+    results = {}
+
+    for (entity, module_name) in MODULES:
+        module = getattr(ata.responses, module_name)
+        from_dict = getattr(module, module_name + '_from_dict')
+        to_dict = getattr(module, module_name + '_to_dict')
+
+        payload = generate(entity, locations=args.locations, devices=args.devices, sensors=args.sensors, seed=args.seed)
+        instance = from_dict(payload)
+        count = items(entity, args)
+
+        (peak, blocks, size) = trace(from_dict, payload)
+
+        results[entity] = {
+            'items': count,
+            'decode_ops': measure(lambda: from_dict(payload), args.number),
+            'encode_ops': measure(lambda: to_dict(instance), args.number),
+            'peak_bytes': peak,
+            'blocks_per_item': blocks / count,
+            'bytes_per_item': size / count,
+        }
+
+    return results
+
+
+def report(results: Dict[str, Dict[str, float]]) -> None:
+    print('{0:<14} {1:>7} {2:>12} {3:>12} {4:>12} {5:>12} {6:>12}'.format(
+        'entity', 'items', 'decode/s', 'encode/s', 'peak KiB', 'blocks/item', 'bytes/item'))
+
+    for (entity, result) in results.items():
+        print('{0:<14} {1:>7} {2:>12.1f} {3:>12.1f} {4:>12.1f} {5:>12.1f} {6:>12.1f}'.format(
+            entity,
+            result['items'],
+            result['decode_ops'],
+            result['encode_ops'],
+            result['peak_bytes'] / 1024,
+            result['blocks_per_item'],
+            result['bytes_per_item']))
+
+
+def compare(baseline: Dict[str, Dict[str, float]], results: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    regressions = []
+
+    print()
+    print('{0:<14} {1:<16} {2:>14} {3:>14} {4:>9}'.format('entity', 'measure', 'baseline', 'current', 'change'))
+
+    for (entity, result) in results.items():
+        for (name, value) in result.items():
+            if name == 'items' or entity not in baseline or name not in baseline[entity]:
+                continue
+
+            before = baseline[entity][name]
+            change = (value - before) / before if before else 0.0
+            worse = change > threshold if name in COSTS else change < -threshold
+
+            print('{0:<14} {1:<16} {2:>14.1f} {3:>14.1f} {4:>+8.1%}{5}'.format(
+                entity, name, before, value, change, '  REGRESSION' if worse else ''))
+
+            if worse:
+                regressions.append('{0} {1}'.format(entity, name))
+
+    return regressions
+
+
+def run_against(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'baseline.json')
+
+        subprocess.run([
+            sys.executable, os.path.abspath(__file__),
+            '--repo', args.against,
+            '--locations', str(args.locations),
+            '--devices', str(args.devices),
+            '--sensors', str(args.sensors),
+            '--number', str(args.number),
+            '--seed', str(args.seed),
+            '--save', path,
+        ], check=True, stdout=subprocess.DEVNULL)
+
+        with open(path, 'r', encoding='utf-8') as fh:
+            return json.load(fh)['results']
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locations', type=int, default=10)
+    parser.add_argument('--devices', type=int, default=50, help='devices per location')
+    parser.add_argument('--sensors', type=int, default=6, help='sensors per device')
+    parser.add_argument('--number', type=int, default=5, help='minimum operations per timing repeat')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repo', default=ROOT, help='checkout to benchmark')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='compare with results saved by --save')
+    parser.add_argument('--against', help='benchmark this other checkout too and compare with it')
+    parser.add_argument('--threshold', type=float, default=0.1, help='tolerated relative regression')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.against is not None:
+        baseline = run_against(args)
+    elif args.compare is not None:
+        with open(args.compare, 'r', encoding='utf-8') as fh:
+            baseline = json.load(fh)['results']
+
+    results = run(args)
+    report(results)
+
+    if args.save is not None:
+        with open(args.save, 'w', encoding='utf-8') as fh:
+            json.dump({'arguments': vars(args), 'results': results}, fh, indent=2)
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold)
+
+        if len(regressions) > 0:
+            print()
+            print('regressions: {0}'.format(', '.join(regressions)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Import (start-up) time of the package, as paid by short-lived processes.
+
+    python benchmarks/bench_import.py [--repeat 20] [--repo ..]
+
+Every scenario runs in `repeat` fresh interpreters; the table shows the
+median time its code took (interpreter start-up excluded) and whether
+aiohttp and dateutil ended up loaded. Use `--repo` to compare checkouts.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PRELUDE = "import sys, time; sys.path.insert(0, {0!r}); start = time.perf_counter()\n"
+
+EPILOGUE = (
+    "\nimport json\n"
+    "print(json.dumps({'seconds': time.perf_counter() - start,"
+    " 'aiohttp': 'aiohttp' in sys.modules, 'dateutil': 'dateutil' in sys.modules}))\n"
+)
+
+SCENARIOS = [
+    ('import package', "ata = __import__('airthings-api')"),
+    ('decode cached location', (
+        # Stdlib json: `ata.responses.codec` is missing from older checkouts.
+        "import json\n"
+        "ata = __import__('airthings-api')\n"
+        "li = ata.responses.locations_instance\n"
+        "with open({0!r}, 'rb') as fh:\n"
+        "    li.locations_instance_from_dict(json.loads(fh.read()))"
+    ).format(os.path.join(os.path.abspath(ROOT), 'airthings-api', 'samples', 'get_locations.json'))),
+    ('create manager', (
+        "ata = __import__('airthings-api')\n"
+        "ata.api.web.AirThingsManager"
+    )),
+    ('all modules', (
+        "ata = __import__('airthings-api')\n"
+        "[getattr(ata.api, name) for name in dir(ata.api) if not name.startswith('_')]\n"
+        "[getattr(ata.responses, name) for name in dir(ata.responses) if not name.startswith('_')]"
+    )),
+]
+
+
+def run_scenario(repo: str, code: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, '-c', PRELUDE.format(os.path.abspath(repo)) + code + EPILOGUE],
+        check=True,
+        stdout=subprocess.PIPE).stdout
+
+    return json.loads(output.decode('utf-8').splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--repo', default=ROOT, help='checkout to benchmark')
+    args = parser.parse_args()
+
+    print('{0:<24} {1:>10} {2:>8} {3:>9}'.format('scenario', 'ms', 'aiohttp', 'dateutil'))
+
+    for (name, code) in SCENARIOS:
+        results = [run_scenario(args.repo, code) for _ in range(args.repeat)]
+        seconds = statistics.median(result['seconds'] for result in results)
+
+        print('{0:<24} {1:>10.1f} {2:>8} {3:>9}'.format(
+            name,
+            seconds * 1e3,
+            'yes' if results[-1]['aiohttp'] else 'no',
+            'yes' if results[-1]['dateutil'] else 'no'))
+
+
+if __name__ == '__main__':
+    main()
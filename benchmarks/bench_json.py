@@ -0,0 +1,78 @@
+"""Compare JSON backends and binary snapshots on realistic AirThings payloads.
+
+    python benchmarks/bench_json.py [--devices 500] [--number 20]
+
+Payloads are the bundled samples, with the `location` response scaled up to
+the requested number of devices. The `bytes` column is the size of what each
+operation reads or writes: the JSON payload, or the snapshot of the instance.
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from typing import Any, Callable, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from payloads import load_scaled_sample
+
+ata = __import__('airthings-api')
+
+codec = ata.responses.codec
+snapshot = ata.responses.snapshot
+
+ENTITIES = [
+    ('location', 'get_locations.json', ata.responses.locations_instance.locations_instance_from_dict, ata.responses.locations_instance.locations_instance_to_dict),
+    ('thresholds', 'get_thresholds.json', ata.responses.thresholds_instance.thresholds_instance_from_dict, ata.responses.thresholds_instance.thresholds_instance_to_dict),
+    ('relay-devices', 'get_relay_devices.json', ata.responses.relay_devices_instance.relay_devices_instance_from_dict, ata.responses.relay_devices_instance.relay_devices_instance_to_dict),
+    ('me', 'get_me.json', ata.responses.me_instance.me_instance_from_dict, ata.responses.me_instance.me_instance_to_dict),
+]
+
+
+def measure(statement, number: int) -> float:
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number
+
+
+def operations(payload: bytes, from_dict, to_dict) -> List[Tuple[str, int, Callable[[], Any]]]:
+    instance = from_dict(json.loads(payload))
+    data = snapshot.encode_snapshot(instance)
+
+    rows = []
+
+    for backend in codec.BACKENDS.values():
+        rows.append(("loads[{0}]".format(backend.name), len(payload), lambda backend=backend: backend.loads(payload)))
+
+    for backend in codec.BACKENDS.values():
+        rows.append(("loads+from_dict[{0}]".format(backend.name), len(payload), lambda backend=backend: from_dict(backend.loads(payload))))
+
+    rows.append(('decode_snapshot', len(data), lambda: snapshot.decode_snapshot(data)))
+
+    for backend in codec.BACKENDS.values():
+        rows.append(("to_dict+dumps[{0}]".format(backend.name), len(payload), lambda backend=backend: backend.dumps(to_dict(instance))))
+
+    rows.append(('dumps_instance', len(payload), lambda: codec.dumps_instance(instance)))
+    rows.append(('encode_snapshot', len(data), lambda: snapshot.encode_snapshot(instance)))
+
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=500)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    print('{0:<14} {1:>9} {2:<28} {3:>12}'.format('entity', 'bytes', 'operation', 'us/op'))
+
+    for (entity, sample, from_dict, to_dict) in ENTITIES:
+        payload = json.dumps(load_scaled_sample(sample, args.devices)).encode('utf-8')
+
+        for (operation, size, statement) in operations(payload, from_dict, to_dict):
+            print('{0:<14} {1:>9} {2:<28} {3:>12.1f}'.format(
+                entity, size, operation, measure(statement, args.number) * 1e6))
+
+if __name__ == '__main__':
+    main()
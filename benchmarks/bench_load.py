@@ -0,0 +1,147 @@
+"""End-to-end load benchmark against a local fake of the AirThings APIs.
+
+    python benchmarks/bench_load.py [--accounts 100] [--duration 30] [--latency 0.02]
+                                    [--error-rate 0.01] [--token-expiry 60] [--devices 50]
+                                    [--cassette traffic.cassette]
+
+Every account polls `location` in a loop through one shared
+AirThingsManagerPool (one session, retry policy and circuit breakers),
+streaming its results with `iter_instances`. Reports successful polls per
+second, poll latency percentiles, errors, logins and refreshes per hour and
+event loop lag. Runs fully offline.
+With `--cassette`, the fake serves the payloads of a recording (see
+`ata.api.transport`) instead of the bundled samples.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_server import WEB_ENTITIES, FakeAirThings
+
+ata = __import__('airthings-api')
+
+
+def percentile(values: List[float], q: float) -> float:
+    if len(values) == 0:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def load_cassette_payloads(path: str, devices: int) -> Dict[str, bytes]:
+    bodies = ata.api.transport.AirThingsCassette.load(path).latest_bodies()
+    payloads = FakeAirThings(devices=devices).payloads
+
+    for entity in WEB_ENTITIES:
+        body = bodies.get(('GET', '/v1/' + entity))
+        if body is not None:
+            payloads[entity] = body
+
+    return payloads
+
+
+async def measure_loop_lag(lags: List[float], stop: asyncio.Event, period: float = 0.01) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(period)
+        lags.append(loop.time() - start - period)
+
+
+async def poll_account(pool, account_id: str, deadline: float, interval: float, latencies: List[float]) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+
+        # Failures are not yielded: the pool reports them to `on_failure`.
+        async for _ in pool.iter_instances(entity='location', account_ids=[account_id]):
+            latencies.append(time.perf_counter() - start)
+
+        if interval > 0:
+            await asyncio.sleep(interval)
+
+
+async def run(args: argparse.Namespace) -> None:
+    server = FakeAirThings(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        token_expiry=args.token_expiry,
+        devices=args.devices,
+        payloads=load_cassette_payloads(args.cassette, args.devices) if args.cassette is not None else None)
+
+    server.start_in_thread()
+    server.install(ata)
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    lags: List[float] = []
+    stop = asyncio.Event()
+
+    async with ata.api.pool.AirThingsManagerPool(
+            max_concurrency=args.accounts,
+            max_connections=args.connections,
+            on_failure=lambda account_id, error: errors.append(type(error).__name__)) as pool:
+        for i in range(args.accounts):
+            pool.add_account(username='user{0}@example.com'.format(i), password='password')
+
+        await pool.warm_up()
+        server.counters.clear()
+
+        lag_task = asyncio.ensure_future(measure_loop_lag(lags, stop))
+        start = time.perf_counter()
+        deadline = start + args.duration
+
+        await asyncio.gather(*[
+            poll_account(pool, account_id, deadline, args.interval, latencies)
+            for account_id in pool.accounts
+        ])
+
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await lag_task
+
+    server.stop_thread()
+
+    print('accounts        {0}'.format(args.accounts))
+    print('devices         {0} ({1} bytes per location response)'.format(args.devices, len(server.payloads['location'])))
+    print('duration        {0:.1f} s'.format(elapsed))
+    print('polls           {0} ({1:.1f} req/s)'.format(len(latencies), len(latencies) / elapsed))
+    print('errors          {0} ({1:.2%})'.format(len(errors), len(errors) / max(1, len(errors) + len(latencies))))
+    print('latency p50     {0:.2f} ms'.format(percentile(latencies, 0.50) * 1e3))
+    print('latency p99     {0:.2f} ms'.format(percentile(latencies, 0.99) * 1e3))
+    print('logins          {0} ({1:.0f}/h)'.format(server.counters.get('logins', 0), server.counters.get('logins', 0) * 3600 / elapsed))
+    print('refreshes       {0} ({1:.0f}/h)'.format(server.counters.get('refreshes', 0), server.counters.get('refreshes', 0) * 3600 / elapsed))
+    print('server requests {0}'.format(server.counters.get('requests', 0)))
+    print('loop lag p50    {0:.2f} ms'.format(percentile(lags, 0.50) * 1e3))
+    print('loop lag p99    {0:.2f} ms'.format(percentile(lags, 0.99) * 1e3))
+    print('loop lag max    {0:.2f} ms'.format(max(lags, default=0.0) * 1e3))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--interval', type=float, default=0.0, help='pause between polls of an account (s)')
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.02, help='server latency (s)')
+    parser.add_argument('--jitter', type=float, default=0.01, help='extra random server latency (s)')
+    parser.add_argument('--error-rate', type=float, default=0.01, help='fraction of 503 responses')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of 429 responses')
+    parser.add_argument('--token-expiry', type=int, default=60, help='access token lifetime (s)')
+    parser.add_argument('--devices', type=int, default=50, help='devices in the location response')
+    parser.add_argument('--cassette', help='serve the payloads recorded in this cassette')
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+# Local fake of the AirThings accounts and web APIs, for offline benchmarks.
+#
+#     server = FakeAirThings(latency=0.02, error_rate=0.01, token_expiry=300, devices=500)
+#     await server.start()
+#     server.install(ata)  # point AirThingsConstant at the fake
+#     ...
+#     await server.stop()
+#
+# The accounts API implements the 4-step login (password token, consent,
+# authorization code, access/refresh tokens) and refresh; the web API serves
+# the bundled samples (the location response scaled to `devices`), serialised
+# once at start-up. Access tokens expire after `token_expiry` seconds.
+# `start_in_thread()` runs the server on its own event loop, so that it does not
+# show up in the client's loop lag.
+
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from payloads import load_scaled_sample
+
+
+WEB_ENTITIES = {
+    'location': 'get_locations.json',
+    'thresholds': 'get_thresholds.json',
+    'relay-devices': 'get_relay_devices.json',
+    'me/': 'get_me.json',
+}
+
+
+class FakeAirThings:
+    def __init__(
+            self,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            error_rate: float = 0.0,
+            rate_limit_rate: float = 0.0,
+            token_expiry: int = 3600,
+            devices: int = 2,
+            payloads: Optional[Dict[str, bytes]] = None,
+            seed: int = 0) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.token_expiry = token_expiry
+        self.random = random.Random(seed)
+        self.payloads = payloads if payloads is not None else {
+            entity: json.dumps(load_scaled_sample(name, devices)).encode('utf-8')
+            for (entity, name) in WEB_ENTITIES.items()
+        }
+        self.counters: Dict[str, int] = {}
+        self.tokens: Dict[str, float] = {}
+        self.__serial = itertools.count()
+        self.__runner: Optional[web.AppRunner] = None
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return 'http://{0}:{1}/'.format(self.host, self.port)
+
+    def install(self, ata: Any) -> None:
+        constant = ata.api.web.AirThingsConstant
+        constant.CT_ACCOUNTS_API_ROOT = self.url
+        constant.CT_ACCOUNTS_API_BASE = self.url + 'v1/{0}'
+        constant.CT_WEB_API_ROOT = self.url
+        constant.CT_WEB_API_BASE = self.url + 'v1/{0}'
+
+    def count(self, name: str) -> None:
+        self.counters[name] = self.counters.get(name, 0) + 1
+
+    def application(self) -> web.Application:
+        application = web.Application(middlewares=[self.__faults])
+        application.router.add_route('HEAD', '/', self.__head)
+        application.router.add_post('/v1/token', self.__token)
+        application.router.add_get('/v1/consents/dashboard', self.__consent)
+        application.router.add_post('/v1/authorize', self.__authorize)
+
+        for entity in WEB_ENTITIES:
+            application.router.add_get('/v1/' + entity, self.__entity(entity))
+
+        return application
+
+    async def start(self) -> 'FakeAirThings':
+        self.__runner = web.AppRunner(self.application(), access_log=None)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, self.host, self.port)
+        await site.start()
+        self.port = self.__runner.addresses[0][1]
+        return self
+
+    async def stop(self) -> None:
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+
+    def start_in_thread(self) -> 'FakeAirThings':
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, daemon=True)
+        self.__thread.start()
+        asyncio.run_coroutine_threadsafe(self.start(), self.__loop).result()
+        return self
+
+    def stop_thread(self) -> None:
+        if self.__loop is not None:
+            asyncio.run_coroutine_threadsafe(self.stop(), self.__loop).result()
+            self.__loop.call_soon_threadsafe(self.__loop.stop)
+            self.__thread.join()
+            self.__loop.close()
+            self.__loop = None
+            self.__thread = None
+
+    @web.middleware
+    async def __faults(self, request: web.Request, handler: Any) -> web.StreamResponse:
+        self.count('requests')
+
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter > 0 else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if request.method != 'HEAD':
+            draw = self.random.random()
+
+            if draw < self.error_rate:
+                self.count('injected_503')
+                return web.json_response({'error': 'injected'}, status=503)
+
+            if draw < self.error_rate + self.rate_limit_rate:
+                self.count('injected_429')
+                return web.json_response({'error': 'injected'}, status=429, headers={'Retry-After': '0'})
+
+        return await handler(request)
+
+    def __issue(self, prefix: str) -> str:
+        token = '{0}-{1}'.format(prefix, next(self.__serial))
+        self.tokens[token] = time.monotonic() + self.token_expiry
+        return token
+
+    async def __head(self, request: web.Request) -> web.Response:
+        return web.Response(status=404)
+
+    async def __token(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        grant_type = body.get('grant_type')
+
+        if grant_type == 'password':
+            self.count('logins')
+            return web.json_response({'access_token': 'login-token'})
+
+        if grant_type in ('authorization_code', 'refresh_token'):
+            self.count('refreshes' if grant_type == 'refresh_token' else 'authorizations')
+            return web.json_response({
+                'access_token': self.__issue('access'),
+                'refresh_token': 'refresh-token',
+                'expires_in': self.token_expiry,
+            })
+
+        return web.json_response({'error': 'unsupported_grant_type'}, status=400)
+
+    async def __consent(self, request: web.Request) -> web.Response:
+        return web.json_response({'consent': True})
+
+    async def __authorize(self, request: web.Request) -> web.Response:
+        return web.json_response({'redirect_uri': 'https://dashboard.airthings.com/?code=code'})
+
+    def __entity(self, entity: str) -> Any:
+        payload = self.payloads[entity]
+
+        async def handler(request: web.Request) -> web.Response:
+            # Expired tokens get a grace second for the client's clock.
+            expiry = self.tokens.get(request.headers.get('authorization', ''))
+
+            if expiry is None or time.monotonic() > expiry + 1.0:
+                self.count('unauthorized')
+                return web.json_response({'error': 'unauthorized'}, status=401)
+
+            self.count(entity.rstrip('/'))
+            return web.Response(body=payload, content_type='application/json')
+
+        return handler
@@ -0,0 +1,199 @@
+# Synthetic AirThings payloads of any size, shaped like the bundled samples.
+#
+#     payload = generate('location', locations=10, devices=50, sensors=6, seed=1)
+#
+# `location` has `locations` x `devices` devices with `sensors` current sensor
+# values each; `relay-devices` has one hub per location relaying its devices;
+# `me` has one group per location and `sensors` notification thresholds;
+# `thresholds` has a fixed schema and is returned as bundled. Values are
+# random but reproducible for a given seed.
+#
+# `load_scaled_sample` returns a bundled sample instead, the `location` one
+# scaled to a number of devices by copying the sample devices.
+
+import copy
+import datetime as dt
+import json
+import os
+import random
+import uuid
+from typing import Any, Dict, List
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'airthings-api', 'samples')
+
+# (type, unit, thresholds, typical range) of the sensors devices report.
+SENSORS = [
+    ('temp', 'c', [18, 25], (15.0, 28.0)),
+    ('humidity', 'pct', [25, 30, 60, 70], (20.0, 80.0)),
+    ('voc', 'ppb', [250, 2000], (20.0, 2500.0)),
+    ('co2', 'ppm', [800, 1000], (400.0, 1500.0)),
+    ('radonShortTermAvg', 'bq', [100, 150], (5.0, 300.0)),
+    ('pressure', 'mbar', [], (970.0, 1040.0)),
+    ('mold', 'riskIndex', [3, 7], (0.0, 10.0)),
+    ('virusRisk', 'riskIndex', [4, 7], (0.0, 10.0)),
+    ('light', 'pct', [], (0.0, 100.0)),
+    ('pm25', 'pcpp1l', [10, 25], (0.0, 40.0)),
+]
+
+DEVICE_TYPES = ['waveMini', 'wavePlus', 'wave', 'viewPlus']
+
+
+def load_sample(name: str) -> Dict[str, Any]:
+    with open(os.path.join(SAMPLES, name), 'r', encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def load_scaled_sample(name: str, devices: int) -> Dict[str, Any]:
+    """Bundled sample; the `location` one with a single location of `devices` devices copied from it."""
+    sample = load_sample(name)
+
+    if name == 'get_locations.json':
+        template = [d for location in sample['locations'] for d in location['devices']]
+        location = sample['locations'][0]
+        location['devices'] = []
+        for i in range(devices):
+            device = copy.deepcopy(template[i % len(template)])
+            device['serialNumber'] = str(2000000000 + i)
+            location['devices'].append(device)
+        location['deviceCount'] = devices
+        sample['locations'] = [location]
+
+    return sample
+
+
+def sensor_catalogue(sensors: int) -> List[Any]:
+    catalogue = list(SENSORS[:sensors])
+    for i in range(len(catalogue), sensors):
+        catalogue.append(('sensor{0}'.format(i), 'unit', [10, 20], (0.0, 30.0)))
+    return catalogue
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _timestamp(rng: random.Random) -> str:
+    return (dt.datetime(2021, 1, 1) + dt.timedelta(seconds=rng.randint(0, 86400 * 30))).isoformat()
+
+
+def serial_number(location: int, device: int) -> str:
+    return str(2000000000 + location * 100000 + device)
+
+
+def generate_locations(locations: int = 1, devices: int = 10, sensors: int = 4, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    catalogue = sensor_catalogue(sensors)
+    result = []
+
+    for l in range(locations):
+        location_id = _uuid(rng)
+        name = 'Location {0}'.format(l)
+        location_devices = []
+
+        for d in range(devices):
+            values = []
+            for (type_, unit, thresholds, (low, high)) in catalogue:
+                value = round(rng.uniform(low, high), 1)
+                values.append({
+                    'type': type_,
+                    'value': value,
+                    'providedUnit': unit,
+                    'preferredUnit': unit,
+                    'isAlert': len(thresholds) > 0 and value > thresholds[-1],
+                    'thresholds': thresholds,
+                })
+
+            location_devices.append({
+                'serialNumber': serial_number(l, d),
+                'locationName': name,
+                'locationId': location_id,
+                'roomName': 'Room {0}'.format(d),
+                'publiclyAvailable': rng.random() < 0.1,
+                'segmentId': _uuid(rng),
+                'segmentStart': _timestamp(rng),
+                'latestSample': _timestamp(rng),
+                'currentSensorValues': values,
+                'batteryPercentage': rng.randint(0, 100),
+                'rssi': rng.randint(-100, -30),
+                'relayDevice': serial_number(l, 99999),
+                'isHubConnectionLost': rng.random() < 0.02,
+                'type': DEVICE_TYPES[rng.randrange(len(DEVICE_TYPES))],
+            })
+
+        result.append({
+            'id': location_id,
+            'name': name,
+            'lat': round(rng.uniform(-90, 90), 6),
+            'lng': round(rng.uniform(-180, 180), 6),
+            'devices': location_devices,
+            'lowBatteryCount': sum(1 for device in location_devices if device['batteryPercentage'] < 10),
+            'deviceCount': devices,
+            'floorplans': [],
+            'usageHours': {},
+            'address': '{0} Main Street'.format(l),
+        })
+
+    return {'locations': result}
+
+
+def generate_relay_devices(locations: int = 1, devices: int = 10, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    hubs = []
+
+    for l in range(locations):
+        serials = [serial_number(l, d) for d in range(devices)]
+        hubs.append({
+            'serialNumber': serial_number(l, 99999),
+            'deviceType': 'hub',
+            'locationId': _uuid(rng),
+            'name': 'Hub {0}'.format(l),
+            'metaData': {
+                'lastSeen': _timestamp(rng),
+                'bleFirmwareVersion': '1.0.0',
+                'subFirmwareVersion': '2.0.0',
+                'stFirmwareVersion': '2.0.0',
+                'lastSeenDevices': [s for s in serials if rng.random() > 0.02],
+                'devices': {s: rng.randint(0, 2 ** 32) for s in serials},
+                'region': 'ETSI',
+                'cell': False,
+            },
+        })
+
+    return {'hubs': hubs}
+
+
+def generate_me(locations: int = 1, sensors: int = 4, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    me = load_sample('get_me.json')
+    template = next(iter(me['notifications']['thresholds'].values()))
+
+    thresholds = dict(me['notifications']['thresholds'])
+    for (type_, unit, _, _) in sensor_catalogue(sensors):
+        if type_ not in thresholds:
+            threshold = copy.deepcopy(template)
+            threshold['unit'] = unit
+            thresholds[type_] = threshold
+    me['notifications']['thresholds'] = thresholds
+
+    group = me['groups'][0]
+    me['groups'] = []
+    for l in range(locations):
+        g = copy.deepcopy(group)
+        g['id'] = _uuid(rng)
+        g['groupName'] = 'Group {0}'.format(l)
+        g['genesis'] = l == 0
+        me['groups'].append(g)
+
+    return me
+
+
+def generate(entity: str, locations: int = 1, devices: int = 10, sensors: int = 4, seed: int = 0) -> Dict[str, Any]:
+    if entity == 'location':
+        return generate_locations(locations=locations, devices=devices, sensors=sensors, seed=seed)
+    if entity == 'relay-devices':
+        return generate_relay_devices(locations=locations, devices=devices, seed=seed)
+    if entity == 'me':
+        return generate_me(locations=locations, sensors=sensors, seed=seed)
+    if entity == 'thresholds':
+        return load_sample('get_thresholds.json')
+    raise KeyError(entity)
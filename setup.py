@@ -25,5 +25,8 @@ setup(
     install_requires=[
         'aiohttp>=3.7.0',
     ],
+    extras_require={
+        'fast': ['orjson'],
+    },
     python_requires='>=3.7',
     packages=find_packages())
\ No newline at end of file
@@ -0,0 +1,86 @@
+# Shared fixtures of the test suite.
+#
+#     python -m pytest -q
+#
+# Tests talk to the local fake of the AirThings APIs (benchmarks/fake_server.py,
+# run on its own thread) or replay scripted exchanges through
+# `AirThingsReplayTransport`, so they never reach the network. Coroutines are
+# run with `asyncio.run` from plain test functions.
+
+import json
+import os
+import sys
+from typing import Any, Iterable, Optional, Tuple
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+ata = __import__('airthings-api')
+
+from fake_server import FakeAirThings  # noqa: E402
+from payloads import load_sample  # noqa: E402
+
+
+LOCATIONS = load_sample('get_locations.json')
+
+LOGIN = [
+    ('POST', '/v1/token', 200, {'access_token': 'login-token'}),
+    ('GET', '/v1/consents/dashboard?client_id=dashboard&redirect_uri=https://dashboard.airthings.com', 200, {'consent': True}),
+    ('POST', '/v1/authorize?client_id=dashboard&redirect_uri=https://dashboard.airthings.com', 200, {'redirect_uri': 'https://dashboard.airthings.com/?code=code'}),
+    ('POST', '/v1/token', 200, {'access_token': 'access', 'refresh_token': 'refresh', 'expires_in': 3600}),
+]
+
+
+def scripted_transport(
+        exchanges: Iterable[Tuple[str, str, int, Any]],
+        headers: Optional[dict] = None,
+        repeat: bool = False) -> Any:
+    """Replay transport answering `(method, path, status, json body)` in order, per path."""
+    transport = ata.api.transport
+    cassette = transport.AirThingsCassette()
+
+    for (method, path, status, body) in exchanges:
+        cassette.add(
+            transport.AirThingsExchange(
+                method=method,
+                url='https://example.invalid' + path,
+                status=status,
+                headers=dict(headers or {}) if status in (429, 503) else {}),
+            json.dumps(body).encode('utf-8'))
+
+    return transport.AirThingsReplayTransport(cassette=cassette, speed=None, repeat=repeat)
+
+
+def locations_manager(username: str = 'jdoe', **kwargs) -> Any:
+    """Manager whose every locations poll answers the bundled sample."""
+    transport = scripted_transport(LOGIN + [('GET', '/v1/location', 200, LOCATIONS)], repeat=True)
+    return ata.api.web.AirThingsManager(username=username, password='secret', session=transport, **kwargs)
+
+
+def fast_retries(**kwargs) -> Any:
+    options = dict(max_attempts=3, base_delay=0.0, max_delay=0.0, deadline=10.0)
+    options.update(kwargs)
+    return ata.api.retry.AirThingsRetryPolicy(**options)
+
+
+@pytest.fixture
+def fake():
+    """The fake AirThings APIs, with `AirThingsConstant` pointing at them."""
+    constant = ata.api.web.AirThingsConstant
+    saved = {name: value for (name, value) in vars(constant).items() if name.startswith('CT_')}
+
+    server = FakeAirThings().start_in_thread()
+    server.install(ata)
+
+    try:
+        yield server
+
+    finally:
+        server.stop_thread()
+
+        for (name, value) in saved.items():
+            setattr(constant, name, value)
@@ -0,0 +1,68 @@
+import argparse
+
+import pytest
+
+from conftest import ata
+from payloads import generate
+
+import bench_decode
+
+responses = ata.responses
+
+
+def test_payloads_are_reproducible_and_sized():
+    payload = generate('location', locations=3, devices=4, sensors=12, seed=5)
+
+    assert payload == generate('location', locations=3, devices=4, sensors=12, seed=5)
+    assert payload != generate('location', locations=3, devices=4, sensors=12, seed=6)
+    assert [len(location['devices']) for location in payload['locations']] == [4, 4, 4]
+    assert {len(device['currentSensorValues']) for location in payload['locations'] for device in location['devices']} == {12}
+
+
+@pytest.mark.parametrize('entity, module_name', bench_decode.MODULES)
+def test_every_entity_decodes(entity, module_name):
+    module = getattr(responses, module_name)
+    payload = generate(entity, locations=2, devices=3, sensors=5, seed=1)
+
+    instance = getattr(module, module_name + '_from_dict')(payload)
+
+    assert getattr(module, module_name + '_from_dict')(getattr(module, module_name + '_to_dict')(instance)) == instance
+
+
+def test_hubs_relay_the_generated_devices():
+    locations = responses.locations_instance.locations_instance_from_dict(generate('location', locations=2, devices=3))
+    relays = responses.relay_devices_instance.relay_devices_instance_from_dict(generate('relay-devices', locations=2, devices=3))
+
+    assert {device.relay_device for location in locations.locations for device in location.devices} == \
+        {hub.serial_number for hub in relays.hubs}
+
+
+def test_unknown_entities_are_rejected():
+    with pytest.raises(KeyError):
+        generate('weather')
+
+
+def test_items_per_entity():
+    args = argparse.Namespace(locations=3, devices=4)
+
+    assert [bench_decode.items(entity, args) for (entity, _) in bench_decode.MODULES] == [12, 1, 12, 3]
+
+
+def test_regressions_depend_on_the_direction_of_the_measure(capsys):
+    baseline = {'location': {'items': 10, 'decode_ops': 100.0, 'encode_ops': 100.0, 'peak_bytes': 1000, 'bytes_per_item': 10.0}}
+    results = {'location': {'items': 10, 'decode_ops': 85.0, 'encode_ops': 120.0, 'peak_bytes': 1050, 'bytes_per_item': 12.0}}
+
+    assert bench_decode.compare(baseline, results, threshold=0.1) == ['location decode_ops', 'location bytes_per_item']
+    assert bench_decode.compare(baseline, baseline, threshold=0.1) == []
+    assert 'REGRESSION' in capsys.readouterr().out
+
+
+def test_retained_memory_grows_with_the_payload():
+    from_dict = responses.locations_instance.locations_instance_from_dict
+
+    (_, small_blocks, small_bytes) = bench_decode.trace(from_dict, generate('location', devices=10))
+    (peak, large_blocks, large_bytes) = bench_decode.trace(from_dict, generate('location', devices=100))
+
+    assert peak > 0
+    assert large_bytes > small_bytes > 0
+    assert large_blocks > 5 * small_blocks
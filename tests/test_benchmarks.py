@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT, ata
+from payloads import load_scaled_sample
+
+import bench_json
+import bench_load
+
+BENCHMARKS = ['bench_decode.py', 'bench_import.py', 'bench_json.py', 'bench_load.py']
+
+
+def test_scaled_location_sample():
+    sample = load_scaled_sample('get_locations.json', 25)
+    devices = sample['locations'][0]['devices']
+
+    assert len(sample['locations']) == 1
+    assert sample['locations'][0]['deviceCount'] == 25
+    assert len({device['serialNumber'] for device in devices}) == 25
+    assert ata.responses.locations_instance.locations_instance_from_dict(sample).locations[0].devices[24].serial_number == '2000000024'
+
+
+@pytest.mark.parametrize('entity, sample, from_dict, to_dict', bench_json.ENTITIES)
+def test_json_benchmark_decodes_payloads_and_snapshots_alike(entity, sample, from_dict, to_dict):
+    payload = json.dumps(load_scaled_sample(sample, 5)).encode('utf-8')
+    instance = from_dict(json.loads(payload))
+    rows = {operation: (size, statement) for (operation, size, statement) in bench_json.operations(payload, from_dict, to_dict)}
+
+    assert rows['decode_snapshot'][0] < rows['loads+from_dict[json]'][0] == len(payload)
+    assert rows['decode_snapshot'][1]() == rows['loads+from_dict[json]'][1]() == instance
+    assert ata.responses.snapshot.decode_snapshot(rows['encode_snapshot'][1]()) == instance
+
+
+@pytest.mark.parametrize('name', BENCHMARKS)
+def test_help_shows_the_module_docstring(name):
+    output = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'benchmarks', name), '--help'],
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True).stdout
+
+    assert '    python benchmarks/{0}'.format(name) in output
+
+
+def test_load_benchmark_runs_against_the_fake(capsys):
+    constant = ata.api.web.AirThingsConstant
+    saved = {name: value for (name, value) in vars(constant).items() if name.startswith('CT_')}
+
+    try:
+        asyncio.run(bench_load.run(argparse.Namespace(
+            accounts=3, duration=0.2, interval=0.0, connections=10, latency=0.0, jitter=0.0,
+            error_rate=0.0, rate_limit_rate=0.0, token_expiry=60, devices=5, cassette=None)))
+
+    finally:
+        for (name, value) in saved.items():
+            setattr(constant, name, value)
+
+    report = dict(line.split(None, 1) for line in capsys.readouterr().out.splitlines() if not line.startswith(('latency', 'loop')))
+
+    assert report['accounts'] == '3'
+    assert int(report['polls'].split()[0]) > 0
+    assert report['errors'].startswith('0 ')
+    assert report['logins'].startswith('0 ')
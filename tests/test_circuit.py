@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from conftest import LOCATIONS, LOGIN, ata, fast_retries, scripted_transport
+
+circuit = ata.api.circuit
+exceptions = ata.api.exceptions
+State = circuit.AirThingsCircuitState
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit, 'time', clock)
+    return clock
+
+
+def server_error():
+    return exceptions.AirThingsServerException(error_code=503, error_details='')
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = circuit.AirThingsCircuitBreaker(host='h', failure_threshold=3, recovery_timeout=10.0)
+
+    breaker.record_outcome(server_error())
+    breaker.record_outcome(server_error())
+    breaker.record_success()
+    breaker.record_outcome(server_error())
+    breaker.record_outcome(server_error())
+
+    assert breaker.state == State.Closed
+
+    breaker.record_outcome(server_error())
+
+    assert breaker.state == State.Open
+    assert breaker.opened_count == 1
+    assert breaker.allow_request() is False
+    assert breaker.rejected_count == 1
+    assert breaker.retry_in == 10.0
+
+
+def test_half_open_probes_close_or_reopen(clock):
+    breaker = circuit.AirThingsCircuitBreaker(host='h', failure_threshold=1, recovery_timeout=10.0, half_open_max_calls=2)
+    breaker.record_failure()
+
+    clock.now += 10.0
+
+    assert breaker.state == State.HalfOpen
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False
+
+    breaker.record_failure()
+
+    assert breaker.state == State.Open
+    assert breaker.opened_count == 2
+
+    clock.now += 10.0
+
+    assert breaker.allow_request() is True
+
+    breaker.record_success()
+
+    assert breaker.state == State.Closed
+    assert breaker.consecutive_failures == 0
+
+
+def test_released_probes_free_their_slot(clock):
+    breaker = circuit.AirThingsCircuitBreaker(host='h', failure_threshold=1, recovery_timeout=1.0)
+    breaker.record_failure()
+    clock.now += 1.0
+
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False
+
+    breaker.release()
+
+    assert breaker.allow_request() is True
+
+
+@pytest.mark.parametrize('error', [
+    exceptions.AirThingsUnauthorizedException(error_code=401, error_details=''),
+    exceptions.AirThingsClientException(error_code=404, error_details=''),
+])
+def test_client_errors_do_not_count(error):
+    breaker = circuit.AirThingsCircuitBreaker(host='h', failure_threshold=1)
+    breaker.record_outcome(error)
+
+    assert breaker.state == State.Closed
+
+
+def test_registry_shares_one_breaker_per_host():
+    breakers = circuit.AirThingsCircuitBreakers(failure_threshold=2)
+
+    assert breakers.get('a') is breakers.get('a')
+    assert breakers.get('a') is not breakers.get('b')
+    assert breakers.get('b').failure_threshold == 2
+
+
+def test_open_circuit_fails_fast_or_serves_stale():
+    async def scenario(serve_stale):
+        transport = scripted_transport(LOGIN + [('GET', '/v1/location', 200, LOCATIONS)] + [('GET', '/v1/location', 503, {})] * 2)
+        manager = ata.api.web.AirThingsManager(
+            username='jdoe',
+            password='secret',
+            session=transport,
+            retry_policy=fast_retries(max_attempts=1),
+            circuit_breakers=circuit.AirThingsCircuitBreakers(failure_threshold=2, recovery_timeout=60.0),
+            serve_stale=serve_stale)
+
+        first = await manager.get_locations_instance()
+        breaker = manager.circuit_breakers.get('web-api.airthin.gs')
+
+        # While the circuit is closed, failed polls raise their own error and count.
+        for failures in (1, 2):
+            assert breaker.state == State.Closed
+
+            with pytest.raises(exceptions.AirThingsServerException):
+                await manager.get_locations_instance()
+
+            assert breaker.consecutive_failures == failures
+
+        assert breaker.state == State.Open
+
+        requests = transport.requests
+
+        try:
+            return (first, await manager.get_locations_instance())
+        finally:
+            assert transport.requests == requests
+
+    (first, stale) = asyncio.run(scenario(serve_stale=True))
+
+    assert stale is first
+
+    with pytest.raises(exceptions.AirThingsCircuitOpenException) as raised:
+        asyncio.run(scenario(serve_stale=False))
+
+    assert raised.value.host == 'web-api.airthin.gs'
+    assert 0 < raised.value.retry_in <= 60.0
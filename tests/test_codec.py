@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from conftest import ata
+from payloads import generate, load_sample
+
+codec = ata.responses.codec
+responses = ata.responses
+
+SAMPLES = [
+    ('get_locations.json', responses.locations_instance.locations_instance_from_dict, responses.locations_instance.locations_instance_to_dict),
+    ('get_thresholds.json', responses.thresholds_instance.thresholds_instance_from_dict, responses.thresholds_instance.thresholds_instance_to_dict),
+    ('get_relay_devices.json', responses.relay_devices_instance.relay_devices_instance_from_dict, responses.relay_devices_instance.relay_devices_instance_to_dict),
+    ('get_me.json', responses.me_instance.me_instance_from_dict, responses.me_instance.me_instance_to_dict),
+]
+
+
+@pytest.fixture(params=sorted(codec.BACKENDS))
+def backend(request):
+    previous = codec.get_backend()
+    yield codec.set_backend(request.param)
+    codec.set_backend(previous.name)
+
+
+def test_backends_round_trip_plain_values(backend):
+    value = {'a': [1, 2.5, None, True], 'b': 'é'}
+
+    assert json.loads(backend.dumps(value)) == value
+    assert codec.loads(codec.dumps(value)) == value
+    assert codec.loads(json.dumps(value).encode('utf-8')) == value
+
+
+def test_unknown_backends_are_rejected():
+    with pytest.raises(KeyError):
+        codec.set_backend('yaml')
+
+
+@pytest.mark.parametrize('name, from_dict, to_dict', SAMPLES)
+def test_dumps_instance_matches_to_dict(name, from_dict, to_dict):
+    instance = from_dict(load_sample(name))
+
+    assert json.loads(codec.dumps_instance(instance)) == json.loads(json.dumps(to_dict(instance)))
+
+
+def test_dumps_instance_on_generated_payloads():
+    li = responses.locations_instance
+    instance = li.locations_instance_from_dict(generate('location', locations=3, devices=20, sensors=8, seed=3))
+
+    assert li.locations_instance_from_dict(codec.loads(codec.dumps_instance(instance))) == instance
@@ -0,0 +1,64 @@
+import asyncio
+import concurrent.futures
+import json
+
+import aiohttp
+
+from conftest import LOCATIONS, ata
+
+
+class CountingExecutor(concurrent.futures.ThreadPoolExecutor):
+    def __init__(self) -> None:
+        super().__init__(max_workers=1, thread_name_prefix='decode')
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def poll_all(decode_threshold):
+    executor = CountingExecutor()
+
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            manager = ata.api.web.AirThingsManager(
+                username='jdoe',
+                password='secret',
+                session=session,
+                decode_executor=executor,
+                decode_threshold=decode_threshold)
+
+            return await asyncio.gather(*[getattr(manager, method)() for method in manager.ENTITIES.values()])
+
+    try:
+        return (asyncio.run(scenario()), executor.submitted)
+    finally:
+        executor.shutdown()
+
+
+def test_big_payloads_are_decoded_off_the_loop(fake):
+    (instances, submitted) = poll_all(decode_threshold=0)
+
+    assert submitted == 4
+    assert [type(instance).__name__ for instance in instances] == [
+        'LocationsInstance', 'ThresholdsInstance', 'RelayDevicesInstance', 'MeInstance']
+
+
+def test_small_payloads_are_decoded_inline(fake):
+    (instances, submitted) = poll_all(decode_threshold=1 << 30)
+
+    assert submitted == 0
+    assert len(instances) == 4
+
+
+def test_decoding_works_in_a_process_pool():
+    payload = json.dumps(LOCATIONS).encode('utf-8')
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        instance = executor.submit(
+            ata.api.web.decode_payload,
+            ata.responses.locations_instance.locations_instance_from_dict,
+            payload).result()
+
+    assert len(instance.locations) > 0
@@ -0,0 +1,133 @@
+import asyncio
+import dataclasses
+
+from conftest import ata
+from payloads import generate
+
+dedup = ata.api.dedup
+li = ata.responses.locations_instance
+exceptions = ata.api.exceptions
+
+LOCATIONS = li.locations_instance_from_dict(generate('location', locations=4, devices=3, seed=4)).locations
+(L0, L1, L2, L3) = [location.id_ for location in LOCATIONS]
+
+
+class StubManager:
+    """Sees the locations `sees` (indexes into `locations`), or raises `error`."""
+
+    def __init__(self, sees, error=None, locations=LOCATIONS) -> None:
+        self.sees = sees
+        self.error = error
+        self.locations = locations
+        self.polls = 0
+
+    async def get_locations_instance(self):
+        self.polls += 1
+
+        if self.error is not None:
+            raise self.error
+
+        return li.LocationsInstance([self.locations[i] for i in self.sees])
+
+
+def shared_locations(accounts):
+    pool = ata.api.pool.AirThingsManagerPool()
+
+    for (account_id, manager) in accounts.items():
+        pool.add_account(username=account_id, password='secret')
+        pool.managers[account_id] = manager
+
+    return dedup.AirThingsSharedLocations(pool, rediscover_interval=3600.0)
+
+
+def location_ids(instance):
+    return {location.id_ for location in instance.locations}
+
+
+def test_fewest_accounts_cover_every_location():
+    accounts = {
+        'a': StubManager([0, 1]),
+        'b': StubManager([1, 2]),
+        'c': StubManager([2, 3]),
+        'd': StubManager([3]),
+    }
+    shared = shared_locations(accounts)
+
+    assert location_ids(asyncio.run(shared.discover())) == {L0, L1, L2, L3}
+    assert shared.assignments() == {'a': {L0, L1}, 'c': {L2, L3}}
+    assert shared.accounts_of(L1) == {'a', 'b'}
+
+    instance = asyncio.run(shared.refresh())
+
+    assert location_ids(instance) == {L0, L1, L2, L3}
+    assert [manager.polls for manager in accounts.values()] == [2, 1, 2, 1]
+    assert shared.as_dict()['shared_locations'] == 3
+
+
+def test_devices_are_deduplicated_by_serial_number():
+    # A device listed under two locations (e.g. moved between polls) is kept once.
+    moved = dataclasses.replace(LOCATIONS[1], devices=LOCATIONS[0].devices[:1] + LOCATIONS[1].devices)
+    shared = shared_locations({'a': StubManager([0, 1], locations=[LOCATIONS[0], moved])})
+
+    devices = [device.serial_number for location in asyncio.run(shared.discover()).locations for device in location.devices]
+
+    assert len(devices) == len(set(devices)) == 6
+
+
+def test_failed_owners_fail_over_in_the_same_refresh():
+    accounts = {'a': StubManager([0, 1, 2]), 'b': StubManager([0, 1]), 'c': StubManager([2])}
+    shared = shared_locations(accounts)
+    asyncio.run(shared.discover())
+
+    assert shared.assignments() == {'a': {L0, L1, L2}}
+
+    accounts['a'].error = exceptions.AirThingsServerException(error_code=503, error_details='')
+    instance = asyncio.run(shared.refresh())
+
+    assert location_ids(instance) == {L0, L1, L2}
+    assert shared.assignments() == {'b': {L0, L1}, 'c': {L2}}
+    assert shared.failovers == 2
+
+
+def test_accounts_failing_discovery_are_forgotten_then_retried():
+    accounts = {'a': StubManager([0, 1]), 'b': StubManager([2])}
+    shared = shared_locations(accounts)
+    asyncio.run(shared.discover())
+
+    # 'a' would now see L3 only, but its poll fails: L0 and L1 must not stay planned through it.
+    accounts['a'].sees = [3]
+    accounts['a'].error = exceptions.AirThingsServerException(error_code=503, error_details='')
+    instance = asyncio.run(shared.discover())
+
+    assert location_ids(instance) == {L2}
+    assert 'a' not in shared.locations_of
+    assert shared.assignments() == {'b': {L2}}
+
+    accounts['a'].error = None
+
+    assert location_ids(asyncio.run(shared.refresh())) == {L2, L3}
+    assert shared.assignments() == {'a': {L3}, 'b': {L2}}
+
+
+def test_invalid_credentials_are_quarantined_until_discovery():
+    accounts = {'a': StubManager([0]), 'b': StubManager([0])}
+    shared = shared_locations(accounts)
+    accounts['a'].error = exceptions.AirThingsInvalidCredentialsException()
+
+    asyncio.run(shared.discover())
+    asyncio.run(shared.refresh())
+
+    assert shared.quarantined == {'a'}
+    assert accounts['a'].polls == 1
+    assert shared.assignments() == {'b': {L0}}
+
+
+def test_removed_accounts_leave_the_plan():
+    accounts = {'a': StubManager([0, 1]), 'b': StubManager([1])}
+    shared = shared_locations(accounts)
+    asyncio.run(shared.discover())
+
+    shared.pool.remove_account('a')
+
+    assert location_ids(asyncio.run(shared.discover())) == {L1}
+    assert shared.assignments() == {'b': {L1}}
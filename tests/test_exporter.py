@@ -0,0 +1,87 @@
+import asyncio
+import re
+
+import aiohttp
+
+from conftest import LOCATIONS, ata, locations_manager
+
+exporter = ata.api.exporter
+metrics = ata.api.metrics
+li = ata.responses.locations_instance
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$')
+
+
+def samples(text):
+    result = []
+
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+
+        match = SAMPLE.match(line)
+        assert match is not None, line
+        float(match.group(3))
+        result.append((match.group(1), match.group(2) or '', match.group(3)))
+
+    return result
+
+
+def test_readings_are_labelled_gauges():
+    lines = []
+    exporter.render_locations(li.locations_instance_from_dict(LOCATIONS), lines)
+    rendered = samples('\n'.join(lines))
+
+    devices = [device for location in LOCATIONS['locations'] for device in location['devices']]
+    readings = [sensor for device in devices for sensor in device['currentSensorValues'] if sensor['value'] is not None]
+
+    assert len([name for (name, _, _) in rendered if name == 'airthings_sensor_value']) == len(readings)
+    assert all('serial_number="' in labels and 'location_id="' in labels for (_, labels, _) in rendered)
+
+
+def test_labels_are_escaped():
+    assert exporter.escape_label('a "b"\\\nc') == 'a \\"b\\"\\\\\\nc'
+    assert exporter.metric_name('http.first_byte') == 'airthings_client_http_first_byte'
+
+
+def test_client_metrics_are_histograms_counters_and_sources():
+    collected = metrics.AirThingsMetrics(bounds=(0.1, 1.0))
+    collected.observe(name='poll', label='location', value=0.05)
+    collected.observe(name='poll', label='location', value=5.0)
+    collected.increment(name='http.status.200', label='web-api.airthin.gs/v1/location', value=3)
+    collected.add_source('retry', lambda: {'attempts': 2, 'nested': {'rejected': 1}, 'name': 'skipped'})
+    collected.add_source('retry', lambda: {'attempts': 3, 'nested': {'rejected': 0}, 'name': 'skipped'})
+
+    lines = []
+    exporter.render_metrics(collected, lines)
+    rendered = {(name, labels): value for (name, labels, value) in samples('\n'.join(lines))}
+
+    assert rendered[('airthings_client_poll_seconds_bucket', '{entity="location",le="0.1"}')] == '1'
+    assert rendered[('airthings_client_poll_seconds_bucket', '{entity="location",le="1.0"}')] == '1'
+    assert rendered[('airthings_client_poll_seconds_bucket', '{entity="location",le="+Inf"}')] == '2'
+    assert rendered[('airthings_client_poll_seconds_count', '{entity="location"}')] == '2'
+    assert rendered[('airthings_client_http_responses_total', '{endpoint="web-api.airthin.gs/v1/location",code="200"}')] == '3'
+    assert rendered[('airthings_client_retry_attempts', '')] == '5'
+    assert rendered[('airthings_client_retry_nested_rejected', '')] == '1'
+    assert '# TYPE airthings_client_poll_seconds histogram' in lines
+
+
+def test_scrapes_serve_the_latest_poll():
+    async def scenario():
+        manager = locations_manager(metrics=metrics.AirThingsMetrics())
+
+        async with exporter.AirThingsPrometheusExporter(manager, interval=60.0, host='127.0.0.1', port=0) as server:
+            for _ in range(100):
+                if b'airthings_sensor_value{' in server.body:
+                    break
+                await asyncio.sleep(0.01)
+
+            async with aiohttp.ClientSession() as session:
+                async with session.get('http://127.0.0.1:{0}/metrics'.format(server.port)) as response:
+                    return (response.headers['Content-Type'], await response.text())
+
+    (content_type, text) = asyncio.run(scenario())
+    names = {name for (name, _, _) in samples(text)}
+
+    assert content_type == exporter.CONTENT_TYPE
+    assert {'airthings_sensor_value', 'airthings_device_rssi', 'airthings_client_poll_seconds_count'} <= names
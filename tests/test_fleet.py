@@ -0,0 +1,85 @@
+import copy
+
+from conftest import ata
+from payloads import generate
+
+fleet = ata.api.fleet
+li = ata.responses.locations_instance
+
+
+def instance_of(payload):
+    return li.locations_instance_from_dict(copy.deepcopy(payload))
+
+
+def brute_force(instance, key, k, reverse=False):
+    devices = [device for location in instance.locations for device in location.devices if key(device) is not None]
+    ordered = sorted(devices, key=lambda device: (key(device), device.serial_number))
+    return [device.serial_number for device in (ordered[::-1] if reverse else ordered)[:k]]
+
+
+def serials(devices):
+    return [device.serial_number for device in devices]
+
+
+def test_queries_match_a_full_sort():
+    instance = instance_of(generate('location', locations=3, devices=40, seed=1))
+    index = fleet.AirThingsFleetIndex()
+
+    assert index.update(instance) == 120
+
+    assert serials(index.lowest_battery(10)) == brute_force(instance, lambda device: device.battery_percentage, 10)
+    assert serials(index.weakest_rssi(5)) == brute_force(instance, lambda device: device.rssi, 5)
+    assert serials(index.most_stale(5)) == brute_force(instance, fleet._latest_sample_key, 5)
+    assert serials(index.largest('rssi', 3)) == brute_force(instance, lambda device: device.rssi, 3, reverse=True)
+    assert index.largest('rssi', 0) == []
+    assert serials(index.lost_hub_connection()) == sorted(
+        device.serial_number for location in instance.locations for device in location.devices
+        if device.is_hub_connection_lost)
+
+
+def test_only_changed_devices_are_reindexed():
+    payload = generate('location', locations=1, devices=50, seed=2)
+    index = fleet.AirThingsFleetIndex()
+    index.update(instance_of(payload))
+
+    assert index.update(instance_of(payload)) == 0
+
+    devices = payload['locations'][0]['devices']
+    devices[7]['batteryPercentage'] = -1
+    devices[8]['isHubConnectionLost'] = True
+    instance = instance_of(payload)
+
+    assert index.update(instance) == 2
+    assert serials(index.lowest_battery(1)) == [devices[7]['serialNumber']]
+    assert devices[8]['serialNumber'] in serials(index.lost_hub_connection())
+    assert serials(index.lowest_battery(50)) == brute_force(instance, lambda device: device.battery_percentage, 50)
+
+
+def test_missing_devices_and_values_are_dropped():
+    payload = generate('location', locations=1, devices=10, seed=3)
+    index = fleet.AirThingsFleetIndex()
+    index.update(instance_of(payload))
+
+    devices = payload['locations'][0]['devices']
+    (gone, unknown) = (devices.pop(0)['serialNumber'], devices[0]['serialNumber'])
+    devices[0]['rssi'] = None
+    index.update(instance_of(payload))
+
+    assert gone not in index.devices
+    assert all(len(sorted_index) == 9 for (name, sorted_index) in index.indexes.items() if name != 'rssi')
+    assert len(index.indexes['rssi']) == 8
+    assert unknown not in serials(index.weakest_rssi(10))
+
+
+def test_sorted_index_single_updates():
+    index = fleet.AirThingsSortedIndex(name='n', key=lambda device: None)
+    index.set_many([(str(i), i) for i in range(100)])
+
+    index.set('5', 200)
+    index.set('6', 6)
+    index.discard('0')
+    index.discard('unknown')
+
+    assert index.smallest(3) == ['1', '2', '3']
+    assert index.largest(2) == ['5', '99']
+    assert len(index) == 99
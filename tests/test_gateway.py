@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import aiohttp
+import pytest
+
+from conftest import ata
+
+gateway = ata.api.gateway
+li = ata.responses.locations_instance
+
+
+async def wait_for(predicate):
+    for _ in range(200):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+
+    raise AssertionError('timed out')
+
+
+def test_unknown_entities_are_rejected():
+    with pytest.raises(KeyError):
+        gateway.AirThingsGateway(entities=['location', 'weather'])
+
+
+def test_cached_responses_are_served_with_etags(fake):
+    async def scenario():
+        server = gateway.AirThingsGateway(entities=['location', 'me'], interval=60.0, port=0)
+        server.add_account(username='jdoe', password='secret', account_id='home')
+
+        async with server:
+            server.add_account(username='jane', password='secret', account_id='office')
+            await wait_for(lambda: len(server.responses) == 4)
+
+            url = 'http://127.0.0.1:{0}/'.format(server.port)
+            results = {}
+
+            async with aiohttp.ClientSession() as session:
+                for _ in range(5):
+                    async with session.get(url + 'home/location') as response:
+                        results['ok'] = (response.status, response.headers['ETag'], await response.json())
+
+                etag = results['ok'][1]
+
+                async with session.get(url + 'home/location', headers={'If-None-Match': etag}) as response:
+                    results['not_modified'] = (response.status, await response.read())
+                async with session.get(url + 'office/me') as response:
+                    results['office'] = response.status
+                async with session.get(url + 'home/thresholds') as response:
+                    results['entity'] = response.status
+
+                server.remove_account('office')
+
+                async with session.get(url + 'office/me') as response:
+                    results['removed'] = response.status
+
+            return results
+
+    results = asyncio.run(scenario())
+    (status, etag, body) = results['ok']
+
+    assert status == 200
+    assert etag.startswith('"')
+    assert li.locations_instance_from_dict(body) == li.locations_instance_from_dict(json.loads(fake.payloads['location']))
+    assert results['not_modified'] == (304, b'')
+    assert results['office'] == 200
+    assert (results['entity'], results['removed']) == (404, 404)
+    # One poll per account and entity, whatever the number of requests.
+    assert fake.counters['location'] == 2
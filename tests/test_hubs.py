@@ -0,0 +1,122 @@
+import asyncio
+import copy
+import datetime as dt
+import types
+
+from conftest import LOGIN, ata, scripted_transport
+from payloads import generate, load_sample, serial_number
+
+hubs = ata.api.hubs
+li = ata.responses.locations_instance
+rdi = ata.responses.relay_devices_instance
+EventType = hubs.AirThingsHubEventType
+
+HUB = serial_number(0, 99999)
+
+
+def relay_devices(last_seen, seen):
+    payload = generate('relay-devices', locations=1, devices=4, seed=1)
+    meta_data = payload['hubs'][0]['metaData']
+    meta_data['lastSeen'] = last_seen.isoformat()
+    meta_data['lastSeenDevices'] = [serial_number(0, d) for d in seen]
+    return rdi.relay_devices_instance_from_dict(copy.deepcopy(payload))
+
+
+def events_of(events):
+    return [(event.type_, event.device_serial_number) for event in events]
+
+
+def test_silence_drops_and_recoveries_are_reported():
+    received = []
+    monitor = hubs.AirThingsHubMonitor(manager=None, silence_threshold=dt.timedelta(minutes=30), on_event=received.append)
+    seen_at = dt.datetime(2021, 1, 1)
+    now = ata.api.stats.to_epoch(seen_at)
+
+    assert monitor.update(relay_devices(seen_at, seen=[0, 1, 2, 3]), now=now) == []
+
+    events = monitor.update(relay_devices(seen_at, seen=[0, 3]), now=now + 1800)
+
+    assert events_of(events) == [
+        (EventType.HubSilent, None),
+        (EventType.DeviceDropped, serial_number(0, 1)),
+        (EventType.DeviceDropped, serial_number(0, 2)),
+    ]
+    assert received == events
+    assert monitor.unreachable_devices() == {HUB: {serial_number(0, d) for d in range(4)}}
+
+    later = seen_at + dt.timedelta(hours=1)
+    events = monitor.update(relay_devices(later, seen=[0, 2, 3]), now=now + 3600)
+
+    assert events_of(events) == [(EventType.HubRecovered, None), (EventType.DeviceRecovered, serial_number(0, 2))]
+    assert monitor.unreachable_devices() == {HUB: {serial_number(0, 1)}}
+
+
+def test_hubs_leaving_relay_devices_are_reported_removed():
+    received = []
+    monitor = hubs.AirThingsHubMonitor(manager=None, on_event=received.append)
+    seen_at = dt.datetime(2021, 1, 1)
+    now = ata.api.stats.to_epoch(seen_at)
+    monitor.update(relay_devices(seen_at, seen=[0, 1]), now=now)
+
+    gone = relay_devices(seen_at, seen=[])
+    gone.hubs = []
+    events = monitor.update(gone, now=now + 60)
+
+    assert events_of(events) == [(EventType.HubRemoved, None)]
+    assert (events[0].hub_serial_number, events[0].last_seen) == (HUB, seen_at)
+    assert received == events
+    assert monitor.hubs == {}
+    assert monitor.unreachable_devices() == {}
+
+    # Removed once: later polls without the hub report nothing.
+    assert monitor.update(gone, now=now + 120) == []
+
+
+def test_failing_callbacks_do_not_lose_events():
+    def on_event(event):
+        raise RuntimeError('boom')
+
+    monitor = hubs.AirThingsHubMonitor(manager=None, on_event=on_event)
+    seen_at = dt.datetime(2021, 1, 1)
+    now = ata.api.stats.to_epoch(seen_at)
+    monitor.update(relay_devices(seen_at, seen=[0, 1]), now=now)
+
+    assert len(monitor.update(relay_devices(seen_at, seen=[0]), now=now)) == 1
+
+
+def test_membership_includes_the_devices_relayed_per_the_locations():
+    payload = generate('location', locations=1, devices=6, seed=1)
+    payload['locations'][0]['devices'][5]['relayDevice'] = 'another hub'
+    cached = types.SimpleNamespace(timestamp=dt.datetime(2021, 1, 1), instance=li.locations_instance_from_dict(payload))
+    manager = types.SimpleNamespace(instance_cache={'location': cached})
+
+    monitor = hubs.AirThingsHubMonitor(manager=manager)
+    seen_at = dt.datetime(2021, 1, 1)
+    monitor.update(relay_devices(seen_at, seen=[0, 1, 2, 3]), now=ata.api.stats.to_epoch(seen_at))
+
+    assert monitor.devices_of(HUB) == {serial_number(0, d) for d in range(5)}
+    assert monitor.unreachable_devices() == {HUB: {serial_number(0, 4)}}
+    assert monitor.devices_of('another hub') == {serial_number(0, 5)}
+
+
+def test_monitor_polls_relay_devices_on_its_own():
+    async def scenario():
+        transport = scripted_transport(
+            LOGIN + [('GET', '/v1/relay-devices', 200, load_sample('get_relay_devices.json'))], repeat=True)
+        manager = ata.api.web.AirThingsManager(username='jdoe', password='secret', session=transport)
+        monitor = hubs.AirThingsHubMonitor(manager=manager, interval=0.01).start()
+
+        try:
+            for _ in range(100):
+                if len(monitor.hubs) > 0:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            monitor.stop()
+
+        return monitor
+
+    monitor = asyncio.run(scenario())
+
+    assert list(monitor.hubs) == [hub['serialNumber'] for hub in load_sample('get_relay_devices.json')['hubs']]
+    assert monitor.subscription is None
@@ -0,0 +1,103 @@
+import asyncio
+
+import aiohttp
+import pytest
+import yarl
+
+from conftest import ata, locations_manager
+
+metrics = ata.api.metrics
+
+
+def test_histogram_quantiles_are_bucket_upper_bounds():
+    histogram = metrics.AirThingsHistogram(bounds=(1.0, 2.0, 4.0))
+
+    for value in [0.5] * 50 + [1.5] * 40 + [3.0] * 9 + [10.0]:
+        histogram.observe(value)
+
+    result = histogram.as_dict()
+
+    assert (result['count'], result['min'], result['max']) == (100, 0.5, 10.0)
+    assert result['mean'] == pytest.approx(1.22)
+    assert (result['p50'], result['p90'], result['p99']) == (1.0, 2.0, 4.0)
+    assert histogram.quantile(1.0) == 10.0
+    assert metrics.AirThingsHistogram().quantile(0.5) is None
+
+
+def test_quantiles_never_exceed_the_maximum():
+    histogram = metrics.AirThingsHistogram(bounds=(1.0, 2.0))
+    histogram.observe(0.25)
+
+    assert histogram.quantile(0.5) == 0.25
+
+
+def test_snapshot_and_callbacks():
+    received = []
+
+    def failing(name, label, value):
+        raise RuntimeError('boom')
+
+    collected = metrics.AirThingsMetrics()
+    collected.add_callback(failing)
+    collected.add_callback(lambda *observation: received.append(observation))
+    collected.add_source('source', lambda: {'answer': 42})
+
+    collected.observe(name='poll', label='location', value=0.25)
+    collected.increment(name='cache.hit', label='location')
+    collected.increment(name='cache.hit', label='location', value=2)
+
+    snapshot = collected.snapshot()
+
+    assert snapshot['histograms']['poll:location']['count'] == 1
+    assert snapshot['counters'] == {'cache.hit:location': 3}
+    assert snapshot['sources'] == {'source': {'answer': 42}}
+    assert received == [('poll', 'location', 0.25), ('cache.hit', 'location', 1), ('cache.hit', 'location', 2)]
+
+
+def test_managers_record_polls_logins_and_http_timings(fake):
+    collected = metrics.AirThingsMetrics()
+
+    async def scenario():
+        async with aiohttp.ClientSession(trace_configs=[collected.trace_config()]) as session:
+            manager = ata.api.web.AirThingsManager(username='jdoe', password='secret', session=session, metrics=collected)
+            await manager.get_locations_instance()
+            manager.get_cached_instance('location')
+
+    asyncio.run(scenario())
+
+    snapshot = collected.snapshot()
+    host = '127.0.0.1'
+
+    for name in ['poll:location', 'decode:location', 'auth:token', 'auth:access_token', 'http.first_byte:' + host + '/v1/location']:
+        assert snapshot['histograms'][name]['count'] >= 1, name
+
+    # Token, consent, authorize, token again and the poll: one label per endpoint.
+    assert snapshot['counters']['http.status.200:' + host + '/v1/token'] == 2
+    assert snapshot['counters']['http.status.200:' + host + '/v1/consents/dashboard'] == 1
+    assert snapshot['counters']['http.status.200:' + host + '/v1/location'] == 1
+    assert snapshot['counters']['cache.hit:location'] == 1
+    assert snapshot['sources']['retry']['calls'] >= 1
+
+
+def test_endpoint_templates_drop_queries_and_identifiers():
+    assert metrics.endpoint_template(yarl.URL('https://web-api.airthin.gs/v1/location?x=1')) == 'web-api.airthin.gs/v1/location'
+    assert metrics.endpoint_template(yarl.URL('https://web-api.airthin.gs/v1/devices/2930012345/samples')) == 'web-api.airthin.gs/v1/devices/{id}/samples'
+    assert metrics.endpoint_template(yarl.URL('https://a/v1/u/8c5b5d41-4f54-4a0e-a1d8-6e3bca3e2f11')) == 'a/v1/u/{id}'
+    assert metrics.endpoint_template(yarl.URL('https://a/')) == 'a/'
+
+
+def test_sources_of_managers_sharing_metrics_are_summed():
+    collected = metrics.AirThingsMetrics()
+    shared_limiter = ata.api.throttle.AirThingsRateLimiter()
+
+    first = locations_manager(metrics=collected, rate_limiter=shared_limiter)
+    second = locations_manager(metrics=collected, rate_limiter=shared_limiter)
+    first.retry_policy.counters.calls = 2
+    second.retry_policy.counters.calls = 3
+    shared_limiter.web.acquired = 4
+
+    sources = collected.snapshot()['sources']
+
+    assert sources['retry']['calls'] == 5
+    # Registered by both managers, but one limiter: counted once.
+    assert sources['rate_limiter']['web']['acquired'] == 4
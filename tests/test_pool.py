@@ -0,0 +1,116 @@
+import asyncio
+
+from conftest import ata
+
+AirThingsManagerPool = ata.api.pool.AirThingsManagerPool
+
+
+class StubManager:
+    """Answers `get_locations_instance` after `delay` seconds, or raises `error`."""
+
+    running = 0
+    peak = 0
+
+    def __init__(self, name, delay=0.0, error=None) -> None:
+        self.name = name
+        self.delay = delay
+        self.error = error
+
+    async def get_locations_instance(self):
+        StubManager.running += 1
+        StubManager.peak = max(StubManager.peak, StubManager.running)
+
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            StubManager.running -= 1
+
+        if self.error is not None:
+            raise self.error
+
+        return self.name
+
+
+def stub_pool(stubs, **kwargs):
+    pool = AirThingsManagerPool(**kwargs)
+
+    for stub in stubs:
+        pool.add_account(username=stub.name, password='secret')
+        pool.managers[stub.name] = stub
+
+    return pool
+
+
+def collect(pool, account_ids=None):
+    async def scenario():
+        return [item async for item in pool.iter_locations_instances(account_ids=account_ids)]
+
+    return asyncio.run(scenario())
+
+
+def test_results_stream_in_completion_order():
+    pool = stub_pool([StubManager('slow', delay=0.05), StubManager('fast')])
+
+    assert collect(pool) == [('fast', 'fast'), ('slow', 'slow')]
+
+
+def test_failures_are_isolated_and_reported():
+    reported = []
+
+    def on_failure(account_id, error):
+        reported.append(account_id)
+        raise RuntimeError('callbacks cannot break the stream')
+
+    pool = stub_pool(
+        [StubManager('a'), StubManager('b', error=ValueError('boom')), StubManager('c')],
+        on_failure=on_failure)
+
+    assert sorted(collect(pool)) == [('a', 'a'), ('c', 'c')]
+    assert list(pool.failures) == ['b']
+    assert reported == ['b']
+
+    pool.managers['b'].error = None
+
+    assert collect(pool, account_ids=['b']) == [('b', 'b')]
+    assert pool.failures == {}
+
+
+def test_concurrency_is_bounded():
+    StubManager.peak = 0
+    pool = stub_pool([StubManager(str(i), delay=0.01) for i in range(10)], max_concurrency=3)
+
+    assert len(collect(pool)) == 10
+    assert StubManager.peak == 3
+
+
+def test_starts_are_staggered():
+    pool = stub_pool([StubManager(str(i)) for i in range(4)], stagger_window=0.2)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        return [(account_id, loop.time() - start) async for (account_id, _) in pool.iter_locations_instances()]
+
+    arrivals = asyncio.run(scenario())
+
+    assert [account_id for (account_id, _) in arrivals] == ['0', '1', '2', '3']
+    assert arrivals[-1][1] >= 0.15
+
+
+def test_accounts_share_one_session(fake):
+    async def scenario():
+        async with AirThingsManagerPool(max_concurrency=2) as pool:
+            for i in range(5):
+                pool.add_account(username='user{0}'.format(i), password='secret')
+
+            results = dict([item async for item in pool.iter_locations_instances()])
+            sessions = {manager.session for manager in pool.managers.values()}
+
+            return (results, sessions)
+
+    (results, sessions) = asyncio.run(scenario())
+
+    assert sorted(results) == ['user{0}'.format(i) for i in range(5)]
+    assert len(sessions) == 1
+    assert fake.counters['logins'] == 5
+    assert fake.counters['location'] == 5
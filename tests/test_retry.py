@@ -0,0 +1,179 @@
+import asyncio
+import email.utils
+import random
+import time
+
+import pytest
+
+from conftest import LOCATIONS, LOGIN, ata, fast_retries, scripted_transport
+
+exceptions = ata.api.exceptions
+AirThingsManager = ata.api.web.AirThingsManager
+AirThingsRetryPolicy = ata.api.retry.AirThingsRetryPolicy
+
+TOKEN_URL = 'https://accounts-api.airthings.com/v1/token'
+LOCATION_URL = 'https://web-api.airthin.gs/v1/location'
+
+
+def failing(*errors, result='ok'):
+    remaining = list(errors)
+
+    async def operation():
+        if len(remaining) > 0:
+            raise remaining.pop(0)
+        return result
+
+    return operation
+
+
+def server_error(retry_after=None):
+    return exceptions.AirThingsServerException(error_code=503, error_details='', retry_after=retry_after)
+
+
+@pytest.mark.parametrize('status, url, expected', [
+    (401, LOCATION_URL, exceptions.AirThingsUnauthorizedException),
+    (403, LOCATION_URL, exceptions.AirThingsUnauthorizedException),
+    (400, TOKEN_URL, exceptions.AirThingsUnauthorizedException),
+    (400, LOCATION_URL, exceptions.AirThingsClientException),
+    (404, LOCATION_URL, exceptions.AirThingsClientException),
+    (400, None, exceptions.AirThingsClientException),
+    (429, LOCATION_URL, exceptions.AirThingsRateLimitedException),
+    (503, LOCATION_URL, exceptions.AirThingsServerException),
+])
+def test_classify_error(status, url, expected):
+    assert type(AirThingsManager.classify_error(status=status, error_details='', url=url)) is expected
+
+
+def test_parse_retry_after():
+    in_a_minute = email.utils.formatdate(time.time() + 60, usegmt=True)
+
+    assert exceptions.parse_retry_after('3') == 3.0
+    assert exceptions.parse_retry_after('-3') == 0.0
+    assert 55 <= exceptions.parse_retry_after(in_a_minute) <= 60
+    assert exceptions.parse_retry_after('soon') is None
+    assert exceptions.parse_retry_after(None) is None
+
+
+def test_delays_are_jittered_below_the_exponential_cap():
+    random.seed(0)
+    policy = AirThingsRetryPolicy(base_delay=1.0, max_delay=5.0)
+
+    for attempt in range(6):
+        delays = [policy.compute_delay(attempt=attempt, exception=server_error()) for _ in range(200)]
+
+        assert all(0 <= delay <= min(5.0, 2 ** attempt) for delay in delays)
+        assert len(set(delays)) > 1
+
+
+def test_retry_after_is_a_lower_bound():
+    policy = AirThingsRetryPolicy(base_delay=0.1, max_delay=0.1)
+
+    assert policy.compute_delay(attempt=0, exception=server_error(retry_after=7.0)) >= 7.0
+    assert AirThingsRetryPolicy(respect_retry_after=False, max_delay=0.1).compute_delay(
+        attempt=0, exception=server_error(retry_after=7.0)) <= 0.1
+
+
+def test_transient_errors_are_retried():
+    policy = fast_retries()
+
+    result = asyncio.run(policy.execute(failing(
+        server_error(),
+        exceptions.AirThingsConnectionException(error_code=0, error_details=''))))
+
+    assert result == 'ok'
+    assert policy.counters.as_dict()['retries'] == 2
+    assert policy.counters.server_errors == 1
+    assert policy.counters.network_errors == 1
+    assert policy.counters.successes == 1
+
+
+@pytest.mark.parametrize('error', [
+    exceptions.AirThingsUnauthorizedException(error_code=401, error_details=''),
+    exceptions.AirThingsClientException(error_code=400, error_details=''),
+])
+def test_client_errors_are_not_retried(error):
+    policy = fast_retries()
+
+    with pytest.raises(type(error)):
+        asyncio.run(policy.execute(failing(error)))
+
+    assert policy.counters.attempts == 1
+    assert policy.counters.failures == 1
+
+
+def test_attempts_are_bounded():
+    policy = fast_retries(max_attempts=3)
+
+    with pytest.raises(exceptions.AirThingsServerException):
+        asyncio.run(policy.execute(failing(*[server_error() for _ in range(5)])))
+
+    assert policy.counters.attempts == 3
+
+
+def test_no_attempt_starts_past_the_deadline():
+    policy = fast_retries(max_attempts=10, deadline=1.0)
+
+    with pytest.raises(exceptions.AirThingsServerException):
+        asyncio.run(policy.execute(failing(server_error(retry_after=5.0))))
+
+    assert policy.counters.attempts == 1
+    assert policy.counters.deadline_exceeded == 1
+
+
+async def poll_locations(exchanges, headers=None):
+    transport = scripted_transport(LOGIN + exchanges, headers=headers)
+    manager = AirThingsManager(username='jdoe', password='secret', session=transport, retry_policy=fast_retries())
+    return (await manager.get_locations_instance(), manager)
+
+
+def test_polls_are_retried_on_server_errors():
+    (instance, manager) = asyncio.run(poll_locations(
+        [('GET', '/v1/location', 503, {}), ('GET', '/v1/location', 429, {}), ('GET', '/v1/location', 200, LOCATIONS)],
+        headers={'Retry-After': '0'}))
+
+    assert len(instance.locations) == len(LOCATIONS['locations'])
+    assert manager.retry_policy.counters.retries == 2
+    assert manager.retry_policy.counters.rate_limited == 1
+
+
+def test_exhausted_retries_raise_the_classified_error():
+    transport = scripted_transport(LOGIN + [('GET', '/v1/location', 503, {})] * 3, headers={'Retry-After': '0'})
+    manager = AirThingsManager(username='jdoe', password='secret', session=transport, retry_policy=fast_retries())
+
+    with pytest.raises(exceptions.AirThingsServerException) as raised:
+        asyncio.run(manager.get_locations_instance())
+
+    assert raised.value.error_code == 503
+    assert manager.retry_policy.counters.retries == 2
+
+
+def test_bad_requests_are_neither_retried_nor_circuit_failures():
+    transport = scripted_transport(LOGIN + [('GET', '/v1/location', 400, {})])
+    manager = AirThingsManager(username='jdoe', password='secret', session=transport, retry_policy=fast_retries())
+
+    with pytest.raises(exceptions.AirThingsClientException):
+        asyncio.run(manager.get_locations_instance())
+
+    breaker = manager.circuit_breakers.get('web-api.airthin.gs')
+
+    assert manager.retry_policy.counters.retries == 0
+    assert manager.retry_policy.counters.failures == 1
+    assert manager.tokens is not None
+    assert breaker.consecutive_failures == 0
+
+
+def test_polls_fail_when_the_login_does():
+    transport = scripted_transport([('POST', '/v1/token', 503, {})], headers={'Retry-After': '0'})
+    manager = AirThingsManager(username='jdoe', password='secret', session=transport, retry_policy=fast_retries())
+
+    with pytest.raises(exceptions.AirThingsPollFailedException):
+        asyncio.run(manager.get_locations_instance())
+
+
+def test_rejected_credentials_are_reported():
+    transport = scripted_transport([('POST', '/v1/token', 400, {'error': 'invalid_grant'})])
+    manager = AirThingsManager(username='jdoe', password='wrong', session=transport)
+
+    with pytest.raises(exceptions.AirThingsInvalidCredentialsException):
+        asyncio.run(manager.get_locations_instance())
+
@@ -0,0 +1,127 @@
+import asyncio
+import dataclasses
+
+from conftest import LOCATIONS, ata, locations_manager
+from payloads import generate
+
+li = ata.responses.locations_instance
+routing = ata.api.routing
+
+
+def locations(seed=1):
+    return li.locations_instance_from_dict(generate('location', locations=2, devices=3, sensors=4, seed=seed))
+
+
+def recorder(calls):
+    return lambda location, device, sensor: calls.append((device.serial_number, sensor.type_))
+
+
+def test_filters_select_readings():
+    instance = locations()
+    device = instance.locations[1].devices[2]
+    router = routing.AirThingsSensorRouter()
+
+    (everything, by_serial, by_type, by_location, by_both) = ([], [], [], [], [])
+    router.subscribe(recorder(everything))
+    router.subscribe(recorder(by_serial), serial_number=device.serial_number)
+    router.subscribe(recorder(by_type), sensor_type='co2')
+    router.subscribe(recorder(by_location), location_id=instance.locations[0].id_)
+    router.subscribe(recorder(by_both), serial_number=device.serial_number, sensor_type='co2')
+
+    router.publish(instance)
+
+    assert len(everything) == 2 * 3 * 4
+    assert by_serial == [(device.serial_number, sensor.type_) for sensor in device.current_sensor_values]
+    assert len(by_type) == 6 and {sensor_type for (_, sensor_type) in by_type} == {'co2'}
+    assert len(by_location) == 3 * 4
+    assert by_both == [(device.serial_number, 'co2')]
+
+
+def test_only_changed_readings_are_delivered():
+    instance = locations()
+    router = routing.AirThingsSensorRouter()
+    calls = []
+    router.subscribe(recorder(calls), sensor_type='temp')
+
+    router.publish(instance)
+    router.publish(instance)
+
+    assert len(calls) == 6
+
+    device = instance.locations[0].devices[0]
+    sensors = [dataclasses.replace(sensor, value=sensor.value + 1) if sensor.type_ == 'temp' else sensor for sensor in device.current_sensor_values]
+    instance.locations[0].devices[0] = dataclasses.replace(device, current_sensor_values=sensors)
+
+    router.publish(instance)
+
+    assert calls[6:] == [(device.serial_number, 'temp')]
+
+
+def test_new_routes_get_the_current_readings_once():
+    instance = locations()
+    router = routing.AirThingsSensorRouter()
+    (early, late) = ([], [])
+    router.subscribe(recorder(early), sensor_type='temp')
+    router.publish(instance)
+
+    router.subscribe(recorder(late), sensor_type='temp')
+    router.publish(instance)
+    router.publish(instance)
+
+    assert len(early) == 6
+    assert len(late) == 6
+
+
+def test_failing_callbacks_do_not_stop_delivery():
+    def fail(location, device, sensor):
+        raise RuntimeError('boom')
+
+    router = routing.AirThingsSensorRouter()
+    calls = []
+    failing = router.subscribe(fail)
+    router.subscribe(recorder(calls))
+
+    router.publish(locations())
+
+    assert failing.calls == len(calls) == 24
+
+
+def test_cancelling_the_last_route_stops_the_router():
+    router = routing.AirThingsSensorRouter()
+    stopped = []
+    router.on_empty = lambda: stopped.append(True)
+
+    routes = [router.subscribe(recorder([])), router.subscribe(recorder([]), sensor_type='co2')]
+    routes[0].cancel()
+    assert stopped == []
+
+    routes[1].cancel()
+    assert stopped == [True]
+    assert router.buckets == {}
+
+
+def test_manager_routes_polled_readings():
+    serial_number = LOCATIONS['locations'][0]['devices'][0]['serialNumber']
+
+    async def scenario():
+        manager = locations_manager()
+        delivered = asyncio.Event()
+        calls = []
+
+        async def callback(location, device, sensor):
+            calls.append(sensor.type_)
+            delivered.set()
+
+        route = manager.subscribe_readings(callback, serial_number=serial_number, interval=0.01)
+        await asyncio.wait_for(delivered.wait(), timeout=5.0)
+        await asyncio.sleep(0.05)
+
+        subscription = manager.sensor_router.subscription
+        route.cancel()
+
+        return (calls, subscription, manager.sensor_router.subscription)
+
+    (calls, subscription, after) = asyncio.run(scenario())
+
+    assert len(calls) == len(LOCATIONS['locations'][0]['devices'][0]['currentSensorValues'])
+    assert subscription.closed and after is None
@@ -0,0 +1,104 @@
+import asyncio
+import queue
+import threading
+
+from conftest import ata
+
+sharding = ata.api.sharding
+
+
+class ThreadProcess(threading.Thread):
+    """Runs a shard on a thread of the test process, which talks to the fake server."""
+
+    exitcode = None
+
+    def terminate(self) -> None:
+        pass
+
+
+class ThreadContext:
+    Queue = queue.Queue
+    Process = ThreadProcess
+
+
+def sharded_pool(accounts=6, processes=2):
+    pool = sharding.AirThingsShardedPool(processes=processes)
+    pool._AirThingsShardedPool__context = ThreadContext()
+
+    for i in range(accounts):
+        pool.add_account(username='user{0}'.format(i), password='secret')
+
+    return pool
+
+
+async def poll(pool):
+    return dict([item async for item in pool.iter_locations_instances()])
+
+
+def test_accounts_are_spread_over_shards():
+    pool = sharded_pool(accounts=20, processes=3)
+
+    assert {pool.shard_of(account_id) for account_id in pool.accounts} == {0, 1, 2}
+    assert pool.shard_of('user1') == sharded_pool(processes=3).shard_of('user1')
+
+
+def test_unchanged_instances_are_reused(fake):
+    async def scenario():
+        async with sharded_pool() as pool:
+            first = await poll(pool)
+            second = await poll(pool)
+            return (pool, first, second)
+
+    (pool, first, second) = asyncio.run(scenario())
+
+    assert len(first) == 6
+    assert all(second[account_id] is first[account_id] for account_id in first)
+    assert pool.failures == {}
+
+
+def test_account_removed_then_added_back_is_polled(fake):
+    async def scenario():
+        async with sharded_pool() as pool:
+            await poll(pool)
+
+            pool.remove_account('user3')
+            pool.add_account(username='user3', password='secret')
+
+            return (pool, await poll(pool))
+
+    (pool, results) = asyncio.run(scenario())
+
+    assert sorted(results) == ['user{0}'.format(i) for i in range(6)]
+    assert pool.failures == {}
+
+
+def test_account_removed_and_added_back_during_a_stream_is_polled(fake):
+    async def scenario():
+        async with sharded_pool(accounts=2, processes=1) as pool:
+            await poll(pool)
+
+            results = {}
+
+            async for (account_id, instance) in pool.iter_locations_instances():
+                results[account_id] = instance
+
+                if len(results) == 1:
+                    other = 'user1' if account_id == 'user0' else 'user0'
+                    pool.remove_account(other)
+                    pool.add_account(username=other, password='secret')
+
+            return results
+
+    assert sorted(asyncio.run(scenario())) == ['user0', 'user1']
+
+
+def test_removed_accounts_are_not_polled(fake):
+    async def scenario():
+        async with sharded_pool() as pool:
+            await poll(pool)
+            pool.remove_account('user0')
+            return await poll(pool)
+
+    results = asyncio.run(scenario())
+
+    assert sorted(results) == ['user{0}'.format(i) for i in range(1, 6)]
@@ -0,0 +1,110 @@
+import datetime as dt
+import json
+import random
+
+import pytest
+
+from conftest import ata
+from payloads import generate, load_sample
+from test_codec import SAMPLES
+
+snapshot = ata.responses.snapshot
+li = ata.responses.locations_instance
+
+
+@pytest.fixture(scope='module')
+def locations():
+    return li.locations_instance_from_dict(generate('location', locations=2, devices=10, sensors=6, seed=5))
+
+
+@pytest.mark.parametrize('name, from_dict, to_dict', SAMPLES)
+def test_samples_round_trip(name, from_dict, to_dict):
+    instance = from_dict(load_sample(name))
+
+    assert snapshot.decode_snapshot(snapshot.encode_snapshot(instance)) == instance
+
+
+def test_snapshots_are_smaller_than_json(locations):
+    data = snapshot.encode_snapshot(locations)
+
+    assert snapshot.decode_snapshot(data) == locations
+    assert len(data) < len(json.dumps(li.locations_instance_to_dict(locations))) / 2
+
+
+def test_compiled_readers_handle_long_varints_and_missing_values():
+    instance = li.locations_instance_from_dict(generate('location', locations=1, devices=200, sensors=6, seed=7))
+    devices = instance.locations[0].devices
+    devices[0].latest_sample = None
+    devices[1].rssi = -(1 << 40)
+    devices[2].latest_sample = dt.datetime(2021, 3, 1, 12, 30, 15, 250, tzinfo=dt.timezone(dt.timedelta(hours=-5)))
+    devices[3].segment_start = dt.datetime(1969, 12, 31, 23, 59, 59, 999999)
+
+    data = snapshot.encode_snapshot(instance)
+    decoded = snapshot.decode_snapshot(data)
+
+    # More strings than one-byte varints can index.
+    assert len({device.serial_number for device in devices}) > 128
+    assert decoded == instance
+    assert decoded.locations[0].devices[2].latest_sample.utcoffset() == dt.timedelta(hours=-5)
+
+
+def test_only_response_instances_can_be_snapshotted():
+    with pytest.raises(TypeError):
+        snapshot.encode_snapshot({'locations': []})
+
+
+@pytest.mark.parametrize('data', [b'', b'AT', b'{"locations": []}', b'ATS', 'ATS\x02'])
+def test_non_snapshots_are_rejected(data):
+    with pytest.raises(snapshot.SnapshotFormatError):
+        snapshot.decode_snapshot(data)
+
+
+def test_other_versions_are_rejected(locations):
+    data = bytearray(snapshot.encode_snapshot(locations))
+    data[3] = snapshot.SNAPSHOT_VERSION + 1
+
+    with pytest.raises(snapshot.SnapshotFormatError, match='version'):
+        snapshot.decode_snapshot(bytes(data))
+
+
+def test_other_schemas_are_rejected(locations, monkeypatch):
+    data = snapshot.encode_snapshot(locations)
+
+    monkeypatch.setitem(snapshot._fingerprints, li.LocationsInstance, b'\0' * 8)
+
+    with pytest.raises(snapshot.SnapshotFormatError, match='schema'):
+        snapshot.decode_snapshot(data)
+
+
+def test_fingerprints_follow_nested_fields():
+    thresholds = ata.responses.thresholds_instance
+
+    assert snapshot.schema_fingerprint(li.LocationsInstance) != snapshot.schema_fingerprint(thresholds.ThresholdsInstance)
+    assert 'Rating(' in snapshot._describe(thresholds.ThresholdsInstance, [])
+    assert 'current_sensor_values:List[CurrentSensorValue{' in snapshot._describe(li.LocationsInstance, [])
+
+
+def test_truncated_snapshots_are_rejected(locations):
+    data = snapshot.encode_snapshot(locations)
+
+    for length in range(len(data)):
+        with pytest.raises(snapshot.SnapshotFormatError):
+            snapshot.decode_snapshot(data[:length])
+
+    with pytest.raises(snapshot.SnapshotFormatError, match='trailing'):
+        snapshot.decode_snapshot(data + b'\0')
+
+
+@pytest.mark.parametrize('name, from_dict, to_dict', SAMPLES)
+def test_corrupt_snapshots_fail_with_format_errors(name, from_dict, to_dict):
+    data = snapshot.encode_snapshot(from_dict(load_sample(name)))
+    rng = random.Random(name)
+
+    for _ in range(500):
+        corrupt = bytearray(data)
+        corrupt[rng.randrange(len(corrupt))] ^= 1 << rng.randrange(8)
+
+        try:
+            snapshot.decode_snapshot(bytes(corrupt))
+        except snapshot.SnapshotFormatError:
+            pass
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import struct
+
+import aiohttp
+import pytest
+
+from conftest import ata
+
+cache = ata.api.cache
+
+
+def manager(session, directory):
+    return ata.api.web.AirThingsManager(username='jdoe', password='secret', session=session, snapshot_directory=directory)
+
+
+def persist_snapshots(directory):
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            first = manager(session, directory)
+            await first.get_locations_instance()
+            await first.get_thresholds_instance()
+            await first.snapshot_store.flush()
+
+    asyncio.run(scenario())
+
+
+def test_snapshots_are_served_after_a_restart(fake, tmp_path):
+    persist_snapshots(str(tmp_path))
+    requests = fake.counters['requests']
+
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            return manager(session, str(tmp_path)).get_cached_instance('location')
+
+    cached = asyncio.run(scenario())
+
+    assert cached is not None
+    assert cached.age.total_seconds() >= 0
+    assert len(cached.instance.locations) > 0
+    assert fake.counters['requests'] == requests
+
+
+def test_snapshots_are_kept_apart_per_account(tmp_path):
+    store = cache.AirThingsSnapshotStore(directory=str(tmp_path), namespace='jdoe')
+    other = cache.AirThingsSnapshotStore(directory=str(tmp_path), namespace='other')
+
+    assert store.path('location') != other.path('location')
+    assert other.load_all() == {}
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda data: data[:8] + b'ATS',
+    lambda data: data.replace(b'FAIR', b'cAIR'),
+    lambda data: struct.pack('<q', 2 ** 62) + data[8:],
+    lambda data: data[:8] + b'\xff' * 40,
+    lambda data: b'',
+])
+def test_corrupt_snapshots_are_removed_and_ignored(fake, tmp_path, corrupt):
+    persist_snapshots(str(tmp_path))
+    store = cache.AirThingsSnapshotStore(directory=str(tmp_path), namespace='jdoe')
+
+    with open(store.path('thresholds'), 'rb') as fh:
+        data = fh.read()
+
+    with open(store.path('thresholds'), 'wb') as fh:
+        fh.write(corrupt(data))
+
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            return manager(session, str(tmp_path)).instance_cache.entries
+
+    entries = asyncio.run(scenario())
+
+    assert 'thresholds' not in entries
+    assert 'location' in entries
+    assert not os.path.exists(store.path('thresholds'))
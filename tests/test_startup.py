@@ -0,0 +1,83 @@
+import datetime as dt
+import json
+import subprocess
+import sys
+
+import dateutil.parser
+import pytest
+
+from conftest import ROOT, ata
+
+import bench_import
+
+dates = ata.responses.dates
+
+
+def loaded_modules(code):
+    """Modules of interest loaded after running `code` in a fresh interpreter."""
+    script = 'import sys, json; sys.path.insert(0, {0!r}); {1}; print(json.dumps({2}))'.format(
+        ROOT,
+        code,
+        '{name: name in sys.modules for name in ["aiohttp", "dateutil", "airthings-api.api.web"]}')
+
+    return json.loads(subprocess.run([sys.executable, '-c', script], check=True, stdout=subprocess.PIPE).stdout)
+
+
+def test_importing_the_package_loads_no_client():
+    assert loaded_modules("__import__('airthings-api')") == {'aiohttp': False, 'dateutil': False, 'airthings-api.api.web': False}
+
+
+def test_decoding_responses_loads_neither_aiohttp_nor_dateutil():
+    code = (
+        "ata = __import__('airthings-api'); "
+        "ata.responses.locations_instance.locations_instance_from_dict("
+        "json.load(open({0!r})))".format(ROOT + '/airthings-api/samples/get_locations.json'))
+
+    assert loaded_modules(code) == {'aiohttp': False, 'dateutil': False, 'airthings-api.api.web': False}
+
+
+def test_client_modules_load_on_first_use():
+    assert loaded_modules("__import__('airthings-api').api.web")['airthings-api.api.web'] is True
+
+
+def test_submodules_are_listed_and_bound_once_loaded():
+    assert {'api', 'responses', 'web', 'locations_instance'} <= set(dir(ata))
+    assert {'web', 'pool', 'transport'} <= set(dir(ata.api))
+
+    assert ata.api.web is vars(ata.api)['web']
+
+    with pytest.raises(AttributeError):
+        ata.api.nonexistent
+
+
+@pytest.mark.parametrize('value', [
+    '2021-01-05T12:34:56',
+    '2021-01-05T12:34:56Z',
+    '2021-01-05T12:34:56.123Z',
+    '2021-01-05T12:34:56.123456+02:00',
+    '2021-01-05 12:34:56',
+    '2021-01-05T12:34:56.1Z',
+    '2021-01-05',
+    'Jan 5 2021 12:34',
+])
+def test_dates_parse_as_dateutil_would(value):
+    assert dates.parse_datetime(value) == dateutil.parser.parse(value)
+
+
+def test_non_strings_are_rejected():
+    with pytest.raises(TypeError):
+        dates.parse_datetime(None)
+
+
+def test_utc_dates_are_aware():
+    assert dates.parse_datetime('2021-01-05T12:34:56Z').tzinfo.utcoffset(None) == dt.timedelta(0)
+
+
+@pytest.mark.parametrize('name, code', bench_import.SCENARIOS)
+def test_import_benchmark_scenarios_run_on_any_checkout(name, code):
+    # Only APIs of the original package, so that `--repo` can compare with older checkouts.
+    assert 'codec' not in code
+
+    result = bench_import.run_scenario(ROOT, code)
+
+    assert result['seconds'] > 0
@@ -0,0 +1,159 @@
+import datetime as dt
+import random
+import statistics
+import uuid
+
+import pytest
+
+from conftest import ata
+from payloads import generate
+
+stats = ata.api.stats
+li = ata.responses.locations_instance
+
+HOUR = 3600.0
+T0 = 1600000000.0
+
+
+def at(timestamp):
+    return dt.datetime.utcfromtimestamp(timestamp)
+
+
+def test_all_time_statistics_match_the_batch_ones():
+    rng = random.Random(0)
+    values = [rng.uniform(-10, 40) for _ in range(500)]
+    series = stats.AirThingsRollingStatistics()
+
+    for (i, value) in enumerate(values):
+        series.add(value=value, timestamp=T0 + i)
+
+    assert series.count == 500
+    assert series.mean == pytest.approx(statistics.mean(values))
+    assert series.stddev == pytest.approx(statistics.stdev(values))
+    assert (series.minimum, series.maximum, series.last) == (min(values), max(values), values[-1])
+
+
+def test_window_covers_the_last_window_seconds():
+    series = stats.AirThingsRollingStatistics(window=24 * HOUR, bucket_count=24)
+
+    for hour in range(48):
+        series.add(value=float(hour), timestamp=T0 + hour * HOUR)
+
+    # Buckets go once wholly out of the window: hour 23 still overlaps it.
+    assert series.window_count == 25
+    assert series.window_mean == pytest.approx(statistics.mean(range(23, 48)))
+    assert series.window_stddev == pytest.approx(statistics.stdev(range(23, 48)))
+
+
+def test_late_samples_land_in_their_bucket():
+    series = stats.AirThingsRollingStatistics(window=24 * HOUR, bucket_count=24)
+
+    series.add(value=1.0, timestamp=T0 + 10 * HOUR)
+    series.add(value=3.0, timestamp=T0 + 5 * HOUR)
+    series.add(value=5.0, timestamp=T0 - 30 * HOUR)
+
+    assert series.last == 1.0
+    assert series.window_count == 2
+    assert [bucket[1] for bucket in series.buckets] == [1, 1]
+
+
+def test_windows_expire_on_read():
+    series = stats.AirThingsRollingStatistics(window=24 * HOUR, bucket_count=24)
+    series.add(value=1.0, timestamp=T0)
+    series.add(value=3.0, timestamp=T0 + 12 * HOUR)
+
+    assert series.as_dict(now=T0 + 20 * HOUR)['window_mean'] == 2.0
+    assert series.as_dict(now=T0 + 30 * HOUR)['window_mean'] == 3.0
+
+    result = series.as_dict(now=T0 + 40 * HOUR)
+
+    assert (result['window_count'], result['window_mean']) == (0, None)
+    assert (result['count'], result['mean']) == (2, 2.0)
+
+
+def test_location_current_mean_forgets_silent_devices():
+    location = stats.AirThingsLocationStatistics(window=24 * HOUR)
+    location.set_current('a', 10.0, timestamp=T0)
+    location.set_current('b', 20.0, timestamp=T0 + 12 * HOUR)
+    location.set_current('a', 30.0, timestamp=T0 + 1 * HOUR)
+
+    assert location.current_mean == 25.0
+
+    location.expire(now=T0 + 26 * HOUR)
+    assert location.current == {'b': 20.0}
+    assert location.current_mean == 20.0
+
+    location.expire(now=T0 + 40 * HOUR)
+    assert location.current_mean is None
+
+
+def engine_with_readings():
+    engine = stats.AirThingsStatisticsEngine(window=dt.timedelta(hours=24))
+    (location_a, location_b) = (uuid.uuid4(), uuid.uuid4())
+
+    engine.add(serial_number='1', location_id=location_a, sensor_type='temp', value=20.0, timestamp=T0)
+    engine.add(serial_number='2', location_id=location_a, sensor_type='temp', value=22.0, timestamp=T0 + 12 * HOUR)
+    engine.add(serial_number='3', location_id=location_b, sensor_type='temp', value=18.0, timestamp=T0)
+
+    return (engine, location_a, location_b)
+
+
+def test_engine_rolls_devices_up_per_location():
+    (engine, location_a, _) = engine_with_readings()
+
+    assert engine.device('1', 'temp', now=at(T0 + HOUR)).last == 20.0
+    assert engine.location(location_a, 'temp', now=at(T0 + 13 * HOUR)).as_dict()['current_mean'] == 21.0
+    assert engine.device('1', 'co2', now=at(T0)) is None
+
+
+def test_engine_drops_silent_sensors_on_read():
+    (engine, location_a, location_b) = engine_with_readings()
+    now = at(T0 + 30 * HOUR)
+
+    assert engine.device('1', 'temp', now=now) is None
+    assert ('1', 'temp') not in engine.devices
+
+    location = engine.location(location_a, 'temp', now=now)
+
+    assert location.window_count == 1
+    assert location.current_mean == 22.0
+    assert engine.location(location_b, 'temp', now=now) is None
+
+
+def test_engine_expire_drops_every_silent_sensor():
+    (engine, location_a, _) = engine_with_readings()
+    engine.samples.update({'1': None, '2': None, '3': None})
+
+    assert engine.expire(now=at(T0 + 30 * HOUR)) == 3
+    assert list(engine.devices) == [('2', 'temp')]
+    assert list(engine.locations) == [(location_a, 'temp')]
+    assert list(engine.samples) == ['2']
+
+
+def test_update_skips_devices_without_new_samples():
+    instance = li.locations_instance_from_dict(generate('location', locations=2, devices=5, sensors=3, seed=2))
+    latest = max(stats.to_epoch(device.latest_sample) for location in instance.locations for device in location.devices)
+    engine = stats.AirThingsStatisticsEngine(window=dt.timedelta(days=365))
+
+    assert engine.update(instance, now=at(latest)) == 2 * 5 * 3
+    assert engine.update(instance, now=at(latest)) == 0
+
+    device = instance.locations[0].devices[0]
+    assert engine.device(device.serial_number, 'temp', now=at(latest)).count == 1
+
+
+def test_updates_only_visit_the_new_readings(monkeypatch):
+    payload = generate('location', locations=2, devices=50, sensors=3, seed=3)
+    instance = li.locations_instance_from_dict(payload)
+    engine = stats.AirThingsStatisticsEngine(window=dt.timedelta(hours=1))
+    engine.update(instance, now=at(T0))
+
+    expired = []
+    monkeypatch.setattr(stats.AirThingsRollingStatistics, 'expire', lambda self, now: expired.append(self))
+
+    payload['locations'][0]['devices'][0]['latestSample'] = '2021-02-01T00:00:00'
+
+    assert engine.update(li.locations_instance_from_dict(payload), now=at(T0)) == 3
+    assert len(expired) == 3 * 2
+    # Silent sensors are left for reads and `expire` to drop.
+    assert len(engine.devices) == 2 * 50 * 3
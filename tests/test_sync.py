@@ -0,0 +1,79 @@
+import concurrent.futures
+import json
+import threading
+
+import pytest
+
+from conftest import ata, scripted_transport
+
+sync = ata.api.sync
+
+
+def sync_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'airthings-jdoe']
+
+
+def test_calls_block_and_keep_the_login(fake):
+    with sync.AirThingsSyncManager(username='jdoe', password='secret', timeout=10) as client:
+        locations = client.get_locations_instance()
+        me = client.get_me_instance()
+        cached = client.get_cached_instance('location')
+
+    assert len(locations.locations) == len(json.loads(fake.payloads['location'])['locations'])
+    assert me is not None
+    assert cached.instance is locations
+    assert fake.counters['logins'] == 1
+    assert client.closed
+    assert sync_threads() == []
+
+    with pytest.raises(RuntimeError):
+        client.get_locations_instance()
+
+
+def test_concurrent_calls_share_one_poll(fake):
+    fake.latency = 0.2
+
+    with sync.AirThingsSyncManager(username='jdoe', password='secret', timeout=10) as client:
+        client.warm_up()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: client.get_locations_instance(), range(8)))
+
+    assert all(result is results[0] for result in results)
+    assert fake.counters['location'] == 1
+
+
+def test_the_loop_thread_cannot_block_on_itself():
+    def transport():
+        return scripted_transport([], repeat=True)
+
+    with sync.AirThingsSyncManager(username='jdoe', password='secret', session_factory=transport) as client:
+        async def reenter():
+            return client.get_me_instance()
+
+        with pytest.raises(RuntimeError):
+            client.run(reenter())
+
+
+def test_failed_creation_stops_the_thread():
+    def failing():
+        raise OSError('no session')
+
+    with pytest.raises(OSError):
+        sync.AirThingsSyncManager(username='jdoe', password='secret', session_factory=failing)
+
+    assert sync_threads() == []
+
+
+def test_failed_creation_closes_the_session():
+    sessions = []
+
+    def factory():
+        sessions.append(scripted_transport([]))
+        return sessions[-1]
+
+    with pytest.raises(TypeError):
+        sync.AirThingsSyncManager(username='jdoe', password='secret', session_factory=factory, unknown_option=True)
+
+    assert sessions[0].closed
+    assert sync_threads() == []
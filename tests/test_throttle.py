@@ -0,0 +1,133 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from conftest import ata, fast_retries, locations_manager
+
+throttle = ata.api.throttle
+exceptions = ata.api.exceptions
+
+
+class Clock:
+    """Stands in for `time` and `asyncio` in the throttle module: sleeping advances it."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.sleeps.append(delay)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(throttle, 'time', clock)
+    monkeypatch.setattr(throttle, 'asyncio', clock)
+    return clock
+
+
+def acquire_all(bucket, n):
+    async def scenario():
+        return [await bucket.acquire() for _ in range(n)]
+
+    return asyncio.run(scenario())
+
+
+def test_burst_then_evenly_spaced_slots(clock):
+    bucket = throttle.AirThingsTokenBucket(name='t', rate=10.0, capacity=3.0, max_wait=None)
+
+    delays = acquire_all(bucket, 6)
+
+    assert delays[:3] == [0.0, 0.0, 0.0]
+    assert delays[3:] == pytest.approx([0.1, 0.2, 0.3])
+    assert bucket.as_dict() == {'acquired': 6, 'rejected': 0, 'waited': 3, 'total_wait': pytest.approx(0.6)}
+
+
+def test_slots_are_regained_while_idle(clock):
+    bucket = throttle.AirThingsTokenBucket(name='t', rate=10.0, capacity=2.0, max_wait=None)
+    acquire_all(bucket, 2)
+
+    clock.now += 0.1
+    assert acquire_all(bucket, 2) == pytest.approx([0.0, 0.1])
+
+    clock.now += 10.0
+    assert acquire_all(bucket, 2) == [0.0, 0.0]
+
+
+def test_callers_past_max_wait_are_rejected_without_taking_a_slot(clock):
+    bucket = throttle.AirThingsTokenBucket(name='t', rate=1.0, capacity=1.0, max_wait=1.5)
+    assert acquire_all(bucket, 2) == [0.0, 1.0]
+
+    with pytest.raises(exceptions.AirThingsThrottledException) as raised:
+        acquire_all(bucket, 1)
+
+    assert raised.value.retry_in == pytest.approx(0.5)
+    assert bucket.rejected == 1
+
+    clock.now += 1.0
+    assert acquire_all(bucket, 1) == pytest.approx([1.0])
+
+
+def test_cancelled_waiters_give_their_slot_back():
+    bucket = throttle.AirThingsTokenBucket(name='t', rate=10.0, capacity=1.0, max_wait=None)
+
+    async def scenario():
+        await bucket.acquire()
+
+        waiter = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        return await bucket.acquire()
+
+    delay = asyncio.run(scenario())
+
+    assert delay < 0.1
+    assert bucket.as_dict() == {'acquired': 2, 'rejected': 0, 'waited': 1, 'total_wait': pytest.approx(delay)}
+
+
+def test_throttled_polls_raise(clock):
+    limiter = throttle.AirThingsRateLimiter(web_rate=0.1, web_burst=1.0, max_wait=1.0)
+    manager = locations_manager(rate_limiter=limiter, retry_policy=fast_retries())
+
+    async def scenario():
+        await manager.get_locations_instance()
+        await manager.get_locations_instance()
+
+    with pytest.raises(exceptions.AirThingsThrottledException) as raised:
+        asyncio.run(scenario())
+
+    assert raised.value.retry_in == pytest.approx(9.0)
+    assert limiter.web.rejected == 1
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        throttle.AirThingsTokenBucket(name='t', rate=0.0)
+
+
+def test_managers_share_the_limiter(fake):
+    limiter = throttle.AirThingsRateLimiter(web_rate=1000.0, web_burst=1000.0, accounts_rate=1000.0, accounts_burst=1000.0)
+
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            managers = [
+                ata.api.web.AirThingsManager(username=str(i), password='secret', session=session, rate_limiter=limiter)
+                for i in range(3)
+            ]
+
+            await asyncio.gather(*[manager.get_me_instance() for manager in managers])
+
+    asyncio.run(scenario())
+
+    assert limiter.as_dict()['web']['acquired'] == 3
+    # Four login requests per manager (the consent one through the accounts bucket too).
+    assert limiter.as_dict()['accounts']['acquired'] == 12
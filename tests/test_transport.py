@@ -0,0 +1,119 @@
+import asyncio
+import gzip
+import json
+
+import aiohttp
+import pytest
+
+from conftest import LOCATIONS, ata, scripted_transport
+
+transport = ata.api.transport
+AirThingsManager = ata.api.web.AirThingsManager
+
+
+def test_transports_must_implement_request():
+    with pytest.raises(TypeError):
+        transport.AirThingsTransport()
+
+
+def test_scrubbing():
+    assert transport.scrub_url('https://h/cb?code=abc&state=1') == 'https://h/cb?code=scrubbed&state=1'
+    assert transport.scrub_url('https://h/v1/location') == 'https://h/v1/location'
+    assert transport.scrub_json({'username': 'jdoe', 'grant_type': 'password', 'redirect_uri': 'https://h/?code=abc'}) == \
+        {'username': 'scrubbed', 'grant_type': 'password', 'redirect_uri': 'https://h/?code=scrubbed'}
+    assert json.loads(transport.scrub_body(b'{"access_token": "a", "expires_in": 3600}')) == \
+        {'access_token': 'scrubbed', 'expires_in': 3600}
+    assert transport.scrub_body(b'[1, 2]') == b'[1, 2]'
+
+
+def test_recordings_replay_without_credentials(fake, tmp_path):
+    path = str(tmp_path / 'traffic.cassette')
+
+    async def record():
+        async with aiohttp.ClientSession() as session:
+            recorder = transport.AirThingsRecordingTransport(session)
+            manager = AirThingsManager(username='jdoe', password='hunter2', session=recorder)
+            instance = await manager.get_locations_instance()
+            recorder.save(path)
+            return (instance, manager.tokens['access_token'])
+
+    (recorded, access_token) = asyncio.run(record())
+
+    with gzip.open(path, 'rt', encoding='utf-8') as fh:
+        document = fh.read()
+
+    for secret in ['jdoe', 'hunter2', access_token]:
+        assert secret not in document
+
+    async def replay():
+        player = transport.AirThingsReplayTransport(transport.AirThingsCassette.load(path), speed=None)
+        manager = AirThingsManager(username='anyone', password='anything', session=player)
+        return (await manager.get_locations_instance(), player)
+
+    (replayed, player) = asyncio.run(replay())
+
+    assert replayed == recorded
+    assert player.misses == 0
+
+
+def test_exchanges_replay_in_order_and_repeat():
+    async def statuses(player, count):
+        result = []
+        for _ in range(count):
+            try:
+                async with player.get('https://any.host/v1/location') as response:
+                    result.append(response.status)
+            except aiohttp.ClientConnectionError:
+                result.append(None)
+        return result
+
+    exchanges = [('GET', '/v1/location', 503, {}), ('GET', '/v1/location', 200, LOCATIONS)]
+
+    once = scripted_transport(exchanges)
+    assert asyncio.run(statuses(once, 3)) == [503, 200, None]
+    assert (once.requests, once.misses) == (3, 1)
+
+    once.rewind()
+    assert asyncio.run(statuses(once, 1)) == [503]
+
+    assert asyncio.run(statuses(scripted_transport(exchanges, repeat=True), 3)) == [503, 200, 503]
+
+
+def test_unknown_requests_and_recorded_errors_fail_to_connect():
+    cassette = transport.AirThingsCassette()
+    cassette.add(transport.AirThingsExchange(method='GET', url='https://h/v1/me/', error='ClientOSError()'))
+    player = transport.AirThingsReplayTransport(cassette, speed=None)
+
+    async def request(url):
+        async with player.get(url):
+            pass
+
+    for url in ['https://h/v1/me/', 'https://h/v1/location']:
+        with pytest.raises(aiohttp.ClientConnectionError):
+            asyncio.run(request(url))
+
+    assert player.misses == 1
+
+
+def test_cassettes_round_trip_and_share_bodies(tmp_path):
+    path = str(tmp_path / 'c.cassette')
+    cassette = transport.AirThingsCassette()
+
+    for body in [b'{"a": 1}', b'{"a": 1}', b'\xff\xfe']:
+        cassette.add(transport.AirThingsExchange(method='GET', url='https://h/v1/x', status=200, elapsed=0.5), body)
+
+    cassette.save(path)
+    loaded = transport.AirThingsCassette.load(path)
+
+    assert len(loaded) == 3
+    assert len(loaded.bodies) == 2
+    assert [loaded.body_of(exchange) for exchange in loaded.exchanges] == [b'{"a": 1}', b'{"a": 1}', b'\xff\xfe']
+    assert loaded.exchanges[0].to_dict() == cassette.exchanges[0].to_dict()
+    assert loaded.latest_bodies() == {('GET', '/v1/x'): b'\xff\xfe'}
+
+
+def test_unknown_exchange_fields_are_ignored():
+    exchange = transport.AirThingsExchange.from_dict({'method': 'GET', 'url': 'https://h/v1/x', 'status': 200, 'offset': 1.5})
+
+    assert exchange.key == ('GET', '/v1/x')
+    assert 'offset' not in exchange.to_dict()
@@ -0,0 +1,94 @@
+import copy
+
+import pytest
+
+from conftest import LOCATIONS, ata
+from payloads import load_sample
+
+units = ata.api.units
+li = ata.responses.locations_instance
+mi = ata.responses.me_instance
+Converter = units.AirThingsUnitConverter
+
+
+@pytest.mark.parametrize('value, from_unit, to_unit, expected', [
+    (20.0, 'c', 'f', 68.0),
+    (68.0, 'F', 'C', 20.0),
+    (0.0, 'k', 'c', -273.15),
+    (37.0, 'bq', 'pci', 1.0),
+    (1.0, 'inhg', 'hpa', 33.8638866667),
+    (1013.25, 'mbar', 'kpa', 101.325),
+    (1.0, 'ppm', 'ppb', 1000.0),
+])
+def test_conversions(value, from_unit, to_unit, expected):
+    assert Converter().convert(value, from_unit, to_unit) == pytest.approx(expected)
+
+
+def test_every_pair_round_trips():
+    converter = Converter()
+
+    for (from_unit, to_unit) in Converter.AFFINE_TABLE:
+        there = converter.convert(12.5, from_unit, to_unit)
+        assert converter.convert(there, to_unit, from_unit) == pytest.approx(12.5), (from_unit, to_unit)
+
+
+def test_no_ops_and_unknown_units_are_left_alone():
+    converter = Converter()
+    column = [1.0, None, 3.0]
+
+    assert Converter.affine('mbar', 'hpa') is None
+    assert Converter.affine('c', 'ppb') is None
+    assert converter.convert(5.0, 'pct', 'riskIndex') == 5.0
+    assert converter.convert_column(column, 'mbar', 'hpa') is column
+    assert converter.convert_column(column, 'c', 'f') == pytest.approx([33.8, None, 37.4])
+    assert converter.convert_columns([20.0, 20.0, None, 5.0], ['c', 'c', 'c', 'pct'], ['f', 'c', 'f', 'bq']) == \
+        pytest.approx([68.0, 20.0, None, 5.0])
+
+
+def with_preferred_units(preferred):
+    payload = copy.deepcopy(LOCATIONS)
+
+    for location in payload['locations']:
+        for device in location['devices']:
+            for sensor in device['currentSensorValues']:
+                sensor['preferredUnit'] = preferred.get(sensor['providedUnit'], sensor['preferredUnit'])
+
+    return li.locations_instance_from_dict(payload)
+
+
+def test_values_and_thresholds_go_to_the_preferred_unit():
+    instance = with_preferred_units({'c': 'f'})
+    converted = Converter().convert_locations(instance)
+
+    for (location, original_location) in zip(converted.locations, instance.locations):
+        for (device, original_device) in zip(location.devices, original_location.devices):
+            for (sensor, original) in zip(device.current_sensor_values, original_device.current_sensor_values):
+                if original.provided_unit != 'c':
+                    assert sensor is original
+                    continue
+
+                assert sensor.provided_unit == 'f'
+                assert sensor.value == pytest.approx(original.value * 1.8 + 32)
+                assert sensor.thresholds == pytest.approx([threshold * 1.8 + 32 for threshold in original.thresholds])
+                assert original.provided_unit == 'c'
+
+
+def test_unchanged_snapshots_are_shared():
+    instance = li.locations_instance_from_dict(copy.deepcopy(LOCATIONS))
+
+    assert Converter().convert_locations(instance) is instance
+    assert Converter(system='metric').convert_locations(instance) is instance
+
+
+def test_the_account_measurement_system_wins():
+    me = load_sample('get_me.json')
+    me['measurementUnit'] = 'IMPERIAL'
+    converter = Converter.from_me_instance(mi.me_instance_from_dict(me))
+    converted = converter.convert_locations(with_preferred_units({'c': 'k'}))
+
+    assert converter.system == 'IMPERIAL'
+    assert {sensor.provided_unit for location in converted.locations for device in location.devices
+            for sensor in device.current_sensor_values} == {'f', 'pci', 'ppb', 'pct', 'riskIndex'}
+
+    me['measurementUnit'] = 'SOMETHING_ELSE'
+    assert Converter.from_me_instance(mi.me_instance_from_dict(me)).system is None
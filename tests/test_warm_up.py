@@ -0,0 +1,46 @@
+import asyncio
+
+import aiohttp
+
+from conftest import ata
+
+
+async def warm_up_then_poll(background: bool):
+    async with aiohttp.ClientSession() as session:
+        manager = ata.api.web.AirThingsManager(username='jdoe', password='secret', session=session)
+
+        result = await manager.warm_up(background=background)
+
+        if background:
+            await manager.warm_up_task
+
+        await manager.get_locations_instance()
+        return (result, manager)
+
+
+def test_warm_up_logs_in_once_before_the_first_poll(fake):
+    (result, manager) = asyncio.run(warm_up_then_poll(background=False))
+
+    assert result is True
+    assert manager.tokens is not None
+    assert fake.counters['logins'] == 1
+    assert fake.counters['location'] == 1
+
+
+def test_background_warm_up_runs_as_warm_up_task(fake):
+    (result, manager) = asyncio.run(warm_up_then_poll(background=True))
+
+    assert result is None
+    assert manager.warm_up_task.done()
+    assert manager.warm_up_task.result() is True
+    assert fake.counters['logins'] == 1
+
+
+def test_warm_up_reports_failed_logins(fake):
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            manager = ata.api.web.AirThingsManager(username='jdoe', password='secret', session=session)
+            fake.stop_thread()
+            return await manager.warm_up()
+
+    assert asyncio.run(scenario()) is False
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from conftest import LOCATIONS, ata, locations_manager, scripted_transport
+
+watch = ata.api.watch
+Policy = watch.AirThingsOverflowPolicy
+
+
+async def take(subscription, count):
+    items = []
+
+    async for item in subscription:
+        items.append(item)
+
+        if len(items) == count:
+            break
+
+    return items
+
+
+def test_overflow_policies():
+    async def scenario():
+        drop = watch.AirThingsSubscription(maxsize=2, policy=Policy.DropOldest)
+        coalesce = watch.AirThingsSubscription(maxsize=2, policy=Policy.CoalesceLatest)
+        block = watch.AirThingsSubscription(maxsize=2, policy=Policy.Block)
+
+        for item in range(5):
+            drop.offer(item)
+            coalesce.offer(item)
+
+        assert [block.offer(item) for item in range(3)] == [True, True, False]
+
+        return (list(drop.items), drop.dropped, list(coalesce.items), coalesce.dropped, list(block.items))
+
+    assert asyncio.run(scenario()) == ([3, 4], 3, [4], 4, [0, 1])
+
+
+def test_blocked_put_resumes_when_the_consumer_reads():
+    async def scenario():
+        subscription = watch.AirThingsSubscription(maxsize=1, policy=Policy.Block)
+        await subscription.put(1)
+
+        put = asyncio.ensure_future(subscription.put(2))
+        await asyncio.sleep(0)
+        assert not put.done()
+
+        assert await subscription.__anext__() == 1
+        await asyncio.wait_for(put, timeout=1.0)
+
+        return list(subscription.items)
+
+    assert asyncio.run(scenario()) == [2]
+
+
+def test_subscriptions_share_one_poller():
+    async def scenario():
+        manager = locations_manager()
+
+        first = manager.watch_locations(interval=0.01)
+        second = manager.watch_locations(interval=0.01)
+        (a, b) = await asyncio.gather(take(first, 3), take(second, 3))
+
+        watcher = manager.watchers['location']
+        assert sorted(map(id, watcher.subscriptions)) == sorted([id(first), id(second)])
+
+        first.close()
+        second.close()
+
+        return (a, b, watcher)
+
+    (a, b, watcher) = asyncio.run(scenario())
+
+    assert len(a) == len(b) == 3
+    assert watcher.subscriptions == [] and watcher.task is None
+
+
+def test_a_slow_block_subscriber_does_not_stall_the_others():
+    async def scenario():
+        manager = locations_manager()
+
+        stalled = manager.watch_locations(interval=0.01, maxsize=1, policy=Policy.Block)
+        others = manager.watch_locations(interval=0.01)
+
+        items = await asyncio.wait_for(take(others, 5), timeout=5.0)
+
+        delivered = stalled.delivered
+        stalled.close()
+        others.close()
+
+        return (items, delivered)
+
+    (items, delivered) = asyncio.run(scenario())
+
+    assert len(items) == 5
+    assert delivered == 1
+
+
+def test_device_subscriptions_get_changes_only():
+    serial_number = LOCATIONS['locations'][0]['devices'][0]['serialNumber']
+
+    async def scenario():
+        manager = locations_manager()
+        subscription = manager.watch_device(serial_number, interval=0.01)
+
+        devices = await take(subscription, 1)
+        await asyncio.sleep(0.1)
+        subscription.close()
+
+        return (devices, subscription.delivered)
+
+    (devices, delivered) = asyncio.run(scenario())
+
+    assert devices[0].serial_number == serial_number
+    assert delivered == 1
+
+
+def test_invalid_credentials_end_the_subscriptions():
+    async def scenario():
+        transport = scripted_transport([('POST', '/v1/token', 400, {'error': 'invalid_grant'})], repeat=True)
+        manager = ata.api.web.AirThingsManager(username='jdoe', password='wrong', session=transport)
+
+        async with manager.watch_locations(interval=0.01) as subscription:
+            return await take(subscription, 1)
+
+    with pytest.raises(ata.api.exceptions.AirThingsInvalidCredentialsException):
+        asyncio.run(scenario())